@@ -0,0 +1,312 @@
+"""
+Catálogo compacto de mascotas compartido entre workers (mmap)
+
+Con varios workers, cada uno consultaba y guardaba su propia copia del
+catálogo. Aquí el catálogo se construye una vez por cambio en un archivo
+binario de solo lectura que todos los workers mapean en memoria (mmap): las
+páginas están una sola vez en la caché del sistema operativo, y filtrar por
+especie, tamaño, género o estado es un recorrido vectorizado con NumPy, sin
+tocar MySQL.
+
+Formato del archivo (little endian):
+
+    cabecera   CABECERA: formato, filas, textos, bytes del arena, huella,
+               momento de la construcción
+    registros  arreglo estructurado (_registro()), en orden de created_at
+               descendente
+    offsets    uint32 x (textos + 1): inicio de cada texto en el arena
+    arena      los textos en UTF-8, cada texto distinto una sola vez
+
+Las columnas ENUM van como uint8 (0 = NULL, 1.. = posición en ENUMS) y las
+de texto como el índice de su texto en el arena (SIN_TEXTO = NULL); los
+nombres de contacto, teléfonos o imágenes repetidos ocupan un solo lugar.
+Las fechas van como int64 en microsegundos desde 1970 (0 = NULL), con la
+misma precisión que updated_at en MySQL (migración 009).
+
+- Reconstrucción: los endpoints que escriben en mascotas llaman a
+  invalidar() tras el commit; la reconstrucción corre en un hilo en segundo
+  plano y no alarga la respuesta. Un candado de archivo (flock) evita que
+  dos workers la hagan a la vez, y si el archivo ya se construyó después
+  del cambio no se repite. Cada CATALOGO_MAX_EDAD_S se reconstruye igual,
+  por los cambios hechos fuera de la API (pipeline, SQL manual).
+- Publicación: el archivo nuevo se escribe aparte y se cambia por el
+  anterior con os.replace; los workers notan el cambio por el inodo y
+  vuelven a mapear. Quien aún lee el mapeo anterior no se ve afectado.
+- Un archivo por refugio (refugios.py).
+
+Con CATALOGO_DIR en un tmpfs (/dev/shm/...) el archivo queda en memoria
+compartida sin pasar por disco. NumPy se importa en el primer uso.
+"""
+
+import asyncio
+import hashlib
+import mmap
+import os
+import struct
+import time
+from datetime import datetime, timedelta
+from pathlib import Path
+
+try:
+    import fcntl
+except ImportError:  # Windows: un solo worker, sin candado entre procesos
+    fcntl = None
+
+from database import db
+from models import EspecieEnum, TamanoEnum, GeneroEnum, EstadoEnum
+
+CATALOGO_DIR = Path(os.getenv("CATALOGO_DIR", str(Path(__file__).parent / "data" / "catalogo")))
+CATALOGO_MAX_EDAD_S = float(os.getenv("CATALOGO_MAX_EDAD_S", "300"))
+CATALOGO_LIMITE_MAX = 500
+
+MAGIA = b"RFCATAL1"
+# 2: fechas en microsegundos (en el 1 eran segundos)
+FORMATO = 2
+# magia, formato, filas, textos, bytes del arena, huella, construido (epoch)
+CABECERA = struct.Struct("<8sIIIIQd")
+
+ENUMS = {
+    "especie": tuple(e.value for e in EspecieEnum),
+    "tamano": tuple(e.value for e in TamanoEnum),
+    "genero": tuple(e.value for e in GeneroEnum),
+    "estado": tuple(e.value for e in EstadoEnum),
+}
+TEXTOS = ("nombre", "descripcion", "imagen_url", "contacto_nombre", "contacto_telefono")
+FECHAS = ("created_at", "updated_at")
+SIN_TEXTO = 0xFFFFFFFF
+SIN_EDAD = -1
+
+# Mismas columnas y orden que GET /mascotas (SELECT * FROM mascotas)
+COLUMNAS = ("id", "nombre", "especie", "edad", "descripcion", "imagen_url", "tamano", "genero",
+            "contacto_nombre", "contacto_telefono", "estado", "created_at", "updated_at")
+
+_EPOCA = datetime(1970, 1, 1)
+
+
+def _registro():
+    import numpy as np
+    return np.dtype(
+        [("id", "<u4"), ("edad", "<i2")]
+        + [(columna, "u1") for columna in ENUMS]
+        + [(columna, "<u4") for columna in TEXTOS]
+        + [(columna, "<i8") for columna in FECHAS]
+    )
+
+
+def _microsegundos(fecha):
+    # TIMESTAMP llega como datetime sin zona: se guarda tal cual, sin convertir
+    return (fecha - _EPOCA) // timedelta(microseconds=1) if fecha else 0
+
+
+# ==========================================
+# CONSTRUCCIÓN
+# ==========================================
+
+def serializar(filas):
+    """Bytes del archivo de catálogo a partir de filas (dict) de mascotas, ya ordenadas"""
+    import numpy as np
+
+    registros = np.zeros(len(filas), dtype=_registro())
+    codigos = {columna: {valor: i + 1 for i, valor in enumerate(valores)} for columna, valores in ENUMS.items()}
+    internados, partes, offsets = {}, [], [0]
+
+    def internar(texto):
+        if texto is None:
+            return SIN_TEXTO
+        indice = internados.get(texto)
+        if indice is None:
+            datos = texto.encode("utf-8")
+            indice = internados[texto] = len(partes)
+            partes.append(datos)
+            offsets.append(offsets[-1] + len(datos))
+        return indice
+
+    for i, fila in enumerate(filas):
+        registro = registros[i]
+        registro["id"] = fila["id"]
+        registro["edad"] = SIN_EDAD if fila["edad"] is None else fila["edad"]
+        for columna in ENUMS:
+            registro[columna] = codigos[columna].get(fila[columna], 0)
+        for columna in TEXTOS:
+            registro[columna] = internar(fila[columna])
+        for columna in FECHAS:
+            registro[columna] = _microsegundos(fila[columna])
+
+    cuerpo = registros.tobytes() + np.array(offsets, dtype="<u4").tobytes() + b"".join(partes)
+    huella = int.from_bytes(hashlib.blake2b(cuerpo, digest_size=8).digest(), "little")
+    return huella, cuerpo, len(partes), offsets[-1]
+
+
+class Catalogo:
+    """Catálogo mapeado de un refugio, por worker"""
+
+    def __init__(self, refugio, directorio=CATALOGO_DIR, max_edad_s=CATALOGO_MAX_EDAD_S):
+        self.refugio = refugio
+        self.path = Path(directorio) / f"{refugio}.bin"
+        self.max_edad_s = max_edad_s
+        self._mapeo = None
+        self._clave = None
+        self._pedido = 0.0
+        self._tarea = None
+
+    def construir(self, desde=0.0):
+        """
+        Leer mascotas de MySQL y publicar un archivo nuevo
+
+        Si el archivo vigente se construyó después de 'desde' (el momento
+        del cambio) no se repite. Devuelve True si se construyó.
+        """
+        self.path.parent.mkdir(parents=True, exist_ok=True)
+        with open(self.path.with_suffix(".lock"), "a+b") as candado:
+            if fcntl is not None:
+                # Si otro worker está construyendo se espera y se revisa su resultado
+                fcntl.flock(candado, fcntl.LOCK_EX)
+            actual = _leer_cabecera(self.path)
+            if desde and actual and actual["construido"] >= desde:
+                return False
+
+            construido = time.time()
+            connection = db.base(self.refugio).get_connection()
+            cursor = connection.cursor(dictionary=True)
+            try:
+                cursor.execute(f"SELECT {', '.join(COLUMNAS)} FROM mascotas ORDER BY created_at DESC, id DESC")
+                filas = cursor.fetchall()
+            finally:
+                cursor.close()
+                connection.close()
+
+            huella, cuerpo, textos, arena = serializar(filas)
+            temporal = self.path.with_name(f"{self.path.name}.{os.getpid()}.tmp")
+            try:
+                with open(temporal, "wb") as archivo:
+                    archivo.write(CABECERA.pack(MAGIA, FORMATO, len(filas), textos, arena, huella, construido))
+                    archivo.write(cuerpo)
+                os.replace(temporal, self.path)
+            except BaseException:
+                temporal.unlink(missing_ok=True)
+                raise
+        print(f"📚 Catálogo de '{self.refugio}' publicado: {len(filas)} mascotas, "
+              f"{textos} textos distintos, {CABECERA.size + len(cuerpo)} bytes")
+        return True
+
+    def invalidar(self):
+        """Tras un cambio en mascotas: reconstruir en segundo plano, sin esperar"""
+        self._pedido = time.time()
+        if self._tarea is None or self._tarea.done():
+            self._tarea = asyncio.ensure_future(self._reconstruir())
+
+    async def _reconstruir(self):
+        # Los cambios que llegan durante una construcción piden otra al terminar
+        hecho = 0.0
+        while self._pedido > hecho:
+            hecho = self._pedido
+            try:
+                await asyncio.to_thread(self.construir, hecho)
+            except Exception as e:
+                print(f"⚠️ No se pudo reconstruir el catálogo de '{self.refugio}': {e}")
+                return
+
+    # ==========================================
+    # LECTURA
+    # ==========================================
+
+    def mapeo(self):
+        """Mapeo vigente del archivo, o None si aún no existe"""
+        try:
+            estado = os.stat(self.path)
+        except FileNotFoundError:
+            return None
+        clave = (estado.st_ino, estado.st_mtime_ns)
+        if clave != self._clave:
+            # Otro proceso publicó un archivo nuevo; el mapeo anterior se
+            # libera cuando nadie lo usa
+            self._mapeo = MapeoCatalogo(self.path)
+            self._clave = clave
+        return self._mapeo
+
+    async def obtener(self):
+        """Mapeo para atender una petición; la primera vez lo construye"""
+        mapeo = self.mapeo()
+        if mapeo is None:
+            await asyncio.to_thread(self.construir)
+            mapeo = self.mapeo()
+        elif time.time() - mapeo.construido > self.max_edad_s:
+            self.invalidar()
+        return mapeo
+
+
+def _leer_cabecera(path):
+    try:
+        with open(path, "rb") as archivo:
+            datos = archivo.read(CABECERA.size)
+    except FileNotFoundError:
+        return None
+    if len(datos) < CABECERA.size:
+        return None
+    magia, formato, filas, textos, arena, huella, construido = CABECERA.unpack(datos)
+    if magia != MAGIA or formato != FORMATO:
+        return None
+    return {"filas": filas, "textos": textos, "arena": arena, "huella": huella, "construido": construido}
+
+
+class MapeoCatalogo:
+    """Vistas NumPy de solo lectura sobre el archivo mapeado"""
+
+    def __init__(self, path):
+        import numpy as np
+        with open(path, "rb") as archivo:
+            self._mm = mmap.mmap(archivo.fileno(), 0, access=mmap.ACCESS_READ)
+        magia, formato, filas, textos, arena, huella, construido = CABECERA.unpack_from(self._mm)
+        if magia != MAGIA or formato != FORMATO:
+            raise ValueError(f"{path}: no es un catálogo de formato {FORMATO}")
+        self.huella = huella
+        self.construido = construido
+        registro = _registro()
+        inicio = CABECERA.size
+        self.registros = np.frombuffer(self._mm, dtype=registro, count=filas, offset=inicio)
+        inicio += filas * registro.itemsize
+        self.offsets = np.frombuffer(self._mm, dtype="<u4", count=textos + 1, offset=inicio)
+        inicio += (textos + 1) * 4
+        self.arena = memoryview(self._mm)[inicio:inicio + arena]
+
+    @property
+    def etag(self):
+        return f'W/"{db.actual()}:catalogo-{self.huella:016x}"'
+
+    def _texto(self, indice):
+        if indice == SIN_TEXTO:
+            return None
+        return bytes(self.arena[self.offsets[indice]:self.offsets[indice + 1]]).decode("utf-8")
+
+    def filtrar(self, especie=None, tamano=None, genero=None, estado=None, edad_min=None, edad_max=None):
+        """Posiciones (en orden del catálogo) de las mascotas que cumplen todos los filtros"""
+        import numpy as np
+        mascara = np.ones(len(self.registros), dtype=bool)
+        for columna, valores in (("especie", especie), ("tamano", tamano), ("genero", genero), ("estado", estado)):
+            if valores:
+                codigos = [ENUMS[columna].index(valor) + 1 for valor in valores]
+                mascara &= np.isin(self.registros[columna], codigos)
+        if edad_min is not None or edad_max is not None:
+            edades = self.registros["edad"]
+            mascara &= edades != SIN_EDAD
+            if edad_min is not None:
+                mascara &= edades >= edad_min
+            if edad_max is not None:
+                mascara &= edades <= edad_max
+        return np.flatnonzero(mascara)
+
+    def filas(self, posiciones):
+        """Decodificar solo las filas pedidas, como las devuelve GET /mascotas"""
+        resultado = []
+        for registro in self.registros[posiciones].tolist():
+            fila = dict(zip(self.registros.dtype.names, registro))
+            for columna, valores in ENUMS.items():
+                fila[columna] = valores[fila[columna] - 1] if fila[columna] else None
+            for columna in TEXTOS:
+                fila[columna] = self._texto(fila[columna])
+            for columna in FECHAS:
+                fila[columna] = _EPOCA + timedelta(microseconds=fila[columna]) if fila[columna] else None
+            if fila["edad"] == SIN_EDAD:
+                fila["edad"] = None
+            resultado.append({columna: fila[columna] for columna in COLUMNAS})
+        return resultado
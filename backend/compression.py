@@ -0,0 +1,167 @@
+"""
+Compresión negociada de respuestas (brotli / gzip)
+
+Middleware ASGI que comprime las respuestas de texto y JSON por encima de un
+tamano mínimo, según el Accept-Encoding del cliente. Los cuerpos comprimidos
+de GETs cacheables (con ETag o Last-Modified) se guardan en una caché LRU
+por validador y hash del cuerpo, así una misma versión de un listado se
+comprime una sola vez por worker.
+Las respuestas en streaming (más de un fragmento) pasan sin tocar.
+"""
+
+import gzip
+import hashlib
+from collections import OrderedDict
+
+from starlette.datastructures import Headers, MutableHeaders
+
+try:
+    import brotli
+except ImportError:  # brotli es opcional: sin él solo se ofrece gzip
+    brotli = None
+
+COMPRESSIBLE_TYPES = (
+    "application/json", "text/", "application/javascript", "application/xml", "image/svg+xml",
+)
+
+
+def choose_encoding(accept_encoding: str):
+    """Elegir 'br' o 'gzip' según Accept-Encoding (respetando q=0)"""
+    aceptadas = {}
+    for parte in accept_encoding.lower().split(","):
+        nombre, _, params = parte.strip().partition(";")
+        q = 1.0
+        if params.strip().startswith("q="):
+            try:
+                q = float(params.strip()[2:])
+            except ValueError:
+                q = 0.0
+        aceptadas[nombre.strip()] = q
+    if brotli is not None and aceptadas.get("br", 0) > 0:
+        return "br"
+    if aceptadas.get("gzip", 0) > 0:
+        return "gzip"
+    return None
+
+
+def compress(body: bytes, encoding: str) -> bytes:
+    if encoding == "br":
+        return brotli.compress(body, quality=5)
+    return gzip.compress(body, compresslevel=6)
+
+
+class CompressedBodyCache:
+    """LRU acotada por cantidad de entradas y por bytes totales"""
+
+    def __init__(self, max_entries=256, max_bytes=32 * 1024 * 1024):
+        self.max_entries = max_entries
+        self.max_bytes = max_bytes
+        self.total_bytes = 0
+        self._items = OrderedDict()
+
+    def get(self, key):
+        body = self._items.get(key)
+        if body is not None:
+            self._items.move_to_end(key)
+        return body
+
+    def put(self, key, body):
+        if len(body) > self.max_bytes:
+            return
+        anterior = self._items.pop(key, None)
+        if anterior is not None:
+            self.total_bytes -= len(anterior)
+        self._items[key] = body
+        self.total_bytes += len(body)
+        while len(self._items) > self.max_entries or self.total_bytes > self.max_bytes:
+            _, viejo = self._items.popitem(last=False)
+            self.total_bytes -= len(viejo)
+
+
+class CompressionMiddleware:
+    def __init__(self, app, minimum_size=1024, cache_entries=256):
+        self.app = app
+        self.minimum_size = minimum_size
+        self.cache = CompressedBodyCache(max_entries=cache_entries)
+
+    async def __call__(self, scope, receive, send):
+        if scope["type"] != "http":
+            await self.app(scope, receive, send)
+            return
+        encoding = choose_encoding(Headers(scope=scope).get("accept-encoding", ""))
+        if encoding is None:
+            await self.app(scope, receive, send)
+            return
+        responder = _CompressionResponder(self, scope, encoding, send)
+        await self.app(scope, receive, responder.send)
+
+
+class _CompressionResponder:
+    def __init__(self, middleware, scope, encoding, send):
+        self.middleware = middleware
+        self.scope = scope
+        self.encoding = encoding
+        self.downstream = send
+        self.start_message = None
+        self.passthrough = False
+
+    async def send(self, message):
+        if message["type"] == "http.response.start":
+            self.start_message = message
+            return
+        if message["type"] != "http.response.body" or self.passthrough:
+            await self.downstream(message)
+            return
+
+        if message.get("more_body", False) or not self._compressible():
+            # Streaming o contenido no comprimible: se envía tal cual
+            self.passthrough = True
+            await self.downstream(self.start_message)
+            await self.downstream(message)
+            return
+
+        body = message.get("body", b"")
+        headers = MutableHeaders(raw=self.start_message["headers"])
+        headers.add_vary_header("Accept-Encoding")
+        if len(body) < self.middleware.minimum_size:
+            await self.downstream(self.start_message)
+            await self.downstream(message)
+            return
+
+        key = self._cache_key(headers, body)
+        compressed = self.middleware.cache.get(key) if key else None
+        if compressed is None:
+            compressed = compress(body, self.encoding)
+            if key:
+                self.middleware.cache.put(key, compressed)
+
+        headers["Content-Encoding"] = self.encoding
+        headers["Content-Length"] = str(len(compressed))
+        await self.downstream(self.start_message)
+        await self.downstream({"type": "http.response.body", "body": compressed})
+
+    def _compressible(self):
+        headers = Headers(raw=self.start_message["headers"])
+        if self.start_message["status"] != 200 or "content-encoding" in headers:
+            return False
+        content_type = headers.get("content-type", "")
+        return content_type.startswith(COMPRESSIBLE_TYPES)
+
+    def _cache_key(self, headers, body):
+        """
+        Solo se cachean GETs que identifican su versión con un validador
+
+        La clave lleva además un hash del cuerpo sin comprimir: un ETag débil
+        puede repetirse con otro contenido, y entonces se servirían los bytes
+        comprimidos de la versión anterior. Hashear es mucho más barato que
+        comprimir.
+        """
+        if self.scope["method"] != "GET" or "no-store" in headers.get("cache-control", ""):
+            return None
+        version = headers.get("etag") or headers.get("last-modified")
+        if not version:
+            return None
+        # x-refugio (RefugioMiddleware): la misma URL es otro recurso en otro refugio
+        refugio = headers.get("x-refugio", "")
+        huella = hashlib.blake2b(body, digest_size=16).digest()
+        return (refugio, self.scope["path"], self.scope.get("query_string", b""), version, huella, self.encoding)
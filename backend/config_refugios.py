@@ -0,0 +1,73 @@
+"""
+Configuración de los refugios del despliegue (REFUGIOS_CONFIG)
+
+Solo biblioteca estándar: la importan tanto la API (database.py) como el
+pipeline (pipeline/flows.py), así los dos validan y entienden el mismo
+archivo de la misma forma (el slug es también un directorio del pipeline,
+pipeline/refugios/<slug>/).
+"""
+
+import json
+import os
+import re
+from pathlib import Path
+
+# Los slugs aparecen en nombres de pool, ETags y rutas de archivos
+SLUG_RE = re.compile(r'^[a-z0-9][a-z0-9_-]{0,39}$')
+CAMPOS_CONEXION = ("host", "port", "database", "user", "password")
+
+def parse_replica_hosts(valor):
+    """'host1,host2:3307' -> [(host, puerto o None), ...]"""
+    hosts = []
+    for parte in (valor or "").split(","):
+        parte = parte.strip()
+        if parte:
+            host, _, puerto = parte.partition(":")
+            hosts.append((host, int(puerto) if puerto else None))
+    return hosts
+
+def config_base():
+    """Conexión a MySQL desde las variables DB_*"""
+    return {
+        'host': os.getenv('DB_HOST', 'localhost'),
+        'database': os.getenv('DB_NAME', 'refugio_mascotas'),
+        'user': os.getenv('DB_USER', 'root'),
+        'password': os.getenv('DB_PASSWORD', 'root')
+    }
+
+def cargar_refugios(ruta=None):
+    """
+    (predeterminado, {slug: opciones}) de los refugios del despliegue
+
+    Con REFUGIOS_CONFIG (JSON, ver refugios.example.json) cada refugio tiene
+    su base, posiblemente en otra instancia de MySQL; lo que no indique se
+    toma de DB_*. Sin archivo hay un único refugio con la configuración DB_*.
+    """
+    ruta = ruta or os.getenv('REFUGIOS_CONFIG')
+    if not ruta:
+        slug = os.getenv('REFUGIO_PREDETERMINADO', 'principal')
+        return slug, {slug: {"config": config_base(), "replicas": os.getenv('DB_REPLICA_HOSTS', ''), "dominios": [],
+                             "notificar": None}}
+    
+    datos = json.loads(Path(ruta).read_text(encoding="utf-8"))
+    refugios = {}
+    for slug, opciones in datos["refugios"].items():
+        if not SLUG_RE.match(slug):
+            raise ValueError(f"Refugio '{slug}': use minúsculas, números, '-' o '_' (máximo 40)")
+        config = {**config_base(), **{campo: opciones[campo] for campo in CAMPOS_CONEXION if campo in opciones}}
+        # La contraseña puede venir de otra variable de entorno en vez del archivo
+        if "password_env" in opciones:
+            config["password"] = os.environ[opciones["password_env"]]
+        refugios[slug] = {
+            "config": config,
+            "replicas": opciones.get("replicas", ""),
+            "dominios": [dominio.lower() for dominio in opciones.get("dominios", [])],
+            # Destinatarios de los avisos de envíos nuevos (None: NOTIFICACIONES_PARA)
+            "notificar": opciones.get("notificar"),
+        }
+    if not refugios:
+        raise ValueError(f"{ruta}: no hay refugios configurados")
+    predeterminado = datos.get("predeterminado") or next(iter(refugios))
+    if predeterminado not in refugios:
+        raise ValueError(f"{ruta}: el refugio predeterminado '{predeterminado}' no está en la lista")
+    return predeterminado, refugios
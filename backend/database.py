@@ -1,25 +1,137 @@
 import mysql.connector
-from mysql.connector import Error
+from mysql.connector import Error, pooling
+from mysql.connector.errors import PoolError
+import contextvars
+import itertools
 import os
+import threading
+import time
+from contextlib import contextmanager
 from typing import Optional
 
+from config_refugios import parse_replica_hosts, config_base, cargar_refugios
+
+# Hasta cuándo (epoch) las lecturas de este contexto van al primario. Se fija
+# después de una escritura (ReadYourWritesMiddleware) para que el cliente lea
+# lo que acaba de escribir aunque la réplica vaya atrasada.
+_primario_hasta = contextvars.ContextVar("primario_hasta", default=0.0)
+
+# Refugio (tenant) de la petición en curso; lo fija RefugioMiddleware
+# (refugios.py). Sin valor se usa el refugio predeterminado.
+_refugio_actual = contextvars.ContextVar("refugio_actual", default=None)
+
 class Database:
-    def __init__(self):
-        self.config = {
-            'host': os.getenv('DB_HOST', 'localhost'),
-            'database': os.getenv('DB_NAME', 'refugio_mascotas'),
-            'user': os.getenv('DB_USER', 'root'),
-            'password': os.getenv('DB_PASSWORD', 'root')
-        }
+    def __init__(self, config=None, replica_hosts=None, nombre=None):
+        self.config = config or config_base()
+        self.nombre = nombre or os.getenv('REFUGIO_PREDETERMINADO', 'principal')
+        # Tamano del pool por proceso (mysql-connector permite hasta 32)
+        self.pool_size = int(os.getenv('DB_POOL_SIZE', '5'))
+        self._pool: Optional[pooling.MySQLConnectionPool] = None
+        
+        # Réplicas de lectura (DB_REPLICA_HOSTS=host1,host2:3307), un pool por réplica
+        if replica_hosts is None:
+            replica_hosts = os.getenv('DB_REPLICA_HOSTS')
+        self.replica_configs = []
+        for host, puerto in parse_replica_hosts(replica_hosts):
+            config = {**self.config, 'host': host}
+            if puerto:
+                config['port'] = puerto
+            self.replica_configs.append(config)
+        self.replica_pool_size = int(os.getenv('DB_REPLICA_POOL_SIZE', str(self.pool_size)))
+        self.sticky_segundos = float(os.getenv('DB_STICKY_SEGUNDOS', '5'))
+        # Una réplica que falla se salta durante este tiempo
+        self.replica_reintento = float(os.getenv('DB_REPLICA_REINTENTO', '30'))
+        self._replica_pools = {}
+        self._replica_caida_hasta = {}
+        self._turno = itertools.count()
+    
+    def get_pool(self):
+        """Pool de conexiones perezoso: se crea en el proceso que lo usa"""
+        if self._pool is None:
+            self._pool = pooling.MySQLConnectionPool(
+                pool_name=f"refugio_{os.getpid()}_{self.nombre}",
+                pool_size=self.pool_size,
+                pool_reset_session=True,
+                **self.config
+            )
+        return self._pool
     
-    def get_connection(self):
+    def get_connection(self, lectura=False):
+        """
+        Conexión del pool; connection.close() la devuelve al pool
+
+        Con lectura=True se usa una réplica (por turnos) salvo que el contexto
+        acabe de escribir; si ninguna réplica responde, el primario.
+        """
+        if lectura and self.replica_configs and time.time() >= _primario_hasta.get():
+            connection = self._replica_connection()
+            if connection is not None:
+                return connection
         try:
-            connection = mysql.connector.connect(**self.config)
-            return connection
+            return self.get_pool().get_connection()
         except Error as e:
             print(f"Error de conexión a la base de datos: {e}")
             raise e
     
+    def _get_replica_pool(self, indice):
+        if indice not in self._replica_pools:
+            self._replica_pools[indice] = pooling.MySQLConnectionPool(
+                pool_name=f"refugio_{os.getpid()}_{self.nombre}_r{indice}",
+                pool_size=self.replica_pool_size,
+                pool_reset_session=True,
+                **self.replica_configs[indice]
+            )
+        return self._replica_pools[indice]
+    
+    def _replica_connection(self):
+        total = len(self.replica_configs)
+        inicio = next(self._turno)
+        ahora = time.time()
+        for paso in range(total):
+            indice = (inicio + paso) % total
+            if self._replica_caida_hasta.get(indice, 0) > ahora:
+                continue
+            try:
+                return self._get_replica_pool(indice).get_connection()
+            except PoolError:
+                # Pool agotado: la réplica está bien, solo ocupada
+                continue
+            except Error as e:
+                host = self.replica_configs[indice]['host']
+                print(f"⚠️ Réplica {host} no disponible ({e}); se reintenta en {self.replica_reintento:.0f}s")
+                self._replica_caida_hasta[indice] = ahora + self.replica_reintento
+        return None
+    
+    def marcar_escritura(self):
+        """Leer del primario durante sticky_segundos en este contexto"""
+        hasta = time.time() + self.sticky_segundos
+        _primario_hasta.set(hasta)
+        return hasta
+    
+    def warm_pool(self):
+        """Abrir todas las conexiones del pool antes de recibir tráfico"""
+        connections = []
+        try:
+            for _ in range(self.pool_size):
+                connection = self.get_connection()
+                connection.ping(reconnect=True)
+                connections.append(connection)
+            print(f"✅ Pool de conexiones de '{self.nombre}' listo ({len(connections)} conexiones, pid {os.getpid()})")
+            for indice, config in enumerate(self.replica_configs):
+                try:
+                    self._get_replica_pool(indice)
+                    print(f"✅ Réplica {config['host']} lista")
+                except Error as e:
+                    print(f"⚠️ Réplica {config['host']} no disponible al arrancar: {e}")
+                    self._replica_caida_hasta[indice] = time.time() + self.replica_reintento
+            return True
+        except Error as e:
+            print(f"❌ Error precalentando el pool: {e}")
+            return False
+        finally:
+            for connection in connections:
+                connection.close()
+    
     def create_database_if_not_exists(self):
         """Crear la base de datos si no existe"""
         try:
@@ -40,39 +152,29 @@ class Database:
             print(f"❌ Error creando base de datos: {e}")
             return False
     
-    def initialize_tables(self):
-        """Ejecutar el script init.sql automáticamente"""
+    def initialize_tables(self, seed=False):
+        """Aplicar las migraciones pendientes de sql/migrations (ver migrations.py)"""
+        from migrations import Migrador, MigracionError
+        
+        # Conexiones directas y no del pool: se usa también desde el master de
+        # gunicorn, que no debe heredar sockets a los workers.
+        migrador = Migrador(lambda: mysql.connector.connect(**self.config))
         try:
-            connection = self.get_connection()
-            cursor = connection.cursor()
-            
-            # Leer y ejecutar init.sql
-            with open('sql/init.sql', 'r', encoding='utf-8') as file:
-                sql_script = file.read()
-            
-            # Dividir en statements individuales y ejecutar
-            statements = sql_script.split(';')
-            for statement in statements:
-                statement = statement.strip()
-                if statement:
-                    cursor.execute(statement)
-            
-            connection.commit()
+            migrador.aplicar()
+            if seed:
+                migrador.cargar_seed()
             print("✅ Tablas inicializadas correctamente")
-            
-            cursor.close()
-            connection.close()
             return True
-        except Error as e:
+        except (Error, MigracionError) as e:
             print(f"❌ Error inicializando tablas: {e}")
             return False
     
-    def setup_database(self):
+    def setup_database(self, seed=False):
         """Setup completo de la base de datos"""
         print("🗄️ Configurando base de datos...")
         
         if self.create_database_if_not_exists():
-            if self.initialize_tables():
+            if self.initialize_tables(seed=seed):
                 print("✅ Base de datos configurada exitosamente")
                 return True
         
@@ -90,6 +192,125 @@ class Database:
             print(f"❌ Error de conexión: {e}")
             return False
 
+class ReadYourWritesMiddleware:
+    """
+    Lecturas consistentes con las escrituras propias cuando hay réplicas
+
+    Tras un POST/PUT/PATCH/DELETE exitoso responde con la cookie y la cabecera
+    X-Refugio-RW (epoch de vencimiento). Mientras el cliente la reenvíe y no
+    haya vencido, sus lecturas van al primario en vez de a una réplica que
+    quizá aún no recibió el cambio. El valor se acota a sticky_segundos.
+    """
+    
+    COOKIE = "refugio_rw"
+    HEADER = b"x-refugio-rw"
+    METODOS_ESCRITURA = {"POST", "PUT", "PATCH", "DELETE"}
+    
+    def __init__(self, app, database):
+        self.app = app
+        self.database = database
+    
+    def _valor_cliente(self, headers):
+        valor = headers.get(self.HEADER)
+        if valor is None:
+            for parte in headers.get(b"cookie", b"").decode("latin-1").split(";"):
+                nombre, _, contenido = parte.strip().partition("=")
+                if nombre == self.COOKIE:
+                    valor = contenido.encode()
+        try:
+            return float(valor) if valor else 0.0
+        except ValueError:
+            return 0.0
+    
+    async def __call__(self, scope, receive, send):
+        if scope["type"] != "http" or not self.database.replica_configs:
+            await self.app(scope, receive, send)
+            return
+        
+        ahora = time.time()
+        hasta = self._valor_cliente(dict(scope["headers"]))
+        if ahora < hasta <= ahora + self.database.sticky_segundos:
+            _primario_hasta.set(hasta)
+        escritura = scope["method"] in self.METODOS_ESCRITURA
+        
+        async def send_con_marca(message):
+            if escritura and message["type"] == "http.response.start" and message["status"] < 400:
+                hasta = self.database.marcar_escritura()
+                segundos = int(self.database.sticky_segundos) + 1
+                message = {**message, "headers": list(message.get("headers", [])) + [
+                    (self.HEADER, f"{hasta:.3f}".encode()),
+                    (b"set-cookie", f"{self.COOKIE}={hasta:.3f}; Max-Age={segundos}; Path=/; SameSite=Lax".encode()),
+                ]}
+            await send(message)
+        
+        await self.app(scope, receive, send_con_marca)
+
+class BasesPorRefugio:
+    """
+    Una Database (pool y réplicas propios) por refugio del despliegue
+
+    Los atributos y métodos que no se definen aquí (get_connection, config,
+    replica_configs, marcar_escritura...) se delegan en la base del refugio
+    de la petición en curso, así el código existente sigue usando db sin
+    saber en qué instancia de MySQL vive cada refugio. Los pools se crean en
+    el primer uso de cada refugio.
+    """
+    
+    def __init__(self, ruta=None):
+        self.predeterminado, self.refugios = cargar_refugios(ruta)
+        self.dominios = {
+            dominio: slug for slug, opciones in self.refugios.items() for dominio in opciones["dominios"]
+        }
+        self._bases = {}
+        self._lock = threading.Lock()
+    
+    @property
+    def slugs(self):
+        return list(self.refugios)
+    
+    @property
+    def multiples(self):
+        return len(self.refugios) > 1
+    
+    def actual(self):
+        return _refugio_actual.get() or self.predeterminado
+    
+    @contextmanager
+    def usar(self, slug):
+        """Fijar el refugio actual fuera de una petición (CLI, tareas)"""
+        if slug is not None and slug not in self.refugios:
+            raise KeyError(f"Refugio desconocido: {slug}")
+        token = _refugio_actual.set(slug)
+        try:
+            yield self.base()
+        finally:
+            _refugio_actual.reset(token)
+    
+    def base(self, slug=None):
+        slug = slug or self.actual()
+        base = self._bases.get(slug)
+        if base is None:
+            with self._lock:
+                base = self._bases.get(slug)
+                if base is None:
+                    opciones = self.refugios[slug]
+                    base = self._bases[slug] = Database(opciones["config"], opciones["replicas"], slug)
+        return base
+    
+    def __getattr__(self, nombre):
+        return getattr(self.base(), nombre)
+    
+    # Preparación del despliegue: en todos los refugios
+    
+    def warm_pool(self):
+        return all([self.base(slug).warm_pool() for slug in self.refugios])
+    
+    def initialize_tables(self, seed=False):
+        return all([self.base(slug).initialize_tables(seed=seed) for slug in self.refugios])
+    
+    def setup_database(self, seed=False):
+        return all([self.base(slug).setup_database(seed=seed) for slug in self.refugios])
+
 # Instancia global
-db = Database()
+db = BasesPorRefugio()
 
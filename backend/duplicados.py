@@ -0,0 +1,91 @@
+"""
+Detección de envíos duplicados
+
+Antes de insertar un formulario se busca un registro vigente de la misma
+persona, comparando teléfono y email normalizados (validation.normalize_phone
+/ normalize_email, columnas telefono_norm / email_norm de la migración 006).
+Cada columna se consulta en su propia rama del UNION ALL, así cada rama es
+un salto en su índice compuesto (clave normalizada + filtro de la regla) en
+vez de un recorrido de la tabla.
+
+Solo se miran las tablas calientes: lo archivado está cerrado por definición.
+"""
+
+import os
+
+DUPLICADOS_VENTANA_MIN = int(os.getenv("DUPLICADOS_VENTANA_MIN", "10"))
+
+
+class EnvioDuplicado(Exception):
+    """Ya existe un registro vigente de la misma persona (se responde 409)"""
+
+    def __init__(self, mensaje, id_existente):
+        super().__init__(mensaje)
+        self.id_existente = id_existente
+
+
+class Regla:
+    def __init__(self, tabla, columnas, condicion, mensaje):
+        self.tabla = tabla
+        # Claves normalizadas que se comparan (colaboradores no tiene teléfono)
+        self.columnas = columnas
+        # Filtro adicional con sus propios %s (los valores llegan en 'extra')
+        self.condicion = condicion
+        self.mensaje = mensaje
+
+
+REGLAS = {
+    "solicitud_adopcion": Regla(
+        "solicitudes_adopcion", ("telefono_norm", "email_norm"),
+        "mascota_id = %s AND estado IN ('pendiente', 'revisando')",
+        "Ya tienes una solicitud de adopción en curso para esta mascota con ese teléfono o email",
+    ),
+    "solicitud_voluntariado": Regla(
+        "solicitudes_voluntariado", ("telefono_norm", "email_norm"),
+        "estado IN ('pendiente', 'revisando', 'aprobado')",
+        "Ya existe una solicitud de voluntariado con ese teléfono o email",
+    ),
+    # Una donación repetida solo es duplicada si llega enseguida (doble envío)
+    "donacion": Regla(
+        "donaciones", ("telefono_norm",),
+        "tipo_donacion = %s AND monto <=> %s AND created_at >= NOW() - INTERVAL %s MINUTE",
+        "Esta donación ya fue registrada hace unos minutos",
+    ),
+    "apadrinamiento": Regla(
+        "apadrinamientos", ("telefono_norm", "email_norm"),
+        "estado IN ('pendiente', 'activo', 'pausado')",
+        "Ya tienes un apadrinamiento vigente con ese teléfono o email",
+    ),
+    "colaborador_difusion": Regla(
+        "colaboradores_difusion", ("email_norm",),
+        "estado = 'activo'",
+        "Ese email ya está registrado como colaborador de difusión",
+    ),
+}
+
+
+def consulta_duplicado(tipo, telefono_norm=None, email_norm=None, extra=()):
+    """(sql, params) de la búsqueda, o None si no hay claves para comparar"""
+    regla = REGLAS[tipo]
+    valores = {"telefono_norm": telefono_norm, "email_norm": email_norm}
+    ramas, params = [], []
+    for columna in regla.columnas:
+        if valores[columna]:
+            ramas.append(
+                f"(SELECT id FROM {regla.tabla} WHERE {columna} = %s AND {regla.condicion} LIMIT 1)"
+            )
+            params += [valores[columna], *extra]
+    if not ramas:
+        return None
+    return " UNION ALL ".join(ramas) + " LIMIT 1", params
+
+
+def verificar_duplicado(cursor, tipo, telefono_norm=None, email_norm=None, extra=()):
+    """Lanzar EnvioDuplicado si la persona ya tiene un registro vigente"""
+    consulta = consulta_duplicado(tipo, telefono_norm, email_norm, extra)
+    if consulta is None:
+        return
+    cursor.execute(*consulta)
+    filas = cursor.fetchall()
+    if filas:
+        raise EnvioDuplicado(REGLAS[tipo].mensaje, filas[0][0])
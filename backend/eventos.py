@@ -0,0 +1,259 @@
+"""
+Eventos en vivo del catálogo (Server-Sent Events)
+
+Los endpoints que escriben publican eventos compactos después del commit
+(mascota creada/actualizada/eliminada, envíos nuevos, cambios de estado) y
+GET /eventos los reenvía a los navegadores suscritos. Así el frontend aplica
+el cambio sobre la lista que ya tiene en vez de volver a descargar el
+catálogo completo.
+
+Cada conexión SSE es una corrutina esperando en su propia cola asyncio: una
+conexión inactiva solo ocupa esa cola y un latido cada EVENTOS_PING segundos,
+por eso un worker sostiene miles sin tocar MySQL ni el control de admisión.
+
+Difusión:
+- BrokerLocal: en memoria del worker (un solo worker o desarrollo).
+- BrokerRedis (EVENTOS_REDIS_URL): cada worker publica en un canal de Redis
+  y una tarea por worker reenvía lo recibido a sus suscriptores locales, así
+  todos los navegadores reciben los eventos de todos los workers.
+
+Cada evento lleva el refugio en que ocurrió (refugios.py) y una conexión
+solo recibe los de su refugio, aunque todos compartan el canal de Redis.
+
+Los eventos viajan a un endpoint público: solo llevan datos que ya publica
+GET /mascotas o identificadores, nunca nombres, teléfonos ni emails de los
+formularios.
+"""
+
+import asyncio
+import itertools
+import os
+import time
+from collections import deque
+
+import orjson
+
+from database import db
+from responses import _default
+
+EVENTOS_COLA = int(os.getenv("EVENTOS_COLA", "100"))
+EVENTOS_HISTORIAL = int(os.getenv("EVENTOS_HISTORIAL", "500"))
+EVENTOS_PING = float(os.getenv("EVENTOS_PING", "15"))
+EVENTOS_MAX_CONEXIONES = int(os.getenv("EVENTOS_MAX_CONEXIONES", "5000"))
+EVENTOS_CANAL = os.getenv("EVENTOS_CANAL", "refugio:eventos")
+
+# Evento que pide al cliente volver a cargar la lista completa: se envía
+# cuando no se pueden reponer los eventos perdidos (Last-Event-ID demasiado
+# viejo) o cuando el cliente no consume su cola a tiempo.
+RESYNC = {"tipo": "resync"}
+
+
+def serializar(evento):
+    return orjson.dumps(evento, default=_default)
+
+
+def formato_sse(evento):
+    """Un evento en formato text/event-stream (todos van como 'message')"""
+    cabecera = f"id: {evento['id']}\n" if "id" in evento else ""
+    return f"{cabecera}data: {serializar(evento).decode()}\n\n"
+
+
+class Suscripcion:
+    def __init__(self, tipos=None, max_cola=EVENTOS_COLA, refugio=None):
+        self.cola = asyncio.Queue(max_cola)
+        # Prefijos aceptados ("mascota", "envio", "estado"); None = todos
+        self.tipos = tipos
+        self.refugio = refugio or db.predeterminado
+        self.desbordada = False
+
+    def acepta(self, evento):
+        if evento.get("refugio", db.predeterminado) != self.refugio:
+            return False
+        return not self.tipos or evento["tipo"].split(".")[0] in self.tipos
+
+
+class LimiteConexiones(Exception):
+    """El worker ya sostiene EVENTOS_MAX_CONEXIONES conexiones"""
+
+
+# ==========================================
+# BROKERS
+# ==========================================
+
+class BrokerLocal:
+    """Fan-out en memoria del worker, con historial para Last-Event-ID"""
+
+    def __init__(self, historial=EVENTOS_HISTORIAL, max_cola=EVENTOS_COLA,
+                 max_conexiones=EVENTOS_MAX_CONEXIONES):
+        # Prefijo de los ids: único por proceso y arranque
+        self.origen = f"{os.getpid():x}{int(time.time()):x}"
+        self._secuencia = itertools.count(1)
+        self._historial = deque(maxlen=historial)
+        self._suscripciones = set()
+        self.max_cola = max_cola
+        self.max_conexiones = max_conexiones
+        self.publicados = 0
+        self.desbordes = 0
+
+    def nuevo_evento(self, tipo, datos):
+        return {"id": f"{self.origen}-{next(self._secuencia)}", "tipo": tipo, "refugio": db.actual(), "datos": datos}
+
+    def publicar(self, tipo, datos):
+        """Publicar un evento; se llama desde el event loop tras el commit"""
+        self.publicados += 1
+        self.difundir(self.nuevo_evento(tipo, datos))
+
+    def difundir(self, evento):
+        self._historial.append(evento)
+        for suscripcion in list(self._suscripciones):
+            if not suscripcion.acepta(evento):
+                continue
+            try:
+                suscripcion.cola.put_nowait(evento)
+            except asyncio.QueueFull:
+                # Cliente lento: se le pide resincronizar en vez de acumular
+                # eventos sin límite en memoria del worker.
+                suscripcion.desbordada = True
+                self.desbordes += 1
+                self._suscripciones.discard(suscripcion)
+
+    def pendientes_desde(self, ultimo_id):
+        """Eventos posteriores a ultimo_id, o None si ya no están en el historial"""
+        eventos = list(self._historial)
+        for i, evento in enumerate(eventos):
+            if evento["id"] == ultimo_id:
+                return eventos[i + 1:]
+        return None
+
+    def suscribir(self, tipos=None):
+        if len(self._suscripciones) >= self.max_conexiones:
+            raise LimiteConexiones()
+        suscripcion = Suscripcion(tipos, self.max_cola, db.actual())
+        self._suscripciones.add(suscripcion)
+        return suscripcion
+
+    def desuscribir(self, suscripcion):
+        self._suscripciones.discard(suscripcion)
+
+    async def iniciar(self):
+        pass
+
+    async def cerrar(self):
+        """Terminar los flujos abiertos para que el worker pueda apagarse"""
+        for suscripcion in list(self._suscripciones):
+            try:
+                suscripcion.cola.put_nowait(None)
+            except asyncio.QueueFull:
+                suscripcion.desbordada = True
+        self._suscripciones.clear()
+
+    def resumen(self):
+        return {
+            "pid": os.getpid(),
+            "broker": type(self).__name__,
+            "conexiones": len(self._suscripciones),
+            "publicados": self.publicados,
+            "historial": len(self._historial),
+            "desbordes": self.desbordes,
+        }
+
+
+class BrokerRedis(BrokerLocal):
+    """Fan-out entre workers con Redis PUBLISH/SUBSCRIBE"""
+
+    def __init__(self, url, canal=EVENTOS_CANAL, **kwargs):
+        super().__init__(**kwargs)
+        import redis.asyncio as redis_async
+        self.redis = redis_async.from_url(url)
+        self.canal = canal
+        self._escucha = None
+        self._envios = set()
+
+    def publicar(self, tipo, datos):
+        self.publicados += 1
+        evento = self.nuevo_evento(tipo, datos)
+        # El evento vuelve por la suscripción (también a este worker); la
+        # tarea se guarda para que no la recoja el recolector antes de tiempo
+        tarea = asyncio.get_running_loop().create_task(self._enviar(evento))
+        self._envios.add(tarea)
+        tarea.add_done_callback(self._envios.discard)
+
+    async def _enviar(self, evento):
+        try:
+            await self.redis.publish(self.canal, serializar(evento))
+        except Exception as e:
+            print(f"⚠️ Redis no disponible para eventos ({e}); solo se notifica a este worker")
+            self.difundir(evento)
+
+    async def _escuchar(self):
+        while True:
+            pubsub = self.redis.pubsub()
+            try:
+                await pubsub.subscribe(self.canal)
+                async for mensaje in pubsub.listen():
+                    if mensaje["type"] == "message":
+                        self.difundir(orjson.loads(mensaje["data"]))
+            except asyncio.CancelledError:
+                raise
+            except Exception as e:
+                print(f"⚠️ Se perdió la suscripción de eventos en Redis ({e}); reintentando en 5s")
+                # Lo publicado mientras tanto no llega: los clientes resincronizan
+                for suscripcion in list(self._suscripciones):
+                    suscripcion.desbordada = True
+                self._suscripciones.clear()
+                await asyncio.sleep(5)
+            finally:
+                await pubsub.close()
+
+    async def iniciar(self):
+        self._escucha = asyncio.create_task(self._escuchar())
+
+    async def cerrar(self):
+        if self._escucha:
+            self._escucha.cancel()
+        await super().cerrar()
+        await self.redis.close()
+
+
+def crear_broker():
+    url = os.getenv("EVENTOS_REDIS_URL")
+    if url:
+        return BrokerRedis(url)
+    return BrokerLocal()
+
+
+# ==========================================
+# FLUJO SSE
+# ==========================================
+
+async def flujo_sse(broker, suscripcion, ultimo_id=None, ping=EVENTOS_PING):
+    """Generador de text/event-stream para una suscripción"""
+    try:
+        # El navegador reconecta a los 3 s y envía Last-Event-ID
+        yield "retry: 3000\n\n"
+        if ultimo_id:
+            pendientes = broker.pendientes_desde(ultimo_id)
+            if pendientes is None:
+                yield formato_sse(RESYNC)
+            else:
+                for evento in pendientes:
+                    if suscripcion.acepta(evento):
+                        yield formato_sse(evento)
+        while True:
+            if suscripcion.desbordada:
+                yield formato_sse(RESYNC)
+                return
+            try:
+                evento = await asyncio.wait_for(suscripcion.cola.get(), timeout=ping)
+            except asyncio.TimeoutError:
+                # Latido: mantiene viva la conexión a través de proxies
+                yield ": ping\n\n"
+                continue
+            if evento is None:
+                return
+            yield formato_sse(evento)
+    finally:
+        broker.desuscribir(suscripcion)
+
+
+broker = crear_broker()
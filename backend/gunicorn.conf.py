@@ -0,0 +1,60 @@
+"""
+Configuración de producción del backend (gunicorn + workers de uvicorn)
+
+Toda la configuración del servidor vive aquí y se controla por variables de
+entorno, para que Dockerfile, docker-compose y el modo manual usen lo mismo:
+
+    gunicorn -c gunicorn.conf.py main:app
+"""
+
+import multiprocessing
+import os
+import sys
+
+# Dirección de escucha
+host = os.getenv("HOST", "0.0.0.0")
+port = int(os.getenv("PORT", "8001"))
+bind = f"{host}:{port}"
+
+# Workers: WEB_CONCURRENCY manda; si no, 2 * núcleos + 1 (tope configurable)
+_cpus = multiprocessing.cpu_count()
+workers = int(os.getenv("WEB_CONCURRENCY", min(_cpus * 2 + 1, int(os.getenv("MAX_WORKERS", "8")))))
+worker_class = "uvicorn.workers.UvicornWorker"
+
+# Cada worker crea su propio pool de MySQL en el arranque; no precargar la app
+# en el master evita compartir sockets entre procesos tras el fork.
+preload_app = False
+
+# Apagado ordenado: al recibir SIGTERM los workers dejan de aceptar conexiones
+# y tienen graceful_timeout segundos para terminar las peticiones en curso.
+graceful_timeout = int(os.getenv("GRACEFUL_TIMEOUT", "30"))
+timeout = int(os.getenv("WORKER_TIMEOUT", "60"))
+keepalive = int(os.getenv("KEEPALIVE", "5"))
+
+# Reciclar workers periódicamente para acotar fugas de memoria
+max_requests = int(os.getenv("MAX_REQUESTS", "2000"))
+max_requests_jitter = int(os.getenv("MAX_REQUESTS_JITTER", "200"))
+
+accesslog = os.getenv("ACCESS_LOG", "-")
+errorlog = "-"
+loglevel = os.getenv("LOG_LEVEL", "info")
+
+
+# Migraciones del esquema antes de levantar workers (una sola vez, en el master)
+migrar_al_iniciar = os.getenv("MIGRAR_AL_INICIAR", "false").lower() == "true"
+seed_al_iniciar = os.getenv("SEED_AL_INICIAR", "false").lower() == "true"
+
+
+def on_starting(server):
+    print(f"🚀 Iniciando {workers} workers en {bind} ({_cpus} CPUs detectadas)")
+    if migrar_al_iniciar:
+        sys.path.insert(0, os.path.dirname(os.path.abspath(__file__)))
+        from database import db
+        # La base ya existe (MYSQL_DATABASE en docker-compose); sin esquema al
+        # día no se atiende tráfico
+        if not db.initialize_tables(seed=seed_al_iniciar):
+            raise RuntimeError("No se pudieron aplicar las migraciones")
+
+
+def worker_exit(server, worker):
+    print(f"🛑 Worker {worker.pid} detenido")
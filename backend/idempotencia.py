@@ -0,0 +1,69 @@
+"""
+Claves de idempotencia (cabecera Idempotency-Key) para los POST
+
+El cliente genera una clave por envío y la repite si reintenta (timeout,
+doble clic, red inestable). La primera respuesta exitosa se guarda en
+claves_idempotencia en la misma transacción que el registro, así un
+reintento recibe exactamente la misma respuesta en vez de crear otra fila.
+Si dos peticiones con la misma clave llegan a la vez, la segunda choca con
+la clave primaria, hace rollback de su INSERT y devuelve la respuesta de la
+primera.
+
+Las claves duran al menos IDEMPOTENCIA_HORAS: el trabajo de archivo del
+pipeline borra las más antiguas.
+
+La huella (sha256 del contenido validado) detecta una clave reutilizada con
+otro formulario: eso es un error del cliente y se responde 422.
+"""
+
+import hashlib
+import os
+import re
+
+import orjson
+
+from responses import _default
+
+IDEMPOTENCIA_HORAS = int(os.getenv("IDEMPOTENCIA_HORAS", "24"))
+CLAVE_RE = re.compile(r"^[A-Za-z0-9_.:\-]{8,100}$")
+
+CLAVE_INVALIDA = "Idempotency-Key inválida: use entre 8 y 100 caracteres (letras, números, '-', '_', '.', ':')"
+CLAVE_REUTILIZADA = "Idempotency-Key ya usada con otro contenido; genere una clave nueva para cada envío"
+
+
+class ClaveReutilizada(Exception):
+    """La clave ya se usó con un contenido distinto (se responde 422)"""
+
+
+def clave_valida(clave):
+    return bool(CLAVE_RE.match(clave))
+
+
+def huella(tipo, params):
+    """sha256 del tipo de envío y sus parámetros ya validados"""
+    return hashlib.sha256(orjson.dumps([tipo, list(params)], default=_default)).hexdigest()
+
+
+def buscar(cursor, tipo, clave, huella_envio):
+    """(status_code, respuesta) guardados para la clave, o None si es nueva"""
+    cursor.execute(
+        "SELECT huella, status_code, respuesta FROM claves_idempotencia WHERE tipo = %s AND clave = %s",
+        (tipo, clave)
+    )
+    filas = cursor.fetchall()
+    if not filas:
+        return None
+    huella_guardada, status_code, respuesta = filas[0]
+    if huella_guardada != huella_envio:
+        raise ClaveReutilizada(CLAVE_REUTILIZADA)
+    return status_code, orjson.loads(respuesta)
+
+
+def guardar(cursor, tipo, clave, huella_envio, status_code, respuesta):
+    """Registrar la respuesta; va en la transacción del INSERT del envío"""
+    # Una clave repetida lanza IntegrityError: la otra petición ganó
+    cursor.execute(
+        "INSERT INTO claves_idempotencia (tipo, clave, huella, status_code, respuesta) "
+        "VALUES (%s, %s, %s, %s, %s)",
+        (tipo, clave, huella_envio, status_code, orjson.dumps(respuesta, default=_default).decode())
+    )
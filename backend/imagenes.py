@@ -0,0 +1,291 @@
+"""
+Hash perceptual de las fotos y búsqueda de mascotas repetidas
+
+La misma mascota suele registrarse dos veces con fotos parecidas (otro
+recorte, otra compresión, otro tamaño). Cada imagen subida se resume en un
+dHash de 64 bits: se reduce a 9x8 en escala de grises y cada bit dice si un
+píxel es más claro que su vecino de la derecha. Fotos casi iguales dan
+hashes a pocos bits de distancia (Hamming), aunque los bytes del archivo
+sean distintos.
+
+- upload-image calcula el hash al recibir la imagen y lo guarda en
+  imagenes_hash (migración 007).
+- crear_mascota busca las mascotas cuya foto está a IMAGENES_DISTANCIA_MAX
+  bits o menos y las devuelve como advertencia; el registro no se bloquea.
+- IndiceImagenes mantiene en cada worker, uno por refugio, un arreglo NumPy
+  uint64 con los hashes de las mascotas: la distancia a todas se calcula con un XOR
+  vectorizado y un conteo de bits por tabla, sin recorrer fila por fila.
+- python imagenes.py indexar calcula los hashes de las imágenes que ya
+  están en uploads/ con un pool de procesos.
+
+Pillow y NumPy se importan en su primer uso, como httpx y bleach en main.py.
+"""
+
+import argparse
+import os
+import sys
+import time
+from concurrent.futures import ProcessPoolExecutor
+from pathlib import Path
+
+from refugios import PorRefugio
+
+UPLOAD_DIR = Path(os.getenv("UPLOAD_DIR", str(Path(__file__).parent / "uploads")))
+EXTENSIONES = {".jpg", ".jpeg", ".png", ".gif", ".webp"}
+
+IMAGENES_DISTANCIA_MAX = int(os.getenv("IMAGENES_DISTANCIA_MAX", "10"))
+IMAGENES_MAX_RESULTADOS = int(os.getenv("IMAGENES_MAX_RESULTADOS", "5"))
+# Cada cuánto se recarga el índice completo (fotos cambiadas o mascotas
+# borradas); entre recargas solo se agregan las mascotas nuevas.
+IMAGENES_RECARGA_S = float(os.getenv("IMAGENES_RECARGA_S", "300"))
+
+ANCHO_HASH, ALTO_HASH = 9, 8
+
+
+# ==========================================
+# HASH
+# ==========================================
+
+def dhash(origen):
+    """dHash de 64 bits de una imagen (ruta, archivo o bytes)"""
+    import io
+
+    import numpy as np
+    from PIL import Image, ImageOps
+
+    if isinstance(origen, (bytes, bytearray)):
+        origen = io.BytesIO(origen)
+    with Image.open(origen) as imagen:
+        # draft: el decodificador JPEG reduce la imagen al leerla (DCT), así
+        # una foto de 5 MB no se descomprime a tamaño completo
+        imagen.draft("L", (ANCHO_HASH * 8, ALTO_HASH * 8))
+        imagen = ImageOps.exif_transpose(imagen).convert("L")
+        pixeles = np.asarray(imagen.resize((ANCHO_HASH, ALTO_HASH), Image.LANCZOS), dtype=np.int16)
+    bits = (pixeles[:, 1:] > pixeles[:, :-1]).ravel()
+    return int.from_bytes(np.packbits(bits).tobytes(), "big")
+
+
+def url_local(imagen_url):
+    """Ruta en uploads/ de una URL /uploads/<archivo>, o None si es externa"""
+    if not imagen_url or not imagen_url.startswith("/uploads/"):
+        return None
+    ruta = UPLOAD_DIR / Path(imagen_url).name
+    return ruta if ruta.is_file() else None
+
+
+def guardar_hash(cursor, imagen_url, valor):
+    cursor.execute(
+        "INSERT INTO imagenes_hash (imagen_url, dhash) VALUES (%s, %s) "
+        "ON DUPLICATE KEY UPDATE dhash = VALUES(dhash)",
+        (imagen_url, valor)
+    )
+
+
+def hash_de_url(cursor, imagen_url):
+    """Hash guardado de la imagen; si falta y el archivo es local, se calcula y guarda"""
+    cursor.execute("SELECT dhash FROM imagenes_hash WHERE imagen_url = %s", (imagen_url,))
+    filas = cursor.fetchall()
+    if filas:
+        return int(filas[0][0])
+    ruta = url_local(imagen_url)
+    if ruta is None:
+        return None
+    valor = dhash(ruta)
+    guardar_hash(cursor, imagen_url, valor)
+    return valor
+
+
+# ==========================================
+# ÍNDICE EN MEMORIA
+# ==========================================
+
+class IndiceImagenes:
+    """Hashes de las fotos de las mascotas en arreglos NumPy, por worker"""
+
+    def __init__(self, recarga_s=IMAGENES_RECARGA_S):
+        self.recarga_s = recarga_s
+        self.ids = None
+        self.hashes = None
+        self.ultimo_id = 0
+        self.cargado = 0.0
+        self._popcount = None
+
+    def _cargar(self, cursor, desde_id=0):
+        import numpy as np
+        cursor.execute(
+            "SELECT m.id, h.dhash FROM mascotas m JOIN imagenes_hash h ON h.imagen_url = m.imagen_url "
+            "WHERE m.id > %s ORDER BY m.id",
+            (desde_id,)
+        )
+        filas = cursor.fetchall()
+        ids = np.fromiter((f[0] for f in filas), dtype=np.int64, count=len(filas))
+        hashes = np.fromiter((int(f[1]) for f in filas), dtype=np.uint64, count=len(filas))
+        return ids, hashes
+
+    def actualizar(self, cursor):
+        """Recarga completa cada recarga_s; si no, solo las mascotas nuevas (id mayor)"""
+        import numpy as np
+        ahora = time.monotonic()
+        if self.ids is None or ahora - self.cargado >= self.recarga_s:
+            self.ids, self.hashes = self._cargar(cursor)
+            self.cargado = ahora
+        else:
+            ids, hashes = self._cargar(cursor, self.ultimo_id)
+            if len(ids):
+                self.ids = np.concatenate([self.ids, ids])
+                self.hashes = np.concatenate([self.hashes, hashes])
+        if len(self.ids):
+            self.ultimo_id = int(self.ids[-1])
+
+    def distancias(self, valor):
+        """Distancia de Hamming de 'valor' a todos los hashes del índice"""
+        import numpy as np
+        if self._popcount is None:
+            self._popcount = np.array([bin(i).count("1") for i in range(256)], dtype=np.uint8)
+        xor = self.hashes ^ np.uint64(valor)
+        # Cada uint64 son 8 bytes: bits por byte con la tabla y suma por fila
+        return self._popcount[xor.view(np.uint8)].reshape(-1, 8).sum(axis=1, dtype=np.uint8)
+
+    def buscar(self, valor, distancia_max=IMAGENES_DISTANCIA_MAX, limite=IMAGENES_MAX_RESULTADOS, excluir=()):
+        """[(mascota_id, distancia)] de las fotos más parecidas, de menor a mayor distancia"""
+        import numpy as np
+        if self.hashes is None or not len(self.hashes):
+            return []
+        distancias = self.distancias(valor)
+        candidatos = np.flatnonzero(distancias <= distancia_max)
+        candidatos = candidatos[np.argsort(distancias[candidatos], kind="stable")]
+        resultado = []
+        for i in candidatos:
+            mascota_id = int(self.ids[i])
+            if mascota_id not in excluir:
+                resultado.append((mascota_id, int(distancias[i])))
+            if len(resultado) >= limite:
+                break
+        return resultado
+
+
+# Cada refugio tiene sus propias mascotas (y su propia base)
+indices = PorRefugio(IndiceImagenes)
+
+
+def posibles_duplicados(connection, imagen_url, excluir_id=None):
+    """
+    Mascotas con una foto casi igual a imagen_url, para advertir al registrar
+
+    Los candidatos del índice se confirman contra la tabla: una mascota
+    borrada o con otra foto desde la última recarga no se informa. Si el
+    hash de imagen_url faltaba se guarda: el llamador hace el commit.
+    connection es del refugio actual (db.get_connection()).
+    """
+    if not imagen_url:
+        return []
+    indice = indices.actual()
+    cursor = connection.cursor()
+    try:
+        valor = hash_de_url(cursor, imagen_url)
+        if valor is None:
+            return []
+        indice.actualizar(cursor)
+        candidatos = dict(indice.buscar(valor, excluir={excluir_id}))
+        if not candidatos:
+            return []
+        marcadores = ", ".join(["%s"] * len(candidatos))
+        cursor.execute(
+            f"SELECT m.id, m.nombre, m.especie, m.imagen_url FROM mascotas m "
+            f"JOIN imagenes_hash h ON h.imagen_url = m.imagen_url "
+            f"WHERE m.id IN ({marcadores}) AND BIT_COUNT(h.dhash ^ %s) <= %s",
+            [*candidatos, valor, IMAGENES_DISTANCIA_MAX]
+        )
+        encontrados = [
+            {"id": id_, "nombre": nombre, "especie": especie, "imagen_url": url, "distancia": candidatos[id_]}
+            for id_, nombre, especie, url in cursor.fetchall()
+        ]
+        return sorted(encontrados, key=lambda m: (m["distancia"], m["id"]))
+    finally:
+        cursor.close()
+
+
+# ==========================================
+# INDEXADO DE LAS IMÁGENES EXISTENTES (CLI)
+# ==========================================
+
+def _hash_archivo(ruta):
+    """Tarea del pool: (url, hash) o (url, None) si la imagen no se puede leer"""
+    try:
+        return f"/uploads/{ruta.name}", dhash(ruta)
+    except Exception as e:
+        print(f"⚠️ {ruta.name}: {e}")
+        return f"/uploads/{ruta.name}", None
+
+
+def indexar(connection, directorio=UPLOAD_DIR, procesos=None, lote=500, todas=False, log=print):
+    """Calcular en paralelo los hashes que faltan en imagenes_hash; devuelve cuántos se guardaron"""
+    cursor = connection.cursor()
+    try:
+        cursor.execute("SELECT imagen_url FROM imagenes_hash")
+        filas = cursor.fetchall()
+        ya_indexadas = set() if todas else {fila[0] for fila in filas}
+        rutas = [
+            ruta for ruta in sorted(Path(directorio).iterdir())
+            if ruta.suffix.lower() in EXTENSIONES and f"/uploads/{ruta.name}" not in ya_indexadas
+        ]
+        log(f"🖼️ {len(rutas)} imágenes por indexar en {directorio}")
+        guardadas, pendientes = 0, []
+        inicio = time.perf_counter()
+        # Decodificar imágenes es CPU puro: un proceso por núcleo
+        with ProcessPoolExecutor(max_workers=procesos) as pool:
+            for url, valor in pool.map(_hash_archivo, rutas, chunksize=32):
+                if valor is None:
+                    continue
+                pendientes.append((url, valor))
+                if len(pendientes) >= lote:
+                    guardadas += _guardar_lote(connection, cursor, pendientes)
+                    pendientes = []
+        guardadas += _guardar_lote(connection, cursor, pendientes)
+        log(f"✅ {guardadas} hashes guardados en {time.perf_counter() - inicio:.1f} s")
+        return guardadas
+    finally:
+        cursor.close()
+
+
+def _guardar_lote(connection, cursor, filas):
+    if not filas:
+        return 0
+    cursor.executemany(
+        "INSERT INTO imagenes_hash (imagen_url, dhash) VALUES (%s, %s) "
+        "ON DUPLICATE KEY UPDATE dhash = VALUES(dhash)",
+        filas
+    )
+    connection.commit()
+    return len(filas)
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Hashes perceptuales de las imágenes subidas")
+    sub = parser.add_subparsers(dest="comando", required=True)
+    parser.add_argument("--refugio", metavar="SLUG", help="Refugio cuya base se usa (por defecto, el predeterminado)")
+    cmd = sub.add_parser("indexar", help="Calcular los hashes de uploads/ que faltan")
+    cmd.add_argument("--procesos", type=int, default=None, help="Procesos del pool (por defecto, uno por núcleo)")
+    cmd.add_argument("--todas", action="store_true", help="Recalcular también las ya indexadas")
+    cmd.add_argument("--directorio", default=str(UPLOAD_DIR))
+    cmd = sub.add_parser("buscar", help="Mascotas con una foto parecida a la indicada")
+    cmd.add_argument("imagen_url", help="URL guardada en mascotas.imagen_url (/uploads/...)")
+    args = parser.parse_args(argv)
+
+    from database import db
+    with db.usar(args.refugio):
+        connection = db.get_connection()
+        try:
+            if args.comando == "indexar":
+                indexar(connection, args.directorio, args.procesos, todas=args.todas)
+            else:
+                for mascota in posibles_duplicados(connection, args.imagen_url):
+                    print(f"{mascota['distancia']:>2} bits  #{mascota['id']} {mascota['nombre']} ({mascota['imagen_url']})")
+                connection.commit()
+        finally:
+            connection.close()
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
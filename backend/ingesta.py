@@ -0,0 +1,327 @@
+"""
+Ingesta con escritura diferida (write-behind) para formularios públicos
+
+Modo opcional (INGESTA_BUFFER=true) para picos de tráfico: los envíos ya
+validados se guardan en una cola local durable (SQLite en modo WAL) y el
+cliente recibe de inmediato un ticket. Un worker en segundo plano los pasa a
+MySQL en lotes, con una sola transacción por lote.
+
+- Contrapresión: si hay demasiados envíos sin procesar, encolar() lanza
+  ColaLlena y la API responde 503 con Retry-After.
+- Reintentos: un lote que falla se reintenta fila por fila para aislar el
+  envío problemático; cada fallo reprograma el envío con backoff
+  exponencial hasta max_intentos, después queda como 'fallida'. Los errores
+  de datos y las filas que no se pueden insertar (params corruptos, fallo en
+  al_insertar) quedan 'fallida' al primer intento.
+- Varios workers comparten el archivo: cada lote se reclama con un lease,
+  y si un worker muere sus envíos vuelven a la cola al vencer el lease.
+
+Cada envío recuerda su refugio (refugios.py) y el worker lo inserta en la
+base de ese refugio, con una transacción por refugio dentro del lote.
+al_insertar corre en esa misma transacción (el aviso del envío en la bandeja
+de notificaciones.py).
+
+La entrega es al menos una vez: si el proceso muere entre el COMMIT en
+MySQL y el registro en la cola, el lote se insertará de nuevo.
+"""
+
+import asyncio
+import json
+import os
+import sqlite3
+import time
+import uuid
+from contextlib import contextmanager
+from pathlib import Path
+
+from mysql.connector import Error
+from mysql.connector.errors import DataError, IntegrityError
+
+from idempotencia import IDEMPOTENCIA_HORAS, ClaveReutilizada, CLAVE_REUTILIZADA
+
+
+class ColaLlena(Exception):
+    """La cola superó su capacidad; el cliente debe reintentar más tarde"""
+
+
+SCHEMA = """
+CREATE TABLE IF NOT EXISTS envios (
+    ticket TEXT PRIMARY KEY,
+    tipo TEXT NOT NULL,
+    refugio TEXT NOT NULL DEFAULT '',
+    params TEXT NOT NULL,
+    estado TEXT NOT NULL DEFAULT 'pendiente',
+    intentos INTEGER NOT NULL DEFAULT 0,
+    proximo_intento REAL NOT NULL,
+    reclamado_hasta REAL,
+    mysql_id INTEGER,
+    error TEXT,
+    creado REAL NOT NULL,
+    procesado REAL
+);
+CREATE INDEX IF NOT EXISTS idx_envios_estado ON envios(estado, proximo_intento);
+CREATE TABLE IF NOT EXISTS claves (
+    clave TEXT PRIMARY KEY,
+    huella TEXT NOT NULL,
+    ticket TEXT NOT NULL,
+    creado REAL NOT NULL
+);
+CREATE INDEX IF NOT EXISTS idx_claves_creado ON claves(creado);
+"""
+
+
+class ColaIngesta:
+    def __init__(self, path, inserts, get_connection, max_pendientes=10000,
+                 tamano_lote=200, intervalo=0.5, max_intentos=5, lease=60, al_insertar=None):
+        self.path = Path(path)
+        self.inserts = inserts
+        self.get_connection = get_connection
+        # al_insertar(cursor, refugio, tipo, params, mysql_id), o None
+        self.al_insertar = al_insertar
+        self.max_pendientes = max_pendientes
+        self.tamano_lote = tamano_lote
+        self.intervalo = intervalo
+        self.max_intentos = max_intentos
+        self.lease = lease
+        self.path.parent.mkdir(parents=True, exist_ok=True)
+        with self._sqlite() as conn:
+            conn.executescript(SCHEMA)
+            # Colas creadas antes de que hubiera varios refugios
+            columnas = {fila["name"] for fila in conn.execute("PRAGMA table_info(envios)")}
+            if "refugio" not in columnas:
+                conn.execute("ALTER TABLE envios ADD COLUMN refugio TEXT NOT NULL DEFAULT ''")
+
+    @contextmanager
+    def _sqlite(self):
+        conn = sqlite3.connect(self.path, timeout=10, isolation_level=None)
+        try:
+            conn.row_factory = sqlite3.Row
+            conn.execute("PRAGMA journal_mode=WAL")
+            # FULL: cada envío aceptado sobrevive a un corte de energía
+            conn.execute("PRAGMA synchronous=FULL")
+            yield conn
+        finally:
+            conn.close()
+
+    # ===============================
+    # LADO DE LA API
+    # ===============================
+
+    def encolar(self, tipo, params, clave=None, huella=None, refugio=""):
+        """
+        Guardar un envío validado y devolver su ticket
+
+        Con clave (Idempotency-Key) un reintento devuelve el ticket del
+        primer envío en lugar de encolarlo otra vez. Devuelve (ticket, nuevo).
+        """
+        if tipo not in self.inserts:
+            raise ValueError(f"Tipo de envío desconocido: {tipo}")
+        ticket = str(uuid.uuid4())
+        ahora = time.time()
+        if clave:
+            # La misma clave en dos refugios son dos envíos distintos
+            clave = f"{refugio}:{tipo}:{clave}"
+        with self._sqlite() as conn:
+            conn.execute("BEGIN IMMEDIATE")
+            if clave:
+                conn.execute("DELETE FROM claves WHERE creado < ?", (ahora - IDEMPOTENCIA_HORAS * 3600,))
+                previa = conn.execute(
+                    "SELECT huella, ticket FROM claves WHERE clave = ?", (clave,)
+                ).fetchone()
+                if previa:
+                    conn.execute("COMMIT")
+                    if previa["huella"] != huella:
+                        raise ClaveReutilizada(CLAVE_REUTILIZADA)
+                    return previa["ticket"], False
+            sin_procesar = conn.execute(
+                "SELECT COUNT(*) FROM envios WHERE estado IN ('pendiente', 'procesando')"
+            ).fetchone()[0]
+            if sin_procesar >= self.max_pendientes:
+                conn.execute("ROLLBACK")
+                raise ColaLlena(f"{sin_procesar} envíos pendientes")
+            conn.execute(
+                "INSERT INTO envios (ticket, tipo, refugio, params, proximo_intento, creado) VALUES (?, ?, ?, ?, ?, ?)",
+                (ticket, tipo, refugio, json.dumps(list(params), ensure_ascii=False), ahora, ahora)
+            )
+            if clave:
+                conn.execute(
+                    "INSERT INTO claves (clave, huella, ticket, creado) VALUES (?, ?, ?, ?)",
+                    (clave, huella, ticket, ahora)
+                )
+            conn.execute("COMMIT")
+        return ticket, True
+
+    def estado(self, ticket):
+        with self._sqlite() as conn:
+            fila = conn.execute(
+                "SELECT ticket, tipo, refugio, estado, intentos, mysql_id, error, creado, procesado "
+                "FROM envios WHERE ticket = ?", (ticket,)
+            ).fetchone()
+        if fila is None:
+            return None
+        resultado = dict(fila)
+        resultado["id"] = resultado.pop("mysql_id")
+        return resultado
+
+    def resumen(self):
+        with self._sqlite() as conn:
+            filas = conn.execute("SELECT estado, COUNT(*) FROM envios GROUP BY estado").fetchall()
+        return {estado: total for estado, total in filas}
+
+    # ===============================
+    # WORKER DE VOLCADO A MYSQL
+    # ===============================
+
+    def _reclamar_lote(self):
+        ahora = time.time()
+        with self._sqlite() as conn:
+            conn.execute("BEGIN IMMEDIATE")
+            filas = conn.execute(
+                """
+                SELECT ticket, tipo, refugio, params, intentos FROM envios
+                WHERE (estado = 'pendiente' AND proximo_intento <= ?)
+                   OR (estado = 'procesando' AND reclamado_hasta < ?)
+                ORDER BY creado LIMIT ?
+                """, (ahora, ahora, self.tamano_lote)
+            ).fetchall()
+            conn.executemany(
+                "UPDATE envios SET estado = 'procesando', reclamado_hasta = ? WHERE ticket = ?",
+                [(ahora + self.lease, fila["ticket"]) for fila in filas]
+            )
+            conn.execute("COMMIT")
+        return filas
+
+    def _insertar(self, cursor, fila):
+        params = tuple(json.loads(fila["params"]))
+        cursor.execute(self.inserts[fila["tipo"]], params)
+        mysql_id = cursor.lastrowid
+        if self.al_insertar:
+            self.al_insertar(cursor, fila["refugio"], fila["tipo"], params, mysql_id)
+        return mysql_id
+
+    def vaciar_lote(self):
+        """Pasar un lote a MySQL; devuelve cuántos envíos se procesaron"""
+        filas = self._reclamar_lote()
+        if not filas:
+            return 0
+
+        por_refugio = {}
+        for fila in filas:
+            por_refugio.setdefault(fila["refugio"], []).append(fila)
+        insertados, fallidos = {}, {}
+        reprogramados, caida = 0, None
+        try:
+            for refugio, grupo in por_refugio.items():
+                try:
+                    self._vaciar_refugio(refugio, grupo, insertados, fallidos)
+                except Error as e:
+                    # Esa base no está disponible: sus envíos sin resolver vuelven a
+                    # la cola y los de los demás refugios siguen
+                    pendientes = [
+                        fila for fila in grupo
+                        if fila["ticket"] not in insertados and fila["ticket"] not in fallidos
+                    ]
+                    self._reprogramar_lote(pendientes, str(e))
+                    reprogramados += len(pendientes)
+                    caida = e
+        finally:
+            # Aunque algo falle a mitad del lote, lo ya confirmado en MySQL queda
+            # como 'insertada': si volviera a 'procesando' se insertaría dos veces
+            self._registrar_resultados(insertados, fallidos)
+        if reprogramados == len(filas):
+            raise caida
+        return len(filas) - reprogramados
+
+    def _registrar_resultados(self, insertados, fallidos):
+        if not insertados and not fallidos:
+            return
+        ahora = time.time()
+        with self._sqlite() as conn:
+            conn.execute("BEGIN IMMEDIATE")
+            conn.executemany(
+                "UPDATE envios SET estado = 'insertada', mysql_id = ?, procesado = ?, error = NULL "
+                "WHERE ticket = ?",
+                [(mysql_id, ahora, ticket) for ticket, mysql_id in insertados.items()]
+            )
+            for ticket, (intentos, error) in fallidos.items():
+                estado = 'fallida' if intentos >= self.max_intentos else 'pendiente'
+                conn.execute(
+                    "UPDATE envios SET estado = ?, intentos = ?, error = ?, proximo_intento = ? "
+                    "WHERE ticket = ?",
+                    (estado, intentos, error, ahora + min(2 ** intentos, 300), ticket)
+                )
+            conn.execute("COMMIT")
+
+    def _vaciar_refugio(self, refugio, filas, insertados, fallidos):
+        """Insertar los envíos de un refugio en su base (Error si no hay conexión)"""
+        connection = self.get_connection(refugio)
+        cursor = connection.cursor()
+        try:
+            try:
+                # Camino rápido: todo el lote en una transacción
+                lote = {}
+                for fila in filas:
+                    lote[fila["ticket"]] = self._insertar(cursor, fila)
+                connection.commit()
+                insertados.update(lote)
+            except Exception:
+                connection.rollback()
+                # Aislar los envíos con error: una transacción por fila
+                for fila in filas:
+                    try:
+                        mysql_id = self._insertar(cursor, fila)
+                        connection.commit()
+                        insertados[fila["ticket"]] = mysql_id
+                    except Error as e:
+                        connection.rollback()
+                        # Errores de datos (FK inexistente, valor inválido) no mejoran al reintentar
+                        intentos = self.max_intentos if isinstance(e, (IntegrityError, DataError)) else fila["intentos"] + 1
+                        fallidos[fila["ticket"]] = (intentos, str(e))
+                    except Exception as e:
+                        connection.rollback()
+                        # Fila corrupta o fallo en al_insertar: reintentarla daría lo mismo
+                        fallidos[fila["ticket"]] = (self.max_intentos, repr(e)[:500])
+        finally:
+            cursor.close()
+            connection.close()
+
+    def _reprogramar_lote(self, filas, error):
+        """Si MySQL no está disponible, devolver el lote a la cola sin gastar intentos"""
+        with self._sqlite() as conn:
+            conn.executemany(
+                "UPDATE envios SET estado = 'pendiente', error = ?, proximo_intento = ? WHERE ticket = ?",
+                [(error, time.time() + self.intervalo * 10, fila["ticket"]) for fila in filas]
+            )
+
+    async def run(self):
+        """Bucle del worker: vaciar lotes mientras haya envíos listos"""
+        while True:
+            try:
+                procesados = await asyncio.to_thread(self.vaciar_lote)
+            except Error as e:
+                print(f"❌ Ingesta: MySQL no disponible, se reintentará: {e}")
+                procesados = 0
+                await asyncio.sleep(self.intervalo * 10)
+            except Exception as e:
+                # Cualquier otro fallo (SQLite bloqueado, fila corrupta) no debe terminar
+                # el worker: la API seguiría aceptando envíos que nadie procesa
+                print(f"❌ Ingesta: error al vaciar un lote, se reintentará: {e!r}")
+                procesados = 0
+                await asyncio.sleep(self.intervalo * 10)
+            if procesados < self.tamano_lote:
+                await asyncio.sleep(self.intervalo)
+
+
+def crear_cola(inserts, get_connection, base_dir, al_insertar=None):
+    """Cola configurada por entorno, o None si el modo buffer está apagado"""
+    if os.getenv("INGESTA_BUFFER", "false").lower() != "true":
+        return None
+    return ColaIngesta(
+        os.getenv("INGESTA_PATH", str(Path(base_dir) / "data" / "ingesta.db")),
+        inserts,
+        get_connection,
+        max_pendientes=int(os.getenv("INGESTA_MAX_PENDIENTES", "10000")),
+        tamano_lote=int(os.getenv("INGESTA_LOTE", "200")),
+        max_intentos=int(os.getenv("INGESTA_MAX_INTENTOS", "5")),
+        al_insertar=al_insertar,
+    )
@@ -0,0 +1,264 @@
+"""
+Límites de tráfico y control de admisión
+
+Dos middlewares ASGI:
+- RateLimitMiddleware: token bucket por cliente (IP) y ruta para los POST
+  públicos. Responde 429 con Retry-After cuando el cliente agota su cubeta.
+  Las cubetas viven en memoria del worker o, con LIMITES_REDIS_URL, en Redis,
+  compartidas entre workers y máquinas.
+- AdmissionMiddleware: limita las peticiones en curso por worker para no
+  agotar el pool de MySQL. Las que exceden el límite esperan un momento en
+  una cola acotada y, si no hay lugar, reciben 503 con Retry-After.
+
+Ambos llevan contadores que expone GET /api/limites/metricas.
+"""
+
+import asyncio
+import math
+import os
+import time
+from collections import OrderedDict
+
+from starlette.datastructures import Headers
+from starlette.responses import JSONResponse
+
+
+def parse_tasa(valor):
+    """'10/min' -> (capacidad 10, recarga en tokens por segundo)"""
+    cantidad, _, unidad = valor.strip().partition("/")
+    segundos = {"s": 1, "seg": 1, "min": 60, "h": 3600, "hora": 3600}[unidad.strip() or "min"]
+    cantidad = int(cantidad)
+    return cantidad, cantidad / segundos
+
+
+# Rutas limitadas: (método, ruta) -> tasa. Los formularios públicos comparten
+# LIMITE_FORMULARIOS; las imágenes, que ocupan disco, tienen el suyo.
+LIMITE_FORMULARIOS = parse_tasa(os.getenv("LIMITE_FORMULARIOS", "10/min"))
+LIMITE_UPLOADS = parse_tasa(os.getenv("LIMITE_UPLOADS", "5/min"))
+
+RUTAS_LIMITADAS = {
+    ("POST", "/mascotas"): LIMITE_FORMULARIOS,
+    ("POST", "/solicitudes-adopcion"): LIMITE_FORMULARIOS,
+    ("POST", "/solicitudes-voluntariado"): LIMITE_FORMULARIOS,
+    ("POST", "/donaciones"): LIMITE_FORMULARIOS,
+    ("POST", "/apadrinamientos"): LIMITE_FORMULARIOS,
+    ("POST", "/colaboradores-difusion"): LIMITE_FORMULARIOS,
+    ("POST", "/upload-image"): LIMITE_UPLOADS,
+}
+
+# Rutas que no pasan por el control de admisión: no tocan MySQL o son
+# conexiones largas que ocuparían un lugar indefinidamente.
+RUTAS_SIN_ADMISION = (
+    "/health", "/uploads", "/docs", "/openapi.json", "/redoc", "/api/limites/metricas", "/eventos",
+)
+
+
+def ip_cliente(scope, confiar_proxy=False):
+    """IP del cliente; con confiar_proxy se toma el primer X-Forwarded-For"""
+    if confiar_proxy:
+        reenviada = Headers(scope=scope).get("x-forwarded-for")
+        if reenviada:
+            return reenviada.split(",")[0].strip()
+    cliente = scope.get("client")
+    return cliente[0] if cliente else "desconocido"
+
+
+# ==========================================
+# TOKEN BUCKETS
+# ==========================================
+
+class MemoryBuckets:
+    """Cubetas en memoria del worker, acotadas en cantidad (LRU)"""
+
+    def __init__(self, max_claves=10000):
+        self.max_claves = max_claves
+        self._cubetas = OrderedDict()
+
+    async def tomar(self, clave, capacidad, recarga):
+        """Consumir un token; devuelve (permitido, segundos hasta el próximo)"""
+        ahora = time.monotonic()
+        tokens, ultimo = self._cubetas.pop(clave, (capacidad, ahora))
+        tokens = min(capacidad, tokens + (ahora - ultimo) * recarga)
+        if tokens >= 1:
+            permitido, espera = True, 0.0
+            tokens -= 1
+        else:
+            permitido, espera = False, (1 - tokens) / recarga
+        self._cubetas[clave] = (tokens, ahora)
+        while len(self._cubetas) > self.max_claves:
+            self._cubetas.popitem(last=False)
+        return permitido, espera
+
+
+# Misma lógica que MemoryBuckets, atómica en Redis y con su reloj (TIME)
+_SCRIPT_CUBETA = """
+local capacidad = tonumber(ARGV[1])
+local recarga = tonumber(ARGV[2])
+local t = redis.call('TIME')
+local ahora = tonumber(t[1]) + tonumber(t[2]) / 1000000
+local datos = redis.call('HMGET', KEYS[1], 'tokens', 'ts')
+local tokens = tonumber(datos[1]) or capacidad
+local ultimo = tonumber(datos[2]) or ahora
+tokens = math.min(capacidad, tokens + (ahora - ultimo) * recarga)
+local permitido = 0
+local espera = 0
+if tokens >= 1 then
+    tokens = tokens - 1
+    permitido = 1
+else
+    espera = (1 - tokens) / recarga
+end
+redis.call('HSET', KEYS[1], 'tokens', tostring(tokens), 'ts', tostring(ahora))
+redis.call('EXPIRE', KEYS[1], math.ceil(capacidad / recarga) + 1)
+return {permitido, tostring(espera)}
+"""
+
+
+class RedisBuckets:
+    """Cubetas compartidas en Redis; si Redis falla se usan las locales"""
+
+    def __init__(self, url, prefijo="refugio:limite:"):
+        import redis.asyncio as redis_async
+        self.redis = redis_async.from_url(url)
+        self.script = self.redis.register_script(_SCRIPT_CUBETA)
+        self.prefijo = prefijo
+        self.respaldo = MemoryBuckets()
+        self._caido_hasta = 0.0
+
+    async def tomar(self, clave, capacidad, recarga):
+        if time.monotonic() >= self._caido_hasta:
+            try:
+                permitido, espera = await self.script(keys=[self.prefijo + clave], args=[capacidad, recarga])
+                return bool(permitido), float(espera)
+            except Exception as e:
+                print(f"⚠️ Redis no disponible para límites ({e}); se usan cubetas locales por 30s")
+                self._caido_hasta = time.monotonic() + 30
+        return await self.respaldo.tomar(clave, capacidad, recarga)
+
+
+def crear_buckets():
+    url = os.getenv("LIMITES_REDIS_URL")
+    if url:
+        return RedisBuckets(url)
+    return MemoryBuckets(int(os.getenv("LIMITES_MAX_CLAVES", "10000")))
+
+
+# ==========================================
+# MÉTRICAS
+# ==========================================
+
+class MetricasLimites:
+    def __init__(self):
+        self.admitidas = 0
+        self.rechazadas_429 = {}
+        self.rechazadas_503 = 0
+        self.encoladas = 0
+        self.en_curso = 0
+        self.en_cola = 0
+        self.max_en_curso = 0
+        self.espera_total_s = 0.0
+
+    def resumen(self):
+        return {
+            "pid": os.getpid(),
+            "admitidas": self.admitidas,
+            "en_curso": self.en_curso,
+            "max_en_curso": self.max_en_curso,
+            "en_cola": self.en_cola,
+            "encoladas": self.encoladas,
+            "espera_promedio_ms": round(1000 * self.espera_total_s / self.encoladas, 2) if self.encoladas else 0.0,
+            "rechazadas_503": self.rechazadas_503,
+            "rechazadas_429": dict(self.rechazadas_429),
+            "rechazadas_429_total": sum(self.rechazadas_429.values()),
+        }
+
+
+metricas = MetricasLimites()
+
+
+def _rechazo(status, detail, retry_after):
+    return JSONResponse(
+        status_code=status,
+        content={"detail": detail},
+        headers={"Retry-After": str(max(1, math.ceil(retry_after)))},
+    )
+
+
+# ==========================================
+# MIDDLEWARES
+# ==========================================
+
+class RateLimitMiddleware:
+    def __init__(self, app, rutas=None, buckets=None, confiar_proxy=None):
+        self.app = app
+        self.rutas = RUTAS_LIMITADAS if rutas is None else rutas
+        self.buckets = buckets or crear_buckets()
+        if confiar_proxy is None:
+            confiar_proxy = os.getenv("LIMITES_CONFIAR_PROXY", "false").lower() == "true"
+        self.confiar_proxy = confiar_proxy
+
+    async def __call__(self, scope, receive, send):
+        tasa = self.rutas.get((scope.get("method"), scope.get("path"))) if scope["type"] == "http" else None
+        if tasa is None:
+            await self.app(scope, receive, send)
+            return
+
+        capacidad, recarga = tasa
+        ruta = f"{scope['method']} {scope['path']}"
+        clave = f"{ip_cliente(scope, self.confiar_proxy)}|{ruta}"
+        permitido, espera = await self.buckets.tomar(clave, capacidad, recarga)
+        if not permitido:
+            metricas.rechazadas_429[ruta] = metricas.rechazadas_429.get(ruta, 0) + 1
+            respuesta = _rechazo(
+                429, f"Demasiadas solicitudes. Intenta de nuevo en {max(1, math.ceil(espera))} segundos", espera
+            )
+            await respuesta(scope, receive, send)
+            return
+        await self.app(scope, receive, send)
+
+
+class AdmissionMiddleware:
+    def __init__(self, app, max_concurrencia, max_cola=None, espera_max_s=None, excluir=RUTAS_SIN_ADMISION):
+        self.app = app
+        self.max_concurrencia = max_concurrencia
+        self.max_cola = max_cola if max_cola is not None else int(os.getenv("ADMISION_COLA", str(2 * max_concurrencia)))
+        self.espera_max_s = espera_max_s if espera_max_s is not None else float(os.getenv("ADMISION_ESPERA_MS", "500")) / 1000
+        self.excluir = excluir
+        self._semaforo = None
+
+    async def __call__(self, scope, receive, send):
+        if scope["type"] != "http" or scope["path"].startswith(self.excluir):
+            await self.app(scope, receive, send)
+            return
+        if self._semaforo is None:
+            # Se crea dentro del event loop del worker
+            self._semaforo = asyncio.Semaphore(self.max_concurrencia)
+
+        if self._semaforo.locked():
+            if metricas.en_cola >= self.max_cola:
+                metricas.rechazadas_503 += 1
+                await _rechazo(503, "Servicio saturado, intenta de nuevo en unos segundos", 1)(scope, receive, send)
+                return
+            metricas.en_cola += 1
+            metricas.encoladas += 1
+            inicio = time.monotonic()
+            try:
+                await asyncio.wait_for(self._semaforo.acquire(), timeout=self.espera_max_s)
+            except asyncio.TimeoutError:
+                metricas.rechazadas_503 += 1
+                await _rechazo(503, "Servicio saturado, intenta de nuevo en unos segundos", 1)(scope, receive, send)
+                return
+            finally:
+                metricas.en_cola -= 1
+                metricas.espera_total_s += time.monotonic() - inicio
+        else:
+            await self._semaforo.acquire()
+
+        metricas.admitidas += 1
+        metricas.en_curso += 1
+        metricas.max_en_curso = max(metricas.max_en_curso, metricas.en_curso)
+        try:
+            await self.app(scope, receive, send)
+        finally:
+            metricas.en_curso -= 1
+            self._semaforo.release()
@@ -1,22 +1,40 @@
-from fastapi import FastAPI, HTTPException, Depends, UploadFile, File
+from fastapi import FastAPI, HTTPException, Depends, UploadFile, File, Request, Header, Query, Response
+from fastapi.encoders import jsonable_encoder
+from fastapi.exceptions import RequestValidationError
+from fastapi.responses import JSONResponse, StreamingResponse
 from fastapi.middleware.cors import CORSMiddleware
 from fastapi.staticfiles import StaticFiles
-from pydantic import BaseModel
-from typing import Optional, List
-import mysql.connector
+from typing import List, Optional
+import asyncio
 from mysql.connector import Error
 import os
-from datetime import datetime
-import httpx
-import shutil
+import sys
+from datetime import datetime, date, timedelta
 import uuid
 import json
+import secrets
 from pathlib import Path
-import bleach
-import re
-from html import escape
 
-from database import db
+# httpx y bleach se importan en su primer uso (ver validation.sanitize_input y
+# obtener_datos_externos) para no pagar su carga en cada arranque de worker.
+# models sí se importa aquí: FastAPI necesita los modelos al registrar rutas.
+
+from database import db, ReadYourWritesMiddleware
+from ingesta import crear_cola, ColaLlena
+from notificaciones import crear_notificador
+from validation import sanitize_input, normalize_phone, normalize_email, FILENAME_UNSAFE_RE
+from responses import FastJSONResponse, raw_json_column, conditional_listing, etag_coincide
+from compression import CompressionMiddleware
+from revision import cambiar_estado, ConflictoRevision
+from duplicados import verificar_duplicado, EnvioDuplicado, DUPLICADOS_VENTANA_MIN
+import idempotencia
+from idempotencia import ClaveReutilizada
+from limites import AdmissionMiddleware, RateLimitMiddleware, metricas as metricas_limites
+from eventos import broker as eventos, flujo_sse, LimiteConexiones
+import imagenes
+from portada import Portada, Componente, HOME_TTL_MASCOTAS, HOME_TTL_ESTADISTICAS, HOME_TTL_EXTERNOS
+from refugios import RefugioMiddleware, PorRefugio
+from catalogo import Catalogo, CATALOGO_LIMITE_MAX
 from models import (
     MascotaCreate, MascotaUpdate, MascotaResponse,
     SolicitudAdopcionCreate, SolicitudAdopcionResponse,
@@ -24,10 +42,32 @@ from models import (
     DonacionCreate, DonacionResponse,
     ApadrinamientoCreate, ApadrinamientoResponse,
     ColaboradorDifusionCreate, ColaboradorDifusionResponse,
-    ExternalDataResponse, PipelineStatusResponse
+    ExternalDataResponse, PipelineStatusResponse,
+    CambioEstadoAdopcion, CambioEstadoVoluntariado, CambioEstadoDonacion,
+    CambioEstadoApadrinamiento, CambioEstadoResponse,
+    SerieEnum, GranularidadEnum, EspecieEnum, TipoDonacionEnum,
+    TamanoEnum, GeneroEnum, EstadoEnum
+)
+
+app = FastAPI(title="Refugio de Mascotas API", default_response_class=FastJSONResponse)
+
+# Control de admisión (peticiones en curso por worker, por debajo del pool de
+# MySQL) y token bucket por IP y ruta para los POST públicos. Van dentro de
+# CORS para que los 429/503 lleguen al navegador con sus cabeceras.
+app.add_middleware(
+    AdmissionMiddleware,
+    max_concurrencia=int(os.getenv("ADMISION_MAX_CONCURRENCIA", str(db.pool_size))),
 )
+app.add_middleware(RateLimitMiddleware)
 
-app = FastAPI(title="Refugio de Mascotas API")
+# Lecturas en réplicas (DB_REPLICA_HOSTS) con lectura de lo propio tras
+# escribir; las réplicas son las del refugio, por eso va dentro de RefugioMiddleware
+app.add_middleware(ReadYourWritesMiddleware, database=db)
+
+# Refugio de cada petición (X-Refugio, ?refugio= o dominio): elige el pool
+# de su base. Dentro de CORS para que el 404 de un refugio desconocido llegue
+# al navegador.
+app.add_middleware(RefugioMiddleware)
 
 # CORS para permitir frontend
 app.add_middleware(
@@ -36,8 +76,12 @@ app.add_middleware(
     allow_credentials=False,
     allow_methods=["*"],
     allow_headers=["*"],
+    expose_headers=["ETag", "Last-Modified", "X-Refugio-RW", "X-Refugio", "Retry-After", "Idempotent-Replayed"],
 )
 
+# Compresión brotli/gzip de respuestas grandes (JSON y texto)
+app.add_middleware(CompressionMiddleware, minimum_size=int(os.getenv("COMPRESSION_MIN_SIZE", "1024")))
+
 # Crear directorio para imágenes
 BASE_DIR = Path(__file__).parent
 UPLOAD_DIR = BASE_DIR / "uploads"
@@ -46,67 +90,372 @@ UPLOAD_DIR.mkdir(exist_ok=True)
 # Montar directorio de archivos estáticos
 app.mount("/uploads", StaticFiles(directory=str(UPLOAD_DIR)), name="uploads")
 
-# Configuración de BD
-DB_CONFIG = {
-    'host': os.getenv('DB_HOST', 'localhost'),
-    'database': os.getenv('DB_NAME', 'refugio_mascotas'),
-    'user': os.getenv('DB_USER', 'root'),
-    'password': os.getenv('DB_PASSWORD', 'root')
-}
+# ===============================
+# CICLO DE VIDA DEL WORKER
+# ===============================
+
+@app.on_event("startup")
+async def precalentar_worker():
+    """Abrir los pools de conexiones (uno por refugio) antes de atender la primera petición"""
+    db.warm_pool()
+    await eventos.iniciar()
+    if cola_ingesta:
+        app.state.tarea_ingesta = asyncio.create_task(cola_ingesta.run())
+    if notificador:
+        app.state.tarea_notificaciones = asyncio.create_task(notificador.run())
+    if os.getenv("PIPELINE_SCHEDULER", "false").lower() == "true":
+        app.state.programador = iniciar_programador()
+
+@app.on_event("shutdown")
+async def apagar_worker():
+    tarea = getattr(app.state, "tarea_ingesta", None)
+    if tarea:
+        tarea.cancel()
+        # Los envíos que queden pendientes siguen en la cola para el próximo arranque
+    tarea = getattr(app.state, "tarea_notificaciones", None)
+    if tarea:
+        # Un lote a medio enviar se vuelve a reclamar al vencer su lease
+        tarea.cancel()
+    programador = getattr(app.state, "programador", None)
+    if programador:
+        programador.detener()
+    # Cierra los flujos SSE abiertos; los navegadores reconectan a otro worker
+    await eventos.cerrar()
+    print(f"🛑 Worker {os.getpid()} cerrando")
+
+def ruta_pipeline():
+    """Directorio pipeline/, agregado a sys.path para importar sus módulos"""
+    # Los procesos hijos (spawn) del programador heredan la ruta
+    pipeline_dir = os.getenv("PIPELINE_DIR", str(BASE_DIR.parent / "pipeline"))
+    if pipeline_dir not in sys.path:
+        sys.path.insert(0, pipeline_dir)
+    return Path(pipeline_dir)
+
+def iniciar_programador():
+    """Programador del pipeline en un hilo; los trabajos corren en procesos aparte"""
+    ruta_pipeline()
+    from programador import Programador
+    # El registro de trabajos (pipeline_jobs) vive en la base del refugio
+    # predeterminado; con varios refugios cada trabajo se reparte entre todos
+    programador = Programador(db.base(db.predeterminado).config, refugios=db.slugs if db.multiples else None)
+    programador.iniciar_en_segundo_plano()
+    return programador
 
 # ===============================
 # FUNCIONES DE SEGURIDAD
 # ===============================
 
-def sanitize_input(text: str) -> str:
-    """Sanitizar texto para prevenir XSS"""
-    if not text:
-        return text
-    # Remover HTML malicioso pero mantener texto plano
-    return bleach.clean(text, tags=[], attributes={}, strip=True)
-
-def validate_phone(phone: str) -> bool:
-    """Validar formato de teléfono costarricense"""
-    if not phone:
-        return False
-    # Patrón para números de Costa Rica
-    pattern = r'^(\+506\s?)?[0-9]{4}[-\s]?[0-9]{4}$'
-    return bool(re.match(pattern, phone.strip()))
-
-def validate_email(email: str) -> bool:
-    """Validar formato de email"""
-    if not email:
-        return False
-    pattern = r'^[^@]+@[^@]+\.[^@]+$'
-    return bool(re.match(pattern, email.strip()))
-
-def get_db_connection():
+# sanitize_input, validate_phone y validate_email viven en validation.py; los
+# modelos aplican las validaciones de teléfono y email al parsear el body.
+
+@app.exception_handler(RequestValidationError)
+async def error_validacion(request: Request, exc: RequestValidationError):
+    """Responder 400 con un mensaje legible, como las validaciones manuales"""
+    mensajes = []
+    for error in exc.errors():
+        mensaje = error.get("msg", "")
+        # Los ValueError de los validadores llegan como "Value error, <mensaje>"
+        mensaje = mensaje.removeprefix("Value error, ")
+        campo = ".".join(str(parte) for parte in error.get("loc", ())[1:])
+        mensajes.append(f"{campo}: {mensaje}" if campo and error.get("type") != "value_error" else mensaje)
+    return JSONResponse(
+        status_code=400,
+        content={"detail": "; ".join(mensajes), "errors": jsonable_encoder(exc.errors())},
+    )
+
+@app.exception_handler(EnvioDuplicado)
+async def error_duplicado(request: Request, exc: EnvioDuplicado):
+    return JSONResponse(status_code=409, content={"detail": str(exc)})
+
+@app.exception_handler(ClaveReutilizada)
+async def error_clave_reutilizada(request: Request, exc: ClaveReutilizada):
+    return JSONResponse(status_code=422, content={"detail": str(exc)})
+
+def get_db_connection(lectura=False, refugio=None):
+    """
+    Conexión al primario; con lectura=True a una réplica si hay (ver database.py)
+    Es la base del refugio de la petición, salvo que se indique otro.
+    """
     try:
-        connection = mysql.connector.connect(**DB_CONFIG)
+        connection = db.base(refugio).get_connection(lectura=lectura)
         return connection
     except Error as e:
         raise HTTPException(status_code=500, detail=f"Error de conexión: {e}")
 
+def sql_listado(tabla, incluir_archivo=False):
+    """Consulta de un listado; con incluir_archivo suma las filas archivadas (pipeline/archivo.py)"""
+    if incluir_archivo:
+        return f"SELECT * FROM {tabla} UNION ALL SELECT * FROM {tabla}_archivo ORDER BY created_at DESC"
+    return f"SELECT * FROM {tabla} ORDER BY created_at DESC"
+
+# ===============================
+# INGESTA DE FORMULARIOS
+# ===============================
+
+# INSERTs de los formularios públicos; los usan tanto los endpoints como el
+# worker de ingesta diferida (ingesta.py), que los ejecuta por lotes.
+# telefono_norm / email_norm (normalize_phone / normalize_email) van al final.
+INSERTS = {
+    "solicitud_adopcion": """
+        INSERT INTO solicitudes_adopcion
+        (mascota_id, nombre, telefono, email, direccion, tipo_vivienda,
+        otras_mascotas, experiencia, motivacion, horas_disponibles, presupuesto,
+        telefono_norm, email_norm)
+        VALUES (%s, %s, %s, %s, %s, %s, %s, %s, %s, %s, %s, %s, %s)
+    """,
+    "solicitud_voluntariado": """
+        INSERT INTO solicitudes_voluntariado
+        (nombre, telefono, email, areas, disponibilidad, experiencia, telefono_norm, email_norm)
+        VALUES (%s, %s, %s, %s, %s, %s, %s, %s)
+    """,
+    "donacion": """
+        INSERT INTO donaciones
+        (tipo_donacion, monto, descripcion_especie, nombre_donante, telefono_donante, email_donante,
+        telefono_norm, email_norm)
+        VALUES (%s, %s, %s, %s, %s, %s, %s, %s)
+    """,
+    "apadrinamiento": """
+        INSERT INTO apadrinamientos
+        (nombre_padrino, telefono_padrino, email_padrino, preferencia_especie, aportacion_mensual,
+        telefono_norm, email_norm)
+        VALUES (%s, %s, %s, %s, %s, %s, %s)
+    """,
+    "colaborador_difusion": """
+        INSERT INTO colaboradores_difusion
+        (nombre, email, tipos_difusion, redes_sociales, email_norm)
+        VALUES (%s, %s, %s, %s, %s)
+    """,
+}
+
+# Tabla de cada tipo de envío, para los eventos en vivo
+RECURSOS_ENVIO = {
+    "solicitud_adopcion": "solicitudes_adopcion",
+    "solicitud_voluntariado": "solicitudes_voluntariado",
+    "donacion": "donaciones",
+    "apadrinamiento": "apadrinamientos",
+    "colaborador_difusion": "colaboradores_difusion",
+}
+
+# Línea de cada envío en el resumen por correo; params en el orden de INSERTS
+DETALLE_ENVIO = {
+    "solicitud_adopcion": lambda p: f"{p[1]} quiere adoptar a la mascota #{p[0]}",
+    "solicitud_voluntariado": lambda p: f"{p[0]}, disponibilidad: {p[4]}",
+    "donacion": lambda p: f"{p[3]}, {p[0]}" + (f" por {p[1]}" if p[1] else ""),
+    "apadrinamiento": lambda p: f"{p[0]}, {p[4]} al mes",
+    "colaborador_difusion": lambda p: p[0],
+}
+
+# Avisos por correo de los envíos nuevos: solo con NOTIFICACIONES_PARA
+notificador = crear_notificador(lambda refugio: db.base(refugio).get_connection(), db.refugios)
+
+def notificar_envio(cursor, refugio, tipo, params, registro_id):
+    """Aviso del envío en la bandeja de salida, dentro de la transacción de su INSERT"""
+    if notificador:
+        notificador.registrar(cursor, refugio or db.predeterminado, tipo, registro_id, DETALLE_ENVIO[tipo](params))
+
+# Cola write-behind: solo existe con INGESTA_BUFFER=true
+# (el worker no atiende peticiones: cada envío indica la base de su refugio)
+cola_ingesta = crear_cola(
+    INSERTS, lambda refugio: db.base(refugio or None).get_connection(), BASE_DIR, al_insertar=notificar_envio
+)
+
+ER_DUP_ENTRY = 1062
+
+def validar_clave(clave):
+    if clave is not None and not idempotencia.clave_valida(clave):
+        raise HTTPException(status_code=400, detail=idempotencia.CLAVE_INVALIDA)
+
+def respuesta_repetida(status_code: int, contenido: dict):
+    """Respuesta guardada de una Idempotency-Key ya procesada"""
+    return JSONResponse(status_code=status_code, content=contenido, headers={"Idempotent-Replayed": "true"})
+
+def repetida_o_error(connection, tipo: str, clave, huella_envio, error: Error):
+    """Tras un error al escribir: si otra petición con la misma clave ganó, devolver su respuesta"""
+    if clave and error.errno == ER_DUP_ENTRY:
+        cursor = connection.cursor()
+        try:
+            previa = idempotencia.buscar(cursor, tipo, clave, huella_envio)
+        finally:
+            cursor.close()
+        if previa:
+            return respuesta_repetida(*previa)
+    raise HTTPException(status_code=500, detail=str(error))
+
+def encolar_envio(tipo: str, params: tuple, mensaje: str, contacto: dict, clave=None):
+    """Aceptar un envío en la cola y responder 202 con su ticket"""
+    # Duplicados contra lo ya insertado (en una réplica si hay); si MySQL no
+    # responde, el envío se acepta igual: la cola existe para esos momentos
+    try:
+        connection = get_db_connection(lectura=True)
+    except HTTPException:
+        connection = None
+    if connection:
+        cursor = connection.cursor()
+        try:
+            verificar_duplicado(cursor, tipo, **contacto)
+        except Error as e:
+            print(f"⚠️ No se pudo verificar duplicados de {tipo}: {e}")
+        finally:
+            cursor.close()
+            connection.close()
+
+    huella_envio = idempotencia.huella(tipo, params) if clave else None
+    try:
+        ticket, nuevo = cola_ingesta.encolar(tipo, params, clave, huella_envio, refugio=db.actual())
+    except ColaLlena:
+        raise HTTPException(
+            status_code=503,
+            detail="Estamos recibiendo muchas solicitudes, intenta de nuevo en unos segundos",
+            headers={"Retry-After": "5"},
+        )
+    contenido = {"message": mensaje, "ticket": ticket, "estado": "pendiente"}
+    if not nuevo:
+        return respuesta_repetida(202, contenido)
+    # Aún sin id: el evento avisa que hay un envío nuevo en camino
+    eventos.publicar("envio.recibido", {"recurso": RECURSOS_ENVIO[tipo]})
+    return JSONResponse(status_code=202, content=contenido)
+
+def insertar_envio(tipo: str, params: tuple, mensaje: str, contacto: dict, clave=None):
+    """
+    INSERT síncrono de un formulario (modo sin buffer)
+
+    En una transacción: respuesta guardada de la Idempotency-Key, búsqueda
+    de duplicados por teléfono/email normalizados, INSERT, aviso en la
+    bandeja de notificaciones y registro de la clave.
+    """
+    huella_envio = idempotencia.huella(tipo, params) if clave else None
+    connection = get_db_connection()
+    cursor = connection.cursor()
+    try:
+        if clave:
+            previa = idempotencia.buscar(cursor, tipo, clave, huella_envio)
+            if previa:
+                return respuesta_repetida(*previa)
+        verificar_duplicado(cursor, tipo, **contacto)
+        cursor.execute(INSERTS[tipo], params)
+        respuesta = {"message": mensaje, "id": cursor.lastrowid}
+        notificar_envio(cursor, db.actual(), tipo, params, respuesta["id"])
+        if clave:
+            idempotencia.guardar(cursor, tipo, clave, huella_envio, 200, respuesta)
+        connection.commit()
+        eventos.publicar("envio.creado", {"recurso": RECURSOS_ENVIO[tipo], "id": respuesta["id"]})
+        return respuesta
+    except Error as e:
+        connection.rollback()
+        return repetida_o_error(connection, tipo, clave, huella_envio, e)
+    except Exception:
+        connection.rollback()
+        raise
+    finally:
+        cursor.close()
+        connection.close()
+
+def registrar_envio(tipo: str, params: tuple, mensaje_aceptado: str, mensaje_guardado: str,
+                    contacto: dict, clave=None):
+    """contacto: claves normalizadas (y filtros) para duplicados.verificar_duplicado"""
+    validar_clave(clave)
+    if cola_ingesta:
+        return encolar_envio(tipo, params, mensaje_aceptado, contacto, clave)
+    return insertar_envio(tipo, params, mensaje_guardado, contacto, clave)
+
+@app.get("/envios/{ticket}")
+async def estado_envio(ticket: str):
+    """Estado de un envío aceptado por la cola de ingesta"""
+    if not cola_ingesta:
+        raise HTTPException(status_code=404, detail="La ingesta diferida no está habilitada")
+    estado = cola_ingesta.estado(ticket)
+    if estado is not None and (estado.pop("refugio") or db.predeterminado) != db.actual():
+        estado = None
+    if estado is None:
+        raise HTTPException(status_code=404, detail="Ticket no encontrado")
+    return estado
+
 # ===============================
 # ENDPOINTS PARA MASCOTAS
 # ===============================
 
+def buscar_fotos_parecidas(connection, imagen_url, mascota_id):
+    """Mascotas con una foto parecida (imagenes.py); un fallo aquí no impide registrar"""
+    try:
+        return imagenes.posibles_duplicados(connection, imagen_url, excluir_id=mascota_id)
+    except Exception as e:
+        print(f"⚠️ No se pudieron comparar las fotos de la mascota {mascota_id}: {e}")
+        return []
+
+def leer_mascota(connection, mascota_id):
+    """Fila recién escrita, tal como la devuelve GET /mascotas (para los eventos)"""
+    cursor = connection.cursor(dictionary=True)
+    try:
+        cursor.execute("SELECT * FROM mascotas WHERE id = %s", (mascota_id,))
+        return cursor.fetchone() or {"id": mascota_id}
+    finally:
+        cursor.close()
+
 @app.get("/mascotas", response_model=List[MascotaResponse])
-async def listar_mascotas():
-    connection = get_db_connection()
+async def listar_mascotas(request: Request):
+    connection = get_db_connection(lectura=True)
     cursor = connection.cursor(dictionary=True)
     try:
+        no_modificado, cabeceras = conditional_listing(request, cursor, "mascotas")
+        if no_modificado:
+            return no_modificado
         cursor.execute("SELECT * FROM mascotas ORDER BY created_at DESC")
         mascotas = cursor.fetchall()
-        return mascotas
+        # Filas confiables de la BD: se serializan sin revalidar el response_model
+        return FastJSONResponse(mascotas, headers=cabeceras)
     except Error as e:
         raise HTTPException(status_code=500, detail=str(e))
     finally:
         cursor.close()
         connection.close()
 
+# Catálogo compacto compartido entre workers (catalogo.py), uno por refugio
+catalogos = PorRefugio(lambda: Catalogo(db.actual()))
+
+def invalidar_mascotas():
+    """Tras crear, editar, borrar o adoptar: catálogo y mascotas de la portada (GET /home)"""
+    catalogos.actual().invalidar()
+    portadas.actual().componente("mascotas").invalidar()
+
+@app.get("/mascotas/catalogo")
+async def filtrar_catalogo(
+    request: Request,
+    especie: Optional[List[EspecieEnum]] = Query(None),
+    tamano: Optional[List[TamanoEnum]] = Query(None),
+    genero: Optional[List[GeneroEnum]] = Query(None),
+    estado: Optional[List[EstadoEnum]] = Query(None),
+    edad_min: Optional[int] = Query(None, ge=0),
+    edad_max: Optional[int] = Query(None, ge=0),
+    limite: int = Query(50, ge=1, le=CATALOGO_LIMITE_MAX),
+    desde: int = Query(0, ge=0),
+):
+    """
+    Mascotas filtradas sobre el catálogo mapeado en memoria, sin consultar
+    MySQL. Cada filtro acepta varios valores (?especie=perro&especie=gato).
+    """
+    try:
+        mapeo = await catalogos.actual().obtener()
+    except Error as e:
+        raise HTTPException(status_code=503, detail=f"El catálogo no está disponible: {e}")
+    cabeceras = {"ETag": mapeo.etag, "Cache-Control": "no-cache"}
+    if etag_coincide(request.headers.get("if-none-match"), mapeo.etag):
+        return Response(status_code=304, headers=cabeceras)
+
+    posiciones = mapeo.filtrar(
+        especie=[e.value for e in especie or []], tamano=[t.value for t in tamano or []],
+        genero=[g.value for g in genero or []], estado=[e.value for e in estado or []],
+        edad_min=edad_min, edad_max=edad_max,
+    )
+    return FastJSONResponse({
+        "total": len(posiciones),
+        "mascotas": mapeo.filas(posiciones[desde:desde + limite]),
+    }, headers=cabeceras)
+
 @app.post("/mascotas", response_model=dict)
-async def crear_mascota(mascota: MascotaCreate):
+async def crear_mascota(
+    mascota: MascotaCreate,
+    idempotency_key: Optional[str] = Header(None, alias="Idempotency-Key"),
+):
     # Sanitizar inputs de texto
     nombre_clean = sanitize_input(mascota.nombre)
     descripcion_clean = sanitize_input(mascota.descripcion) if mascota.descripcion else ""
@@ -116,30 +465,42 @@ async def crear_mascota(mascota: MascotaCreate):
     if not nombre_clean or len(nombre_clean.strip()) == 0:
         raise HTTPException(status_code=400, detail="El nombre es obligatorio")
     
-    if mascota.contacto_telefono and not validate_phone(mascota.contacto_telefono):
-        raise HTTPException(status_code=400, detail="Formato de teléfono inválido (use formato costarricense: +506 8888 1122 o 8888-1122)")
-    
-    if mascota.edad is not None and (mascota.edad < 0 or mascota.edad > 30):
-        raise HTTPException(status_code=400, detail="La edad debe estar entre 0 y 30 anos")
-    
+    validar_clave(idempotency_key)
+    params = (
+        nombre_clean, mascota.especie, mascota.edad,
+        descripcion_clean, mascota.imagen_url, mascota.tamano,
+        mascota.genero, contacto_nombre_clean, mascota.contacto_telefono,
+        mascota.estado
+    )
+    huella_envio = idempotencia.huella("mascota", params) if idempotency_key else None
     connection = get_db_connection()
     cursor = connection.cursor()
     try:
+        if idempotency_key:
+            previa = idempotencia.buscar(cursor, "mascota", idempotency_key, huella_envio)
+            if previa:
+                return respuesta_repetida(*previa)
         query = """
         INSERT INTO mascotas
         (nombre, especie, edad, descripcion, imagen_url, tamano, genero, contacto_nombre, contacto_telefono, estado)
         VALUES (%s, %s, %s, %s, %s, %s, %s, %s, %s, %s)
         """
-        cursor.execute(query, (
-            nombre_clean, mascota.especie, mascota.edad,
-            descripcion_clean, mascota.imagen_url, mascota.tamano,
-            mascota.genero, contacto_nombre_clean, mascota.contacto_telefono,
-            mascota.estado
-        ))
+        cursor.execute(query, params)
+        respuesta = {"message": "Mascota creada exitosamente", "id": cursor.lastrowid}
+        # Advertencia, no bloqueo: mascotas con una foto casi igual
+        respuesta["posibles_duplicados"] = buscar_fotos_parecidas(connection, mascota.imagen_url, respuesta["id"])
+        if idempotency_key:
+            idempotencia.guardar(cursor, "mascota", idempotency_key, huella_envio, 200, respuesta)
         connection.commit()
-        return {"message": "Mascota creada exitosamente", "id": cursor.lastrowid}
+        eventos.publicar("mascota.creada", leer_mascota(connection, respuesta["id"]))
+        invalidar_mascotas()
+        return respuesta
     except Error as e:
-        raise HTTPException(status_code=500, detail=str(e))
+        connection.rollback()
+        return repetida_o_error(connection, "mascota", idempotency_key, huella_envio, e)
+    except Exception:
+        connection.rollback()
+        raise
     finally:
         cursor.close()
         connection.close()
@@ -155,9 +516,6 @@ async def actualizar_mascota(mascota_id: int, mascota: MascotaUpdate):
     if not nombre_clean or len(nombre_clean.strip()) == 0:
         raise HTTPException(status_code=400, detail="El nombre es obligatorio")
     
-    if mascota.contacto_telefono and not validate_phone(mascota.contacto_telefono):
-        raise HTTPException(status_code=400, detail="Formato de teléfono inválido")
-    
     connection = get_db_connection()
     cursor = connection.cursor()
     try:
@@ -176,6 +534,8 @@ async def actualizar_mascota(mascota_id: int, mascota: MascotaUpdate):
         connection.commit()
         if cursor.rowcount == 0:
             raise HTTPException(status_code=404, detail="Mascota no encontrada")
+        eventos.publicar("mascota.actualizada", leer_mascota(connection, mascota_id))
+        invalidar_mascotas()
         return {"message": "Mascota actualizada exitosamente"}
     except Error as e:
         raise HTTPException(status_code=500, detail=str(e))
@@ -188,10 +548,23 @@ async def eliminar_mascota(mascota_id: int):
     connection = get_db_connection()
     cursor = connection.cursor()
     try:
+        # Sus solicitudes (también las archivadas) dejan de contar en los
+        # rollups; el borrado no mueve updated_at, así que se anotan sus días
+        cursor.execute(
+            """
+            INSERT INTO rollup_borrados (tabla, dia)
+            SELECT 'solicitudes_adopcion', dia FROM (
+                SELECT DATE(created_at) AS dia FROM solicitudes_adopcion WHERE mascota_id = %s
+                UNION SELECT DATE(created_at) FROM solicitudes_adopcion_archivo WHERE mascota_id = %s
+            ) dias
+            """, (mascota_id, mascota_id)
+        )
         cursor.execute("DELETE FROM mascotas WHERE id=%s", (mascota_id,))
         connection.commit()
         if cursor.rowcount == 0:
             raise HTTPException(status_code=404, detail="Mascota no encontrada")
+        eventos.publicar("mascota.eliminada", {"id": mascota_id})
+        invalidar_mascotas()
         return {"message": "Mascota eliminada exitosamente"}
     except Error as e:
         raise HTTPException(status_code=500, detail=str(e))
@@ -225,7 +598,7 @@ async def upload_image(file: UploadFile = File(...)):
     if file.filename:
         filename_clean = sanitize_input(file.filename)
         # Remover caracteres peligrosos del nombre de archivo
-        filename_clean = re.sub(r'[^a-zA-Z0-9._-]', '', filename_clean)
+        filename_clean = FILENAME_UNSAFE_RE.sub('', filename_clean)
     else:
         filename_clean = "image"
 
@@ -246,8 +619,31 @@ async def upload_image(file: UploadFile = File(...)):
     print(f"✅ SUCCESS: Archivo guardado en: {file_path}")
     print(f"✅ SUCCESS: Archivo existe: {file_path.exists()}")
 
+    url = f"/uploads/{filename}"
+    await indexar_imagen(url, content)
+
     # Retornar URL de acceso
-    return {"url": f"/uploads/{filename}"}
+    return {"url": url}
+
+async def indexar_imagen(url: str, content: bytes):
+    """Guardar el hash perceptual de la imagen (imagenes.py) para buscar fotos parecidas"""
+    try:
+        # Decodificar la imagen es CPU: fuera del event loop
+        valor = await asyncio.to_thread(imagenes.dhash, content)
+    except Exception as e:
+        # Un formato que Pillow no lee no impide subir la imagen
+        print(f"⚠️ No se pudo calcular el hash de {url}: {e}")
+        return
+    connection = get_db_connection()
+    cursor = connection.cursor()
+    try:
+        imagenes.guardar_hash(cursor, url, valor)
+        connection.commit()
+    except Error as e:
+        print(f"⚠️ No se pudo guardar el hash de {url}: {e}")
+    finally:
+        cursor.close()
+        connection.close()
 
 
 # ===============================
@@ -255,7 +651,10 @@ async def upload_image(file: UploadFile = File(...)):
 # ===============================
 
 @app.post("/solicitudes-adopcion", response_model=dict)
-async def crear_solicitud_adopcion(solicitud: SolicitudAdopcionCreate):
+async def crear_solicitud_adopcion(
+    solicitud: SolicitudAdopcionCreate,
+    idempotency_key: Optional[str] = Header(None, alias="Idempotency-Key"),
+):
     # Sanitizar inputs de texto
     nombre_clean = sanitize_input(solicitud.nombre)
     direccion_clean = sanitize_input(solicitud.direccion)
@@ -265,46 +664,39 @@ async def crear_solicitud_adopcion(solicitud: SolicitudAdopcionCreate):
     if not nombre_clean or len(nombre_clean.strip()) == 0:
         raise HTTPException(status_code=400, detail="El nombre es obligatorio")
     
-    if not validate_phone(solicitud.telefono):
-        raise HTTPException(status_code=400, detail="Formato de teléfono inválido")
-    
-    if not validate_email(solicitud.email):
-        raise HTTPException(status_code=400, detail="Formato de email inválido")
-    
     if len(motivacion_clean) < 20:
         raise HTTPException(status_code=400, detail="La motivación debe tener al menos 20 caracteres")
     
-    connection = get_db_connection()
-    cursor = connection.cursor()
-    try:
-        query = """
-        INSERT INTO solicitudes_adopcion
-        (mascota_id, nombre, telefono, email, direccion, tipo_vivienda,
-        otras_mascotas, experiencia, motivacion, horas_disponibles, presupuesto)
-        VALUES (%s, %s, %s, %s, %s, %s, %s, %s, %s, %s, %s)
-        """
-        cursor.execute(query, (
-            solicitud.mascota_id, nombre_clean, solicitud.telefono,
-            solicitud.email, direccion_clean, solicitud.tipo_vivienda,
-            solicitud.otras_mascotas, solicitud.experiencia, motivacion_clean,
-            solicitud.horas_disponibles, solicitud.presupuesto
-        ))
-        connection.commit()
-        return {"message": "Solicitud de adopción enviada exitosamente", "id": cursor.lastrowid}
-    except Error as e:
-        raise HTTPException(status_code=500, detail=str(e))
-    finally:
-        cursor.close()
-        connection.close()
+    telefono_norm = normalize_phone(solicitud.telefono)
+    email_norm = normalize_email(solicitud.email)
+    params = (
+        solicitud.mascota_id, nombre_clean, solicitud.telefono,
+        solicitud.email, direccion_clean, solicitud.tipo_vivienda,
+        solicitud.otras_mascotas, solicitud.experiencia, motivacion_clean,
+        solicitud.horas_disponibles, solicitud.presupuesto,
+        telefono_norm, email_norm
+    )
+    return registrar_envio(
+        "solicitud_adopcion", params,
+        "Solicitud de adopción recibida", "Solicitud de adopción enviada exitosamente",
+        {"telefono_norm": telefono_norm, "email_norm": email_norm, "extra": (solicitud.mascota_id,)},
+        idempotency_key,
+    )
 
 @app.get("/solicitudes-adopcion", response_model=List[SolicitudAdopcionResponse])
-async def listar_solicitudes_adopcion():
-    connection = get_db_connection()
+async def listar_solicitudes_adopcion(request: Request, incluir_archivo: bool = False):
+    connection = get_db_connection(lectura=True)
     cursor = connection.cursor(dictionary=True)
     try:
-        cursor.execute("SELECT * FROM solicitudes_adopcion ORDER BY created_at DESC")
+        no_modificado, cabeceras = conditional_listing(
+            request, cursor, "solicitudes_adopcion", incluir_archivo=incluir_archivo
+        )
+        if no_modificado:
+            return no_modificado
+        cursor.execute(sql_listado("solicitudes_adopcion", incluir_archivo))
         solicitudes = cursor.fetchall()
-        return solicitudes
+        # Filas confiables de la BD: se serializan sin revalidar el response_model
+        return FastJSONResponse(solicitudes, headers=cabeceras)
     except Error as e:
         raise HTTPException(status_code=500, detail=str(e))
     finally:
@@ -316,7 +708,10 @@ async def listar_solicitudes_adopcion():
 # ===============================
 
 @app.post("/solicitudes-voluntariado", response_model=dict)
-async def crear_solicitud_voluntariado(solicitud: SolicitudVoluntariadoCreate):
+async def crear_solicitud_voluntariado(
+    solicitud: SolicitudVoluntariadoCreate,
+    idempotency_key: Optional[str] = Header(None, alias="Idempotency-Key"),
+):
     # Sanitizar inputs de texto
     nombre_clean = sanitize_input(solicitud.nombre)
     experiencia_clean = sanitize_input(solicitud.experiencia) if solicitud.experiencia else None
@@ -325,45 +720,34 @@ async def crear_solicitud_voluntariado(solicitud: SolicitudVoluntariadoCreate):
     if not nombre_clean or len(nombre_clean.strip()) == 0:
         raise HTTPException(status_code=400, detail="El nombre es obligatorio")
     
-    if not validate_phone(solicitud.telefono):
-        raise HTTPException(status_code=400, detail="Formato de teléfono inválido")
-    
-    if not validate_email(solicitud.email):
-        raise HTTPException(status_code=400, detail="Formato de email inválido")
-    
-    connection = get_db_connection()
-    cursor = connection.cursor()
-    try:
-        areas_json = json.dumps(solicitud.areas)
-        query = """
-        INSERT INTO solicitudes_voluntariado
-        (nombre, telefono, email, areas, disponibilidad, experiencia)
-        VALUES (%s, %s, %s, %s, %s, %s)
-        """
-        cursor.execute(query, (
-            nombre_clean, solicitud.telefono, solicitud.email,
-            areas_json, solicitud.disponibilidad, experiencia_clean
-        ))
-        connection.commit()
-        return {"message": "Solicitud de voluntariado enviada exitosamente", "id": cursor.lastrowid}
-    except Error as e:
-        raise HTTPException(status_code=500, detail=str(e))
-    finally:
-        cursor.close()
-        connection.close()
+    telefono_norm = normalize_phone(solicitud.telefono)
+    email_norm = normalize_email(solicitud.email)
+    params = (
+        nombre_clean, solicitud.telefono, solicitud.email,
+        json.dumps(solicitud.areas), solicitud.disponibilidad, experiencia_clean,
+        telefono_norm, email_norm
+    )
+    return registrar_envio(
+        "solicitud_voluntariado", params,
+        "Solicitud de voluntariado recibida", "Solicitud de voluntariado enviada exitosamente",
+        {"telefono_norm": telefono_norm, "email_norm": email_norm},
+        idempotency_key,
+    )
 
 @app.get("/solicitudes-voluntariado", response_model=List[dict])
-async def listar_solicitudes_voluntariado():
-    connection = get_db_connection()
+async def listar_solicitudes_voluntariado(request: Request, incluir_archivo: bool = False):
+    connection = get_db_connection(lectura=True)
     cursor = connection.cursor(dictionary=True)
     try:
-        cursor.execute("SELECT * FROM solicitudes_voluntariado ORDER BY created_at DESC")
+        no_modificado, cabeceras = conditional_listing(
+            request, cursor, "solicitudes_voluntariado", incluir_archivo=incluir_archivo
+        )
+        if no_modificado:
+            return no_modificado
+        cursor.execute(sql_listado("solicitudes_voluntariado", incluir_archivo))
         solicitudes = cursor.fetchall()
-        # Convertir areas de JSON string a lista
-        for solicitud in solicitudes:
-            if solicitud['areas']:
-                solicitud['areas'] = json.loads(solicitud['areas'])
-        return solicitudes
+        # areas es una columna JSON: se incrusta tal cual en la respuesta
+        return FastJSONResponse(raw_json_column(solicitudes, 'areas'), headers=cabeceras)
     except Error as e:
         raise HTTPException(status_code=500, detail=str(e))
     finally:
@@ -375,7 +759,10 @@ async def listar_solicitudes_voluntariado():
 # ===============================
 
 @app.post("/donaciones", response_model=dict)
-async def crear_donacion(donacion: DonacionCreate):
+async def crear_donacion(
+    donacion: DonacionCreate,
+    idempotency_key: Optional[str] = Header(None, alias="Idempotency-Key"),
+):
     # Sanitizar inputs de texto
     nombre_clean = sanitize_input(donacion.nombre_donante)
     descripcion_clean = sanitize_input(donacion.descripcion_especie) if donacion.descripcion_especie else None
@@ -384,46 +771,40 @@ async def crear_donacion(donacion: DonacionCreate):
     if not nombre_clean or len(nombre_clean.strip()) == 0:
         raise HTTPException(status_code=400, detail="El nombre del donante es obligatorio")
     
-    if not validate_phone(donacion.telefono_donante):
-        raise HTTPException(status_code=400, detail="Formato de teléfono inválido")
-    
-    if donacion.email_donante and not validate_email(donacion.email_donante):
-        raise HTTPException(status_code=400, detail="Formato de email inválido")
-    
     if donacion.tipo_donacion == "monetaria" and (not donacion.monto or donacion.monto <= 0):
         raise HTTPException(status_code=400, detail="Para donaciones monetarias el monto debe ser mayor a 0")
     
     if donacion.tipo_donacion == "especie" and not descripcion_clean:
         raise HTTPException(status_code=400, detail="Para donaciones en especie debe especificar qué está donando")
     
-    connection = get_db_connection()
-    cursor = connection.cursor()
-    try:
-        query = """
-        INSERT INTO donaciones
-        (tipo_donacion, monto, descripcion_especie, nombre_donante, telefono_donante, email_donante)
-        VALUES (%s, %s, %s, %s, %s, %s)
-        """
-        cursor.execute(query, (
-            donacion.tipo_donacion, donacion.monto, descripcion_clean,
-            nombre_clean, donacion.telefono_donante, donacion.email_donante
-        ))
-        connection.commit()
-        return {"message": "Donación registrada exitosamente", "id": cursor.lastrowid}
-    except Error as e:
-        raise HTTPException(status_code=500, detail=str(e))
-    finally:
-        cursor.close()
-        connection.close()
+    telefono_norm = normalize_phone(donacion.telefono_donante)
+    params = (
+        donacion.tipo_donacion, donacion.monto, descripcion_clean,
+        nombre_clean, donacion.telefono_donante, donacion.email_donante,
+        telefono_norm, normalize_email(donacion.email_donante)
+    )
+    return registrar_envio(
+        "donacion", params,
+        "Donación recibida", "Donación registrada exitosamente",
+        {"telefono_norm": telefono_norm,
+         "extra": (donacion.tipo_donacion, donacion.monto, DUPLICADOS_VENTANA_MIN)},
+        idempotency_key,
+    )
 
 @app.get("/donaciones", response_model=List[DonacionResponse])
-async def listar_donaciones():
-    connection = get_db_connection()
+async def listar_donaciones(request: Request, incluir_archivo: bool = False):
+    connection = get_db_connection(lectura=True)
     cursor = connection.cursor(dictionary=True)
     try:
-        cursor.execute("SELECT * FROM donaciones ORDER BY created_at DESC")
+        no_modificado, cabeceras = conditional_listing(
+            request, cursor, "donaciones", incluir_archivo=incluir_archivo
+        )
+        if no_modificado:
+            return no_modificado
+        cursor.execute(sql_listado("donaciones", incluir_archivo))
         donaciones = cursor.fetchall()
-        return donaciones
+        # Filas confiables de la BD: se serializan sin revalidar el response_model
+        return FastJSONResponse(donaciones, headers=cabeceras)
     except Error as e:
         raise HTTPException(status_code=500, detail=str(e))
     finally:
@@ -435,7 +816,10 @@ async def listar_donaciones():
 # ===============================
 
 @app.post("/apadrinamientos", response_model=dict)
-async def crear_apadrinamiento(apadrinamiento: ApadrinamientoCreate):
+async def crear_apadrinamiento(
+    apadrinamiento: ApadrinamientoCreate,
+    idempotency_key: Optional[str] = Header(None, alias="Idempotency-Key"),
+):
     # Sanitizar inputs de texto
     nombre_clean = sanitize_input(apadrinamiento.nombre_padrino)
     
@@ -443,44 +827,38 @@ async def crear_apadrinamiento(apadrinamiento: ApadrinamientoCreate):
     if not nombre_clean or len(nombre_clean.strip()) == 0:
         raise HTTPException(status_code=400, detail="El nombre del padrino es obligatorio")
     
-    if not validate_phone(apadrinamiento.telefono_padrino):
-        raise HTTPException(status_code=400, detail="Formato de teléfono inválido")
-    
-    if not validate_email(apadrinamiento.email_padrino):
-        raise HTTPException(status_code=400, detail="Formato de email inválido")
-    
     if apadrinamiento.aportacion_mensual <= 0:
         raise HTTPException(status_code=400, detail="La aportación mensual debe ser mayor a 0")
     
-    connection = get_db_connection()
-    cursor = connection.cursor()
-    try:
-        query = """
-        INSERT INTO apadrinamientos
-        (nombre_padrino, telefono_padrino, email_padrino, preferencia_especie, aportacion_mensual)
-        VALUES (%s, %s, %s, %s, %s)
-        """
-        cursor.execute(query, (
-            nombre_clean, apadrinamiento.telefono_padrino,
-            apadrinamiento.email_padrino, apadrinamiento.preferencia_especie,
-            apadrinamiento.aportacion_mensual
-        ))
-        connection.commit()
-        return {"message": "Solicitud de apadrinamiento enviada exitosamente", "id": cursor.lastrowid}
-    except Error as e:
-        raise HTTPException(status_code=500, detail=str(e))
-    finally:
-        cursor.close()
-        connection.close()
+    # Apadrinamientos no pasan por la cola de ingesta: se insertan siempre
+    validar_clave(idempotency_key)
+    telefono_norm = normalize_phone(apadrinamiento.telefono_padrino)
+    email_norm = normalize_email(apadrinamiento.email_padrino)
+    params = (
+        nombre_clean, apadrinamiento.telefono_padrino,
+        apadrinamiento.email_padrino, apadrinamiento.preferencia_especie,
+        apadrinamiento.aportacion_mensual, telefono_norm, email_norm
+    )
+    return insertar_envio(
+        "apadrinamiento", params, "Solicitud de apadrinamiento enviada exitosamente",
+        {"telefono_norm": telefono_norm, "email_norm": email_norm},
+        idempotency_key,
+    )
 
 @app.get("/apadrinamientos", response_model=List[ApadrinamientoResponse])
-async def listar_apadrinamientos():
-    connection = get_db_connection()
+async def listar_apadrinamientos(request: Request, incluir_archivo: bool = False):
+    connection = get_db_connection(lectura=True)
     cursor = connection.cursor(dictionary=True)
     try:
-        cursor.execute("SELECT * FROM apadrinamientos ORDER BY created_at DESC")
+        no_modificado, cabeceras = conditional_listing(
+            request, cursor, "apadrinamientos", incluir_archivo=incluir_archivo
+        )
+        if no_modificado:
+            return no_modificado
+        cursor.execute(sql_listado("apadrinamientos", incluir_archivo))
         apadrinamientos = cursor.fetchall()
-        return apadrinamientos
+        # Filas confiables de la BD: se serializan sin revalidar el response_model
+        return FastJSONResponse(apadrinamientos, headers=cabeceras)
     except Error as e:
         raise HTTPException(status_code=500, detail=str(e))
     finally:
@@ -492,7 +870,10 @@ async def listar_apadrinamientos():
 # ===============================
 
 @app.post("/colaboradores-difusion", response_model=dict)
-async def crear_colaborador_difusion(colaborador: ColaboradorDifusionCreate):
+async def crear_colaborador_difusion(
+    colaborador: ColaboradorDifusionCreate,
+    idempotency_key: Optional[str] = Header(None, alias="Idempotency-Key"),
+):
     # Sanitizar inputs de texto
     nombre_clean = sanitize_input(colaborador.nombre)
     redes_clean = sanitize_input(colaborador.redes_sociales) if colaborador.redes_sociales else None
@@ -501,55 +882,113 @@ async def crear_colaborador_difusion(colaborador: ColaboradorDifusionCreate):
     if not nombre_clean or len(nombre_clean.strip()) == 0:
         raise HTTPException(status_code=400, detail="El nombre es obligatorio")
     
-    if not validate_email(colaborador.email):
-        raise HTTPException(status_code=400, detail="Formato de email inválido")
-    
-    connection = get_db_connection()
-    cursor = connection.cursor()
+    email_norm = normalize_email(colaborador.email)
+    params = (
+        nombre_clean, colaborador.email,
+        json.dumps(colaborador.tipos_difusion), redes_clean, email_norm
+    )
+    return registrar_envio(
+        "colaborador_difusion", params,
+        "Registro de difusión recibido", "Colaborador de difusión registrado exitosamente",
+        {"email_norm": email_norm},
+        idempotency_key,
+    )
+
+@app.get("/colaboradores-difusion", response_model=List[dict])
+async def listar_colaboradores_difusion(request: Request):
+    connection = get_db_connection(lectura=True)
+    cursor = connection.cursor(dictionary=True)
     try:
-        tipos_json = json.dumps(colaborador.tipos_difusion)
-        query = """
-        INSERT INTO colaboradores_difusion
-        (nombre, email, tipos_difusion, redes_sociales)
-        VALUES (%s, %s, %s, %s)
-        """
-        cursor.execute(query, (
-            nombre_clean, colaborador.email,
-            tipos_json, redes_clean
-        ))
-        connection.commit()
-        return {"message": "Colaborador de difusión registrado exitosamente", "id": cursor.lastrowid}
+        no_modificado, cabeceras = conditional_listing(request, cursor, "colaboradores_difusion")
+        if no_modificado:
+            return no_modificado
+        cursor.execute("SELECT * FROM colaboradores_difusion ORDER BY created_at DESC")
+        colaboradores = cursor.fetchall()
+        # tipos_difusion es una columna JSON: se incrusta tal cual en la respuesta
+        return FastJSONResponse(raw_json_column(colaboradores, 'tipos_difusion'), headers=cabeceras)
     except Error as e:
         raise HTTPException(status_code=500, detail=str(e))
     finally:
         cursor.close()
         connection.close()
 
-@app.get("/colaboradores-difusion", response_model=List[dict])
-async def listar_colaboradores_difusion():
+# ===============================
+# REVISIÓN POR LOTES (ADMINISTRACIÓN)
+# ===============================
+
+def verificar_admin(x_admin_key: Optional[str] = Header(None)):
+    """
+    Exigir ADMIN_API_KEY en la cabecera X-Admin-Key
+
+    Sin clave configurada los endpoints quedan cerrados (503); solo en
+    desarrollo se pueden abrir sin clave con ADMIN_SIN_CLAVE=true.
+    """
+    clave = os.getenv("ADMIN_API_KEY")
+    if not clave:
+        if os.getenv("ADMIN_SIN_CLAVE", "false").lower() == "true":
+            return
+        raise HTTPException(status_code=503, detail="Administración deshabilitada: falta configurar ADMIN_API_KEY")
+    if not (x_admin_key and secrets.compare_digest(x_admin_key, clave)):
+        raise HTTPException(status_code=401, detail="Clave de administración inválida")
+
+def aplicar_cambio_estado(tabla, cambio):
+    notas_clean = sanitize_input(cambio.notas_admin) if cambio.notas_admin else None
     connection = get_db_connection()
-    cursor = connection.cursor(dictionary=True)
     try:
-        cursor.execute("SELECT * FROM colaboradores_difusion ORDER BY created_at DESC")
-        colaboradores = cursor.fetchall()
-        # Convertir tipos_difusion de JSON string a lista
-        for colaborador in colaboradores:
-            if colaborador['tipos_difusion']:
-                colaborador['tipos_difusion'] = json.loads(colaborador['tipos_difusion'])
-        return colaboradores
+        resultado = cambiar_estado(connection, tabla, cambio.ids, cambio.estado.value, notas_clean)
+    except ConflictoRevision as e:
+        raise HTTPException(status_code=409, detail=str(e))
     except Error as e:
         raise HTTPException(status_code=500, detail=str(e))
     finally:
-        cursor.close()
         connection.close()
+    if resultado["actualizados"]:
+        eventos.publicar("estado.cambiado", {
+            "recurso": tabla, "ids": resultado["actualizados"], "estado": resultado["estado"],
+        })
+    if resultado["rechazadas_automaticamente"]:
+        eventos.publicar("estado.cambiado", {
+            "recurso": tabla, "ids": resultado["rechazadas_automaticamente"], "estado": "rechazada",
+        })
+    for mascota_id in resultado["mascotas_adoptadas"]:
+        eventos.publicar("mascota.actualizada", {"id": mascota_id, "estado": "adoptado"})
+    if resultado["mascotas_adoptadas"]:
+        invalidar_mascotas()
+    return resultado
+
+@app.patch("/admin/solicitudes-adopcion/estado", response_model=CambioEstadoResponse,
+           dependencies=[Depends(verificar_admin)])
+async def revisar_solicitudes_adopcion(cambio: CambioEstadoAdopcion):
+    """Aprobar una solicitud marca la mascota como adoptada y rechaza las demás abiertas"""
+    return aplicar_cambio_estado("solicitudes_adopcion", cambio)
+
+@app.patch("/admin/solicitudes-voluntariado/estado", response_model=CambioEstadoResponse,
+           dependencies=[Depends(verificar_admin)])
+async def revisar_solicitudes_voluntariado(cambio: CambioEstadoVoluntariado):
+    return aplicar_cambio_estado("solicitudes_voluntariado", cambio)
+
+@app.patch("/admin/donaciones/estado", response_model=CambioEstadoResponse,
+           dependencies=[Depends(verificar_admin)])
+async def revisar_donaciones(cambio: CambioEstadoDonacion):
+    return aplicar_cambio_estado("donaciones", cambio)
+
+@app.patch("/admin/apadrinamientos/estado", response_model=CambioEstadoResponse,
+           dependencies=[Depends(verificar_admin)])
+async def revisar_apadrinamientos(cambio: CambioEstadoApadrinamiento):
+    return aplicar_cambio_estado("apadrinamientos", cambio)
 
 # ===============================
 # ENDPOINTS DE ESTADÍSTICAS
 # ===============================
 
-@app.get("/estadisticas-colaboracion")
-async def obtener_estadisticas_colaboracion():
-    connection = get_db_connection()
+def limites_mes(dia):
+    """Primer día del mes de 'dia' y primer día del mes siguiente"""
+    inicio = dia.replace(day=1)
+    return inicio, (inicio + timedelta(days=32)).replace(day=1)
+
+def leer_estadisticas_colaboracion():
+    """Contadores de colaboración (voluntarios, donaciones del mes, padrinos, difusión)"""
+    connection = get_db_connection(lectura=True)
     cursor = connection.cursor(dictionary=True)
     try:
         stats = {}
@@ -558,13 +997,14 @@ async def obtener_estadisticas_colaboracion():
         cursor.execute("SELECT COUNT(*) as count FROM solicitudes_voluntariado WHERE estado = 'aprobado'")
         stats['voluntarios_activos'] = cursor.fetchone()['count']
         
-        # Total donaciones del mes
+        # Total donaciones del mes: rango sargable sobre created_at, resuelto
+        # solo con idx_donaciones_tipo_created_monto (ver sql/CONSULTAS.md)
+        inicio_mes, fin_mes = limites_mes(date.today())
         cursor.execute("""
         SELECT SUM(monto) as total FROM donaciones 
         WHERE tipo_donacion = 'monetaria' 
-        AND MONTH(created_at) = MONTH(CURRENT_DATE()) 
-        AND YEAR(created_at) = YEAR(CURRENT_DATE())
-        """)
+        AND created_at >= %s AND created_at < %s
+        """, (inicio_mes, fin_mes))
         result = cursor.fetchone()
         stats['donaciones_mes'] = float(result['total']) if result['total'] else 0
         
@@ -577,6 +1017,72 @@ async def obtener_estadisticas_colaboracion():
         stats['colaboradores_difusion'] = cursor.fetchone()['count']
         
         return stats
+    finally:
+        cursor.close()
+        connection.close()
+
+@app.get("/estadisticas-colaboracion")
+async def obtener_estadisticas_colaboracion():
+    try:
+        return leer_estadisticas_colaboracion()
+    except Error as e:
+        raise HTTPException(status_code=500, detail=str(e))
+
+# Tablas de rollups (mantenidas por pipeline/rollups.py) y sus columnas
+SERIES_ROLLUP = {
+    SerieEnum.donaciones: ("rollup_donaciones", "tipo_donacion, estado, cantidad, monto_total"),
+    SerieEnum.adopciones: ("rollup_adopciones", "estado, especie, cantidad"),
+}
+
+@app.get("/estadisticas/series")
+async def obtener_series(
+    serie: SerieEnum,
+    granularidad: GranularidadEnum = GranularidadEnum.mes,
+    desde: Optional[date] = None,
+    hasta: Optional[date] = None,
+    estado: Optional[str] = None,
+    tipo_donacion: Optional[TipoDonacionEnum] = None,
+    especie: Optional[EspecieEnum] = None,
+):
+    """Serie de tiempo desde los rollups pre-agregados, sin recorrer las tablas base"""
+    hasta = hasta or date.today()
+    desde = desde or hasta - timedelta(days=365)
+    if desde > hasta:
+        raise HTTPException(status_code=400, detail="'desde' debe ser anterior o igual a 'hasta'")
+    
+    # Incluir el periodo que contiene a 'desde' (los periodos se guardan por su fecha de inicio)
+    if granularidad == GranularidadEnum.semana:
+        desde = desde - timedelta(days=desde.weekday())
+    elif granularidad == GranularidadEnum.mes:
+        desde = desde.replace(day=1)
+    
+    tabla, columnas = SERIES_ROLLUP[serie]
+    filtros = ["granularidad = %s", "periodo BETWEEN %s AND %s"]
+    params = [granularidad.value, desde, hasta]
+    if estado:
+        filtros.append("estado = %s")
+        params.append(estado)
+    if tipo_donacion and serie == SerieEnum.donaciones:
+        filtros.append("tipo_donacion = %s")
+        params.append(tipo_donacion.value)
+    if especie and serie == SerieEnum.adopciones:
+        filtros.append("especie = %s")
+        params.append(especie.value)
+    
+    connection = get_db_connection(lectura=True)
+    cursor = connection.cursor(dictionary=True)
+    try:
+        cursor.execute(
+            f"SELECT periodo, {columnas} FROM {tabla} WHERE {' AND '.join(filtros)} ORDER BY periodo",
+            params
+        )
+        return FastJSONResponse({
+            "serie": serie.value,
+            "granularidad": granularidad.value,
+            "desde": desde,
+            "hasta": hasta,
+            "puntos": cursor.fetchall()
+        })
     except Error as e:
         raise HTTPException(status_code=500, detail=str(e))
     finally:
@@ -587,34 +1093,207 @@ async def obtener_estadisticas_colaboracion():
 # APIs EXTERNAS
 # ===============================
 
+async def leer_datos_externos():
+    """Razas de perros y un dato de gatos; las dos APIs se consultan a la vez"""
+    import httpx
+    async with httpx.AsyncClient() as client:
+        dog_response, cat_response = await asyncio.gather(
+            client.get("https://dog.ceo/api/breeds/list/all"),
+            client.get("https://catfact.ninja/fact"),
+        )
+        dog_breeds = dog_response.json()
+        cat_fact = cat_response.json()
+        return {
+            "dog_breeds": list(dog_breeds["message"].keys())[:10],
+            "cat_fact": cat_fact["fact"]
+        }
+
 @app.get("/api/external-pet-data")
 async def obtener_datos_externos():
-    async with httpx.AsyncClient() as client:
-        try:
-            # Dog breeds
-            dog_response = await client.get("https://dog.ceo/api/breeds/list/all")
-            dog_breeds = dog_response.json()
-            
-            # Cat fact
-            cat_response = await client.get("https://catfact.ninja/fact")
-            cat_fact = cat_response.json()
-            
-            return {
-                "dog_breeds": list(dog_breeds["message"].keys())[:10],
-                "cat_fact": cat_fact["fact"]
-            }
-        except Exception as e:
-            raise HTTPException(status_code=500, detail=f"Error obteniendo datos externos: {e}")
-
-@app.get("/api/pipeline/status")
+    # Misma caché que la portada: las APIs externas se consultan una vez por HOME_TTL_EXTERNOS
+    try:
+        return await datos_externos.obtener()
+    except Exception as e:
+        raise HTTPException(status_code=500, detail=f"Error obteniendo datos externos: {e}")
+
+# ===============================
+# PORTADA AGREGADA
+# ===============================
+
+HOME_MASCOTAS = int(os.getenv("HOME_MASCOTAS", "6"))
+
+def leer_mascotas_disponibles():
+    """Últimas mascotas disponibles (idx_mascotas_estado_created, ver sql/CONSULTAS.md)"""
+    connection = get_db_connection(lectura=True)
+    cursor = connection.cursor(dictionary=True)
+    try:
+        cursor.execute(
+            "SELECT * FROM mascotas WHERE estado = 'disponible' ORDER BY created_at DESC LIMIT %s",
+            (HOME_MASCOTAS,)
+        )
+        return cursor.fetchall()
+    finally:
+        cursor.close()
+        connection.close()
+
+# Las APIs externas no dependen del refugio: un solo componente para todos
+datos_externos = Componente("externos", leer_datos_externos, HOME_TTL_EXTERNOS)
+
+# Las consultas a MySQL son bloqueantes: cada una va a un hilo para que
+# gather las ejecute de verdad en paralelo con las APIs externas. Una portada
+# por refugio; asyncio.to_thread copia el contexto, así cada carga usa la base
+# del refugio que la pidió.
+portadas = PorRefugio(lambda: Portada([
+    Componente("mascotas", lambda: asyncio.to_thread(leer_mascotas_disponibles), HOME_TTL_MASCOTAS),
+    Componente("estadisticas", lambda: asyncio.to_thread(leer_estadisticas_colaboracion), HOME_TTL_ESTADISTICAS),
+    datos_externos,
+]))
+
+@app.get("/home")
+async def obtener_portada(request: Request):
+    """
+    Todo lo que muestra index.html en una respuesta: mascotas disponibles,
+    contadores de colaboración y datos externos, con ETag (304 si no cambió)
+    """
+    return await portadas.actual().responder(request)
+
+@app.get("/api/pipeline/status", response_model=PipelineStatusResponse)
 async def estado_pipeline():
+    """Estado de los trabajos programados, persistido por pipeline/programador.py"""
+    # Los trabajos recorren todos los refugios; su registro está en el predeterminado
+    connection = get_db_connection(lectura=True, refugio=db.predeterminado)
+    cursor = connection.cursor(dictionary=True)
+    try:
+        cursor.execute("""
+        SELECT nombre, cron, estado, ultima_ejecucion, ultima_duracion_s,
+        proxima_ejecucion, registros_procesados, ultimo_error
+        FROM pipeline_jobs ORDER BY nombre
+        """)
+        jobs = cursor.fetchall()
+    except Error as e:
+        raise HTTPException(status_code=500, detail=str(e))
+    finally:
+        cursor.close()
+        connection.close()
+
+    ejecutados = [job for job in jobs if job['ultima_ejecucion']]
+    ultimo = max(ejecutados, key=lambda job: job['ultima_ejecucion'], default=None)
+    proximas = [job['proxima_ejecucion'] for job in jobs if job['proxima_ejecucion']]
+    if any(job['estado'] == 'ejecutando' for job in jobs):
+        status = "running"
+    elif ultimo:
+        status = ultimo['estado']
+    else:
+        status = "idle"
     return {
-        "status": "running",
-        "last_run": datetime.now().isoformat(),
-        "next_run": "2024-01-01T00:00:00",
-        "processed_records": 0
+        "status": status,
+        "last_run": ultimo['ultima_ejecucion'].isoformat() if ultimo else None,
+        "next_run": min(proximas).isoformat() if proximas else None,
+        "processed_records": ultimo['registros_procesados'] if ultimo else 0,
+        "jobs": jobs
     }
 
+# ===============================
+# HISTORIAL DE REPORTES
+# ===============================
+
+def indice_reportes():
+    """(índice, directorio de reportes) del refugio de la petición"""
+    base = ruta_pipeline()
+    from indice_reportes import IndiceReportes
+    if db.multiples:
+        # Mismo reparto de directorios que RefugioDataPipeline
+        base = base / "refugios" / db.actual()
+    reports_dir = base / "reports"
+    return IndiceReportes(reports_dir / "indice.db"), reports_dir
+
+def rango_reportes(desde: Optional[date], hasta: Optional[date]):
+    from indice_reportes import rango
+    if desde and hasta and desde > hasta:
+        raise HTTPException(status_code=400, detail="La fecha 'desde' no puede ser posterior a 'hasta'")
+    return rango(desde, hasta)
+
+@app.get("/api/reportes")
+async def historial_reportes(
+    desde: Optional[date] = None,
+    hasta: Optional[date] = None,
+    limite: int = Query(100, ge=1, le=1000),
+):
+    """Métricas de los reportes diarios entre dos fechas (por defecto los últimos 30 días)"""
+    indice, _ = indice_reportes()
+    inicio, fin = rango_reportes(desde, hasta)
+    if not indice.path.exists():
+        return {"desde": inicio, "reportes": [], "ejecuciones": []}
+    reportes, ejecuciones = await asyncio.gather(
+        asyncio.to_thread(indice.historial, inicio, fin, limite),
+        asyncio.to_thread(indice.ejecuciones, inicio, fin),
+    )
+    return {"desde": inicio, "reportes": reportes, "ejecuciones": ejecuciones}
+
+@app.get("/api/reportes/alertas")
+async def tendencia_alertas(
+    desde: Optional[date] = None,
+    hasta: Optional[date] = None,
+    granularidad: str = Query("dia", pattern="^(dia|semana|mes)$"),
+):
+    """Cada tipo de alerta por periodo: en cuántos reportes apareció y su cantidad máxima y media"""
+    indice, _ = indice_reportes()
+    inicio, fin = rango_reportes(desde, hasta)
+    if not indice.path.exists():
+        return {"desde": inicio, "granularidad": granularidad, "alertas": []}
+    alertas = await asyncio.to_thread(indice.tendencia_alertas, inicio, fin, granularidad)
+    return {"desde": inicio, "granularidad": granularidad, "alertas": alertas}
+
+@app.get("/api/reportes/{reporte_id}")
+async def obtener_reporte(reporte_id: int):
+    """Reporte completo, esté todavía en disco o ya compactado en el índice"""
+    indice, reports_dir = indice_reportes()
+    reporte = await asyncio.to_thread(indice.reporte, reporte_id, reports_dir) if indice.path.exists() else None
+    if reporte is None:
+        raise HTTPException(status_code=404, detail="Reporte no encontrado")
+    return reporte
+
+# ===============================
+# EVENTOS EN VIVO (SSE)
+# ===============================
+
+@app.get("/eventos")
+async def flujo_eventos(
+    tipos: Optional[str] = None,
+    last_event_id: Optional[str] = Header(None, alias="Last-Event-ID"),
+):
+    """
+    Cambios del catálogo y de los envíos en text/event-stream
+
+    tipos filtra por prefijo (p. ej. ?tipos=mascota). Al reconectar, el
+    navegador envía Last-Event-ID y se reponen los eventos perdidos; si ya no
+    están en el historial llega {"tipo": "resync"} y el cliente recarga la lista.
+    """
+    filtro = {t.strip() for t in tipos.split(",") if t.strip()} if tipos else None
+    try:
+        suscripcion = eventos.suscribir(filtro)
+    except LimiteConexiones:
+        raise HTTPException(
+            status_code=503,
+            detail="Demasiadas conexiones de eventos, intenta de nuevo en unos segundos",
+            headers={"Retry-After": "5"},
+        )
+    return StreamingResponse(
+        flujo_sse(eventos, suscripcion, last_event_id),
+        media_type="text/event-stream",
+        headers={"Cache-Control": "no-cache", "X-Accel-Buffering": "no"},
+    )
+
+@app.get("/api/eventos/metricas")
+async def obtener_metricas_eventos():
+    """Conexiones SSE abiertas y eventos publicados en este worker"""
+    return eventos.resumen()
+
+@app.get("/api/limites/metricas")
+async def obtener_metricas_limites():
+    """Admisiones y rechazos (429 por ruta, 503 por saturación) de este worker"""
+    return metricas_limites.resumen()
+
 # ===============================
 # ENDPOINT DE SALUD
 # ===============================
@@ -625,4 +1304,5 @@ async def health_check():
 
 if __name__ == "__main__":
     import uvicorn
-    uvicorn.run(app, host="0.0.0.0", port=8001)
+    # Modo desarrollo (un solo proceso); en producción usar gunicorn.conf.py
+    uvicorn.run(app, host=os.getenv("HOST", "0.0.0.0"), port=int(os.getenv("PORT", "8001")))
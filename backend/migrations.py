@@ -0,0 +1,374 @@
+"""
+Migraciones del esquema de MySQL
+
+Reemplaza la ejecución de sql/init.sql:
+- Cada archivo sql/migrations/NNN_nombre.sql se aplica una sola vez, en orden,
+  y queda registrado en la tabla schema_migrations con su checksum (sha256).
+  Si un archivo ya aplicado cambia, el migrador se detiene en lugar de
+  dejar el esquema divergente.
+- Los statements se separan respetando comillas y comentarios (un ';' dentro
+  de un texto no corta el statement).
+- El DDL de índices (CREATE INDEX, ADD/DROP INDEX) se ejecuta en línea:
+  se le agrega ALGORITHM=INPLACE, LOCK=NONE para que InnoDB construya el
+  índice sin bloquear escrituras. Si MySQL no puede hacerlo en línea falla
+  de inmediato en vez de copiar la tabla bajo bloqueo.
+- Un candado GET_LOCK evita que dos procesos migren a la vez.
+- Los datos de ejemplo (sql/seed.sql) son aparte y solo se cargan sobre una
+  base vacía.
+
+Uso (desde backend/):
+    python migrations.py estado
+    python migrations.py aplicar [--dry-run] [--hasta VERSION] [--sin-online]
+    python migrations.py aplicar --baseline 000   # base creada con el init.sql original
+    python migrations.py seed
+"""
+
+import argparse
+import hashlib
+import os
+import re
+import sys
+import time
+from pathlib import Path
+
+SQL_DIR = Path(os.getenv("SQL_DIR", Path(__file__).resolve().parent.parent / "sql"))
+MIGRATIONS_DIR = SQL_DIR / "migrations"
+SEED_FILE = SQL_DIR / "seed.sql"
+
+LOCK_NAME = "refugio_migraciones"
+LOCK_TIMEOUT = int(os.getenv("MIGRACIONES_LOCK_TIMEOUT", "60"))
+
+ARCHIVO_RE = re.compile(r"^(\d{3,})_([\w\-]+)\.sql$")
+
+CREATE_SCHEMA_MIGRATIONS = """
+CREATE TABLE IF NOT EXISTS schema_migrations (
+    version VARCHAR(10) PRIMARY KEY,
+    nombre VARCHAR(200) NOT NULL,
+    checksum CHAR(64) NOT NULL,
+    aplicada_en TIMESTAMP DEFAULT CURRENT_TIMESTAMP,
+    duracion_ms INT NOT NULL DEFAULT 0
+)
+"""
+
+
+class MigracionError(Exception):
+    """Error que detiene el proceso de migración"""
+
+
+# ==========================================
+# PARSEO DE ARCHIVOS SQL
+# ==========================================
+
+def split_statements(sql):
+    """Separar un script en statements, ignorando ';' en textos y comentarios"""
+    statements = []
+    actual = []
+    i, n = 0, len(sql)
+    while i < n:
+        c = sql[i]
+        # Comentarios de línea: "-- " y "#"
+        if (c == "-" and sql.startswith("--", i) and (i + 2 == n or sql[i + 2].isspace())) or c == "#":
+            fin = sql.find("\n", i)
+            i = n if fin == -1 else fin
+            continue
+        # Comentarios de bloque
+        if c == "/" and sql.startswith("/*", i):
+            fin = sql.find("*/", i + 2)
+            i = n if fin == -1 else fin + 2
+            actual.append(" ")
+            continue
+        # Textos e identificadores entre comillas (con escapes '' y \')
+        if c in ("'", '"', "`"):
+            j = i + 1
+            while j < n:
+                if sql[j] == "\\" and c != "`":
+                    j += 2
+                    continue
+                if sql[j] == c:
+                    if j + 1 < n and sql[j + 1] == c:
+                        j += 2
+                        continue
+                    break
+                j += 1
+            actual.append(sql[i:j + 1])
+            i = j + 1
+            continue
+        if c == ";":
+            statement = "".join(actual).strip()
+            if statement:
+                statements.append(statement)
+            actual = []
+        else:
+            actual.append(c)
+        i += 1
+    statement = "".join(actual).strip()
+    if statement:
+        statements.append(statement)
+    return statements
+
+
+CREATE_INDEX_RE = re.compile(r"^CREATE\s+(UNIQUE\s+)?INDEX\b", re.IGNORECASE)
+ALTER_TABLE_RE = re.compile(r"^ALTER\s+TABLE\s+\S+\s+(.*)$", re.IGNORECASE | re.DOTALL)
+CLAUSULA_INDICE_RE = re.compile(
+    r"^(ADD\s+(UNIQUE\s+)?(INDEX|KEY)|DROP\s+(INDEX|KEY)|RENAME\s+(INDEX|KEY))\b",
+    re.IGNORECASE,
+)
+DDL_OPCIONES_RE = re.compile(r"\b(ALGORITHM|LOCK)\s*=", re.IGNORECASE)
+
+
+def _clausulas(cuerpo):
+    """Separar las cláusulas de un ALTER TABLE por comas de primer nivel"""
+    partes, nivel, actual = [], 0, []
+    for c in cuerpo:
+        if c == "(":
+            nivel += 1
+        elif c == ")":
+            nivel -= 1
+        if c == "," and nivel == 0:
+            partes.append("".join(actual).strip())
+            actual = []
+        else:
+            actual.append(c)
+    partes.append("".join(actual).strip())
+    return partes
+
+
+def online_ddl(statement):
+    """Agregar ALGORITHM=INPLACE, LOCK=NONE al DDL que solo toca índices"""
+    if DDL_OPCIONES_RE.search(statement):
+        return statement
+    if CREATE_INDEX_RE.match(statement):
+        return f"{statement} ALGORITHM=INPLACE LOCK=NONE"
+    match = ALTER_TABLE_RE.match(statement)
+    if match and all(CLAUSULA_INDICE_RE.match(c) for c in _clausulas(match.group(1))):
+        return f"{statement}, ALGORITHM=INPLACE, LOCK=NONE"
+    return statement
+
+
+class Migracion:
+    def __init__(self, path):
+        match = ARCHIVO_RE.match(path.name)
+        self.path = path
+        self.version = match.group(1)
+        self.nombre = match.group(2)
+        contenido = path.read_bytes()
+        self.checksum = hashlib.sha256(contenido).hexdigest()
+        self.sql = contenido.decode("utf-8")
+
+    def statements(self, online=True):
+        statements = split_statements(self.sql)
+        return [online_ddl(s) for s in statements] if online else statements
+
+
+def descubrir_migraciones(directorio=MIGRATIONS_DIR):
+    migraciones = [Migracion(p) for p in sorted(Path(directorio).glob("*.sql")) if ARCHIVO_RE.match(p.name)]
+    versiones = [m.version for m in migraciones]
+    duplicadas = {v for v in versiones if versiones.count(v) > 1}
+    if duplicadas:
+        raise MigracionError(f"Versiones de migración duplicadas: {', '.join(sorted(duplicadas))}")
+    return migraciones
+
+
+# ==========================================
+# MIGRADOR
+# ==========================================
+
+class Migrador:
+    def __init__(self, connect, directorio=MIGRATIONS_DIR, online=True, log=print):
+        # connect() debe devolver una conexión nueva de mysql-connector
+        self.connect = connect
+        self.directorio = Path(directorio)
+        self.online = online
+        self.log = log
+
+    def _registradas(self, cursor):
+        cursor.execute(CREATE_SCHEMA_MIGRATIONS)
+        cursor.execute("SELECT version, nombre, checksum FROM schema_migrations")
+        return {version: (nombre, checksum) for version, nombre, checksum in cursor.fetchall()}
+
+    def _pendientes(self, migraciones, registradas):
+        for m in migraciones:
+            if m.version in registradas and registradas[m.version][1] != m.checksum:
+                raise MigracionError(
+                    f"La migración {m.version}_{m.nombre} cambió después de aplicarse "
+                    f"(checksum {registradas[m.version][1][:12]} → {m.checksum[:12]}). "
+                    "Crea una migración nueva en lugar de editar una aplicada."
+                )
+        return [m for m in migraciones if m.version not in registradas]
+
+    def estado(self):
+        migraciones = descubrir_migraciones(self.directorio)
+        connection = self.connect()
+        try:
+            cursor = connection.cursor()
+            registradas = self._registradas(cursor)
+            cursor.close()
+        finally:
+            connection.close()
+
+        filas = []
+        for m in migraciones:
+            if m.version not in registradas:
+                filas.append((m.version, m.nombre, "pendiente"))
+            elif registradas[m.version][1] != m.checksum:
+                filas.append((m.version, m.nombre, "modificada"))
+            else:
+                filas.append((m.version, m.nombre, "aplicada"))
+        versiones = {m.version for m in migraciones}
+        for version, (nombre, _) in sorted(registradas.items()):
+            if version not in versiones:
+                filas.append((version, nombre, "sin archivo"))
+        return filas
+
+    def aplicar(self, dry_run=False, baseline=None, hasta=None):
+        """Aplicar las migraciones pendientes; devuelve las versiones aplicadas"""
+        migraciones = descubrir_migraciones(self.directorio)
+        if hasta is not None:
+            migraciones = [m for m in migraciones if m.version <= hasta]
+        connection = self.connect()
+        cursor = connection.cursor()
+        try:
+            cursor.execute("SELECT GET_LOCK(%s, %s)", (LOCK_NAME, LOCK_TIMEOUT))
+            if cursor.fetchone()[0] != 1:
+                raise MigracionError(f"Otro proceso está migrando (candado {LOCK_NAME})")
+            try:
+                pendientes = self._pendientes(migraciones, self._registradas(cursor))
+                if not pendientes:
+                    self.log("✅ Esquema al día, no hay migraciones pendientes")
+                    return []
+
+                aplicadas = []
+                for m in pendientes:
+                    if baseline is not None and m.version <= baseline:
+                        self._baseline(cursor, connection, m, dry_run)
+                    else:
+                        self._aplicar_una(cursor, connection, m, dry_run)
+                    aplicadas.append(m.version)
+                return aplicadas
+            finally:
+                cursor.execute("SELECT RELEASE_LOCK(%s)", (LOCK_NAME,))
+                cursor.fetchall()
+        finally:
+            cursor.close()
+            connection.close()
+
+    def _registrar(self, cursor, connection, m, duracion_ms):
+        cursor.execute(
+            "INSERT INTO schema_migrations (version, nombre, checksum, duracion_ms) VALUES (%s, %s, %s, %s)",
+            (m.version, m.nombre, m.checksum, duracion_ms),
+        )
+        connection.commit()
+
+    def _baseline(self, cursor, connection, m, dry_run):
+        if dry_run:
+            self.log(f"📝 {m.version}_{m.nombre}: se marcaría como aplicada (baseline)")
+            return
+        self._registrar(cursor, connection, m, 0)
+        self.log(f"📌 {m.version}_{m.nombre} marcada como aplicada (baseline)")
+
+    def _aplicar_una(self, cursor, connection, m, dry_run):
+        statements = m.statements(online=self.online)
+        if dry_run:
+            self.log(f"📝 {m.version}_{m.nombre} ({len(statements)} statements):")
+            for statement in statements:
+                self.log(f"   {' '.join(statement.split())};")
+            return
+
+        self.log(f"🔄 Aplicando {m.version}_{m.nombre}...")
+        inicio = time.perf_counter()
+        for i, statement in enumerate(statements, 1):
+            try:
+                cursor.execute(statement)
+                if cursor.with_rows:
+                    cursor.fetchall()
+            except Exception as e:
+                # El DDL de MySQL hace commit implícito: lo ya ejecutado queda
+                # aplicado y la migración no se registra.
+                connection.rollback()
+                resumen = " ".join(statement.split())[:200]
+                raise MigracionError(
+                    f"{m.version}_{m.nombre}, statement {i}/{len(statements)} falló: {e}\n   {resumen}"
+                ) from e
+        connection.commit()
+        duracion_ms = int((time.perf_counter() - inicio) * 1000)
+        self._registrar(cursor, connection, m, duracion_ms)
+        self.log(f"✅ {m.version}_{m.nombre} aplicada en {duracion_ms} ms")
+
+    def cargar_seed(self, path=SEED_FILE, dry_run=False):
+        """Cargar los datos de ejemplo si la tabla mascotas está vacía"""
+        path = Path(path)
+        if not path.exists():
+            return False
+        connection = self.connect()
+        cursor = connection.cursor()
+        try:
+            cursor.execute("SELECT COUNT(*) FROM mascotas")
+            if cursor.fetchone()[0] > 0:
+                self.log("ℹ️ La base ya tiene datos, se omite el seed")
+                return False
+            statements = split_statements(path.read_text(encoding="utf-8"))
+            if dry_run:
+                self.log(f"📝 Seed: {len(statements)} statements desde {path.name}")
+                return False
+            for statement in statements:
+                cursor.execute(statement)
+            connection.commit()
+            self.log(f"🌱 Datos de ejemplo cargados ({len(statements)} statements)")
+            return True
+        except Exception:
+            connection.rollback()
+            raise
+        finally:
+            cursor.close()
+            connection.close()
+
+
+# ==========================================
+# LÍNEA DE COMANDOS
+# ==========================================
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Migraciones del esquema del refugio")
+    parser.add_argument("comando", choices=["estado", "aplicar", "seed"])
+    parser.add_argument("--dry-run", action="store_true", help="Mostrar el plan sin ejecutar nada")
+    parser.add_argument("--baseline", metavar="VERSION",
+                        help="Marcar como aplicadas (sin ejecutarlas) las migraciones hasta VERSION")
+    parser.add_argument("--hasta", metavar="VERSION", help="Aplicar solo hasta VERSION (inclusive)")
+    parser.add_argument("--sin-online", action="store_true",
+                        help="No agregar ALGORITHM=INPLACE, LOCK=NONE al DDL de índices")
+    parser.add_argument("--refugio", metavar="SLUG",
+                        help="Solo la base de este refugio (por defecto, todas las de REFUGIOS_CONFIG)")
+    args = parser.parse_args(argv)
+
+    import mysql.connector
+    from database import db
+
+    if args.refugio and args.refugio not in db.refugios:
+        print(f"❌ Refugio desconocido: {args.refugio} (configurados: {', '.join(db.slugs)})")
+        return 1
+    # Cada refugio tiene su propia base y su propio historial de migraciones
+    for slug in [args.refugio] if args.refugio else db.slugs:
+        base = db.base(slug)
+        if db.multiples:
+            print(f"🏠 Refugio {slug} ({base.config['host']}/{base.config['database']})")
+        if args.comando != "estado" and not args.dry_run:
+            base.create_database_if_not_exists()
+        migrador = Migrador(lambda: mysql.connector.connect(**base.config), online=not args.sin_online)
+
+        try:
+            if args.comando == "estado":
+                iconos = {"aplicada": "✅", "pendiente": "⏳", "modificada": "⚠️", "sin archivo": "❓"}
+                for version, nombre, estado in migrador.estado():
+                    print(f"{iconos[estado]} {version}_{nombre}: {estado}")
+            elif args.comando == "aplicar":
+                migrador.aplicar(dry_run=args.dry_run, baseline=args.baseline, hasta=args.hasta)
+            else:
+                migrador.cargar_seed(dry_run=args.dry_run)
+        except MigracionError as e:
+            print(f"❌ {e}")
+            return 1
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
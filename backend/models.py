@@ -1,6 +1,6 @@
-from pydantic import BaseModel, Field
+from pydantic import BaseModel, Field, AfterValidator
 
-from typing import Optional, List
+from typing import Optional, List, Annotated
 
 from datetime import datetime
 
@@ -8,6 +8,14 @@ from enum import Enum
 
 import json
 
+from validation import check_phone, check_optional_phone, check_email, check_optional_email
+
+# Tipos validados: los patrones precompilados viven en validation.py
+Telefono = Annotated[str, Field(max_length=20), AfterValidator(check_phone)]
+TelefonoOpcional = Annotated[Optional[str], Field(max_length=20), AfterValidator(check_optional_phone)]
+Email = Annotated[str, Field(max_length=100), AfterValidator(check_email)]
+EmailOpcional = Annotated[Optional[str], Field(max_length=100), AfterValidator(check_optional_email)]
+
 class EspecieEnum(str, Enum):
     perro = "perro"
     gato = "gato"
@@ -35,7 +43,7 @@ class MascotaBase(BaseModel):
     tamano: Optional[TamanoEnum] = Field(None, description="Tamano de la mascota")
     genero: Optional[GeneroEnum] = Field(None, description="Género de la mascota")
     contacto_nombre: Optional[str] = Field(None, max_length=100, description="Nombre de contacto")
-    contacto_telefono: Optional[str] = Field(None, max_length=20, description="Teléfono de contacto")
+    contacto_telefono: TelefonoOpcional = Field(None, description="Teléfono de contacto")
     estado: EstadoEnum = Field(EstadoEnum.disponible, description="Estado de adopción")
 
 class MascotaCreate(MascotaBase):
@@ -102,8 +110,8 @@ class EstadoSolicitudEnum(str, Enum):
 class SolicitudAdopcionBase(BaseModel):
     mascota_id: int
     nombre: str = Field(..., min_length=1, max_length=100)
-    telefono: str = Field(..., max_length=20)
-    email: str = Field(..., pattern=r'^[^@]+@[^@]+\.[^@]+$')
+    telefono: Telefono
+    email: Email
     direccion: str = Field(..., min_length=10)
     tipo_vivienda: TipoViviendaEnum
     otras_mascotas: OtrasMascotasEnum
@@ -141,8 +149,8 @@ class EstadoVoluntarioEnum(str, Enum):
 
 class SolicitudVoluntariadoBase(BaseModel):
     nombre: str = Field(..., min_length=1, max_length=100)
-    telefono: str = Field(..., max_length=20)
-    email: str = Field(..., pattern=r'^[^@]+@[^@]+\.[^@]+$')
+    telefono: Telefono
+    email: Email
     areas: List[str] = Field(..., min_items=1) # Lista de áreas seleccionadas
     disponibilidad: DisponibilidadEnum
     experiencia: Optional[str] = Field(None, max_length=1000)
@@ -176,8 +184,8 @@ class DonacionBase(BaseModel):
     monto: Optional[float] = Field(None, gt=0)
     descripcion_especie: Optional[str] = Field(None, max_length=1000)
     nombre_donante: str = Field(..., min_length=1, max_length=100)
-    telefono_donante: str = Field(..., max_length=20)
-    email_donante: Optional[str] = Field(None, pattern=r'^[^@]+@[^@]+\.[^@]+$')
+    telefono_donante: Telefono
+    email_donante: EmailOpcional = None
 
 class DonacionCreate(DonacionBase):
     pass
@@ -203,8 +211,8 @@ class EstadoApadrinamientoEnum(str, Enum):
 
 class ApadrinamientoBase(BaseModel):
     nombre_padrino: str = Field(..., min_length=1, max_length=100)
-    telefono_padrino: str = Field(..., max_length=20)
-    email_padrino: str = Field(..., pattern=r'^[^@]+@[^@]+\.[^@]+$')
+    telefono_padrino: Telefono
+    email_padrino: Email
     preferencia_especie: Optional[str] = Field(None)
     aportacion_mensual: float = Field(..., gt=0)
 
@@ -231,7 +239,7 @@ class EstadoDifusionEnum(str, Enum):
 
 class ColaboradorDifusionBase(BaseModel):
     nombre: str = Field(..., min_length=1, max_length=100)
-    email: str = Field(..., pattern=r'^[^@]+@[^@]+\.[^@]+$')
+    email: Email
     tipos_difusion: List[str] = Field(..., min_items=1)
     redes_sociales: Optional[str] = Field(None, max_length=500)
 
@@ -247,6 +255,44 @@ class ColaboradorDifusionResponse(ColaboradorDifusionBase):
     class Config:
         from_attributes = True
 
+# Modelos para series de tiempo
+
+class SerieEnum(str, Enum):
+    donaciones = "donaciones"
+    adopciones = "adopciones"
+
+class GranularidadEnum(str, Enum):
+    dia = "dia"
+    semana = "semana"
+    mes = "mes"
+
+# Modelos para revisión por lotes (administración)
+
+IdRegistro = Annotated[int, Field(gt=0)]
+
+class CambioEstadoBase(BaseModel):
+    ids: List[IdRegistro] = Field(..., min_length=1, max_length=500)
+    notas_admin: Optional[str] = Field(None, max_length=1000)
+
+class CambioEstadoAdopcion(CambioEstadoBase):
+    estado: EstadoSolicitudEnum
+
+class CambioEstadoVoluntariado(CambioEstadoBase):
+    estado: EstadoVoluntarioEnum
+
+class CambioEstadoDonacion(CambioEstadoBase):
+    estado: EstadoDonacionEnum
+
+class CambioEstadoApadrinamiento(CambioEstadoBase):
+    estado: EstadoApadrinamientoEnum
+
+class CambioEstadoResponse(BaseModel):
+    estado: str
+    actualizados: List[int]
+    no_encontrados: List[int]
+    rechazadas_automaticamente: List[int] = []
+    mascotas_adoptadas: List[int] = []
+
 # Modelos para datos externos
 
 class ExternalDataResponse(BaseModel):
@@ -255,8 +301,19 @@ class ExternalDataResponse(BaseModel):
 
 # Modelos para pipeline
 
+class PipelineJobResponse(BaseModel):
+    nombre: str
+    cron: str
+    estado: str
+    ultima_ejecucion: Optional[datetime]
+    ultima_duracion_s: Optional[float]
+    proxima_ejecucion: Optional[datetime]
+    registros_procesados: int
+    ultimo_error: Optional[str]
+
 class PipelineStatusResponse(BaseModel):
     status: str
     last_run: Optional[str]
     next_run: Optional[str]
     processed_records: int
+    jobs: List[PipelineJobResponse] = []
@@ -0,0 +1,243 @@
+"""
+Avisos por correo de los envíos nuevos (bandeja de salida / outbox)
+
+El equipo se enteraba de las solicitudes, donaciones y apadrinamientos
+nuevos solo por las alertas del reporte diario del pipeline. Ahora cada
+envío deja una fila en la tabla notificaciones en la misma transacción que
+su INSERT (insertar_envio y el worker de ingesta): si el envío se guarda,
+su aviso también, y si hay rollback no queda ninguno.
+
+La petición solo paga ese INSERT. Un worker en segundo plano junta cada
+NOTIFICACIONES_INTERVALO_S los avisos pendientes de cada refugio y manda un
+único correo de resumen por SMTP.
+
+- Varios workers: cada lote se reclama con un UPDATE ... LIMIT que marca las
+  filas con su lote y un lease; si un worker muere, sus filas se vuelven a
+  reclamar al vencer el lease.
+- Si el SMTP falla, el lote se reprograma con backoff exponencial
+  (NOTIFICACIONES_BACKOFF_S * 2^intentos, como máximo una hora) hasta
+  NOTIFICACIONES_MAX_INTENTOS; después queda como 'fallida'.
+- La entrega es al menos una vez: si el proceso muere entre el envío del
+  correo y el UPDATE que lo registra, el resumen se repite.
+
+Se activa con NOTIFICACIONES_PARA (correos separados por comas); con varios
+refugios, cada uno puede tener sus destinatarios ("notificar" en
+REFUGIOS_CONFIG). Para probar sin un servidor real:
+
+    pip install aiosmtpd && python -m aiosmtpd -n -l localhost:1025
+    SMTP_HOST=localhost SMTP_PORT=1025 NOTIFICACIONES_PARA=equipo@refugio.org uvicorn main:app
+"""
+
+import asyncio
+import os
+import smtplib
+import time
+import uuid
+from email.message import EmailMessage
+
+from mysql.connector import Error
+
+NOTIFICACIONES_INTERVALO_S = float(os.getenv("NOTIFICACIONES_INTERVALO_S", "60"))
+NOTIFICACIONES_TIPOS = [
+    tipo.strip() for tipo in os.getenv(
+        "NOTIFICACIONES_TIPOS", "solicitud_adopcion,solicitud_voluntariado,donacion,apadrinamiento"
+    ).split(",") if tipo.strip()
+]
+# Las enviadas se borran después de estos días; las fallidas quedan para revisarlas
+NOTIFICACIONES_RETENCION_DIAS = int(os.getenv("NOTIFICACIONES_RETENCION_DIAS", "30"))
+
+# Título de cada sección del resumen, en este orden
+SECCIONES = {
+    "solicitud_adopcion": "Solicitudes de adopción",
+    "solicitud_voluntariado": "Solicitudes de voluntariado",
+    "donacion": "Donaciones",
+    "apadrinamiento": "Apadrinamientos",
+    "colaborador_difusion": "Colaboradores de difusión",
+}
+
+
+class Notificador:
+    def __init__(self, get_connection, destinatarios, smtp, remitente, tipos,
+                 asunto="Refugio de Mascotas", intervalo=60, tamano_lote=500,
+                 max_intentos=8, backoff=30, lease=300):
+        # get_connection(refugio): conexión al primario de ese refugio
+        self.get_connection = get_connection
+        # {refugio: [correos]}; solo se notifican los refugios con destinatarios
+        self.destinatarios = {refugio: correos for refugio, correos in destinatarios.items() if correos}
+        self.smtp = smtp
+        self.remitente = remitente
+        self.tipos = set(tipos)
+        self.asunto = asunto
+        self.intervalo = intervalo
+        self.tamano_lote = tamano_lote
+        self.max_intentos = max_intentos
+        self.backoff = backoff
+        self.lease = lease
+        self._limpieza = 0.0
+
+    # ===============================
+    # LADO DE LA API
+    # ===============================
+
+    def registrar(self, cursor, refugio, tipo, registro_id, detalle):
+        """Agregar el aviso de un envío; va en la transacción de su INSERT"""
+        if tipo not in self.tipos or refugio not in self.destinatarios:
+            return
+        cursor.execute(
+            "INSERT INTO notificaciones (tipo, registro_id, detalle) VALUES (%s, %s, %s)",
+            (tipo, registro_id, detalle[:255])
+        )
+
+    # ===============================
+    # WORKER DE ENVÍO
+    # ===============================
+
+    def _ejecutar(self, refugio, sql, params=(), leer=False):
+        """Un statement en su propia transacción (no se retiene la conexión durante el SMTP)"""
+        connection = self.get_connection(refugio)
+        cursor = connection.cursor(dictionary=True)
+        try:
+            cursor.execute(sql, params)
+            resultado = cursor.fetchall() if leer else cursor.rowcount
+            connection.commit()
+            return resultado
+        finally:
+            cursor.close()
+            connection.close()
+
+    def _reclamar_lote(self, refugio):
+        lote = uuid.uuid4().hex
+        reclamadas = self._ejecutar(
+            refugio,
+            """
+            UPDATE notificaciones
+            SET estado = 'enviando', lote = %s, reclamado_hasta = NOW() + INTERVAL %s SECOND
+            WHERE (estado = 'pendiente' AND proximo_intento <= NOW())
+               OR (estado = 'enviando' AND reclamado_hasta < NOW())
+            ORDER BY id LIMIT %s
+            """, (lote, self.lease, self.tamano_lote)
+        )
+        if not reclamadas:
+            return lote, []
+        return lote, self._ejecutar(
+            refugio,
+            "SELECT id, tipo, registro_id, detalle, intentos, created_at FROM notificaciones "
+            "WHERE lote = %s ORDER BY id", (lote,), leer=True
+        )
+
+    def armar_resumen(self, refugio, filas):
+        """Un correo con los envíos agrupados por tipo"""
+        asunto = self.asunto if len(self.destinatarios) == 1 else f"{self.asunto} ({refugio})"
+        lineas = [f"Envíos nuevos desde el último resumen: {len(filas)}", ""]
+        for tipo, titulo in SECCIONES.items():
+            grupo = [fila for fila in filas if fila["tipo"] == tipo]
+            if not grupo:
+                continue
+            lineas.append(f"{titulo} ({len(grupo)})")
+            for fila in grupo:
+                lineas.append(f"  - #{fila['registro_id']} {fila['detalle']} ({fila['created_at']:%d/%m %H:%M})")
+            lineas.append("")
+
+        mensaje = EmailMessage()
+        mensaje["Subject"] = f"{asunto}: {len(filas)} envíos nuevos"
+        mensaje["From"] = self.remitente
+        mensaje["To"] = ", ".join(self.destinatarios[refugio])
+        mensaje.set_content("\n".join(lineas))
+        return mensaje
+
+    def _enviar_smtp(self, mensaje):
+        clase = smtplib.SMTP_SSL if self.smtp.get("ssl") else smtplib.SMTP
+        with clase(self.smtp["host"], self.smtp["port"], timeout=30) as servidor:
+            if self.smtp.get("starttls"):
+                servidor.starttls()
+            if self.smtp.get("user"):
+                servidor.login(self.smtp["user"], self.smtp["password"])
+            servidor.send_message(mensaje)
+
+    def enviar_lote(self, refugio):
+        """Reclamar los avisos listos de un refugio y enviar su resumen; devuelve cuántos se enviaron"""
+        lote, filas = self._reclamar_lote(refugio)
+        if not filas:
+            return 0
+        try:
+            self._enviar_smtp(self.armar_resumen(refugio, filas))
+        except Exception as e:
+            # SMTP caído o un resumen que no se pudo armar: backoff y, al agotar
+            # los intentos, 'fallida' (sin esto el lote volvería a reclamarse sin fin)
+            # intentos ya incrementado al calcular estado y proximo_intento (MySQL asigna en orden)
+            self._ejecutar(
+                refugio,
+                """
+                UPDATE notificaciones
+                SET intentos = intentos + 1, error = %s, lote = NULL, reclamado_hasta = NULL,
+                    estado = IF(intentos >= %s, 'fallida', 'pendiente'),
+                    proximo_intento = NOW() + INTERVAL LEAST(%s * POW(2, intentos - 1), 3600) SECOND
+                WHERE lote = %s
+                """, (str(e)[:500], self.max_intentos, self.backoff, lote)
+            )
+            print(f"⚠️ Notificaciones [{refugio}]: no se pudo enviar el resumen de {len(filas)} envíos: {e}")
+            return 0
+        self._ejecutar(
+            refugio,
+            "UPDATE notificaciones SET estado = 'enviada', enviada_at = NOW(), lote = NULL, error = NULL "
+            "WHERE lote = %s", (lote,)
+        )
+        print(f"📧 Notificaciones [{refugio}]: resumen de {len(filas)} envíos enviado")
+        return len(filas)
+
+    def limpiar(self, refugio):
+        return self._ejecutar(
+            refugio,
+            "DELETE FROM notificaciones WHERE estado = 'enviada' AND enviada_at < NOW() - INTERVAL %s DAY",
+            (NOTIFICACIONES_RETENCION_DIAS,)
+        )
+
+    async def run(self):
+        """Bucle del worker: un resumen por refugio cada intervalo"""
+        while True:
+            limpiar = time.monotonic() >= self._limpieza
+            for refugio in self.destinatarios:
+                try:
+                    # Más avisos que un lote: se siguen enviando sin esperar al próximo intervalo
+                    while await asyncio.to_thread(self.enviar_lote, refugio) == self.tamano_lote:
+                        pass
+                    if limpiar:
+                        await asyncio.to_thread(self.limpiar, refugio)
+                except Error as e:
+                    print(f"❌ Notificaciones [{refugio}]: MySQL no disponible, se reintentará: {e}")
+                except Exception as e:
+                    # Un fallo inesperado no debe detener los resúmenes de todos los refugios
+                    print(f"❌ Notificaciones [{refugio}]: error inesperado, se reintentará: {e!r}")
+            if limpiar:
+                self._limpieza = time.monotonic() + 3600
+            await asyncio.sleep(self.intervalo)
+
+
+def crear_notificador(get_connection, refugios):
+    """Notificador configurado por entorno, o None si no hay destinatarios"""
+    para = [correo.strip() for correo in os.getenv("NOTIFICACIONES_PARA", "").split(",") if correo.strip()]
+    destinatarios = {
+        slug: opciones.get("notificar") if opciones.get("notificar") is not None else para
+        for slug, opciones in refugios.items()
+    }
+    if not any(destinatarios.values()):
+        return None
+    smtp = {
+        "host": os.getenv("SMTP_HOST", "localhost"),
+        "port": int(os.getenv("SMTP_PORT", "25")),
+        "user": os.getenv("SMTP_USER"),
+        "password": os.getenv("SMTP_PASSWORD"),
+        "starttls": os.getenv("SMTP_STARTTLS", "false").lower() == "true",
+        "ssl": os.getenv("SMTP_SSL", "false").lower() == "true",
+    }
+    return Notificador(
+        get_connection,
+        destinatarios,
+        smtp,
+        os.getenv("NOTIFICACIONES_DE", "notificaciones@refugio.local"),
+        NOTIFICACIONES_TIPOS,
+        asunto=os.getenv("NOTIFICACIONES_ASUNTO", "Refugio de Mascotas"),
+        intervalo=NOTIFICACIONES_INTERVALO_S,
+        max_intentos=int(os.getenv("NOTIFICACIONES_MAX_INTENTOS", "8")),
+        backoff=float(os.getenv("NOTIFICACIONES_BACKOFF_S", "30")),
+    )
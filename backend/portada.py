@@ -0,0 +1,130 @@
+"""
+Respuesta agregada de la página de inicio (GET /home)
+
+La portada necesitaba varias peticiones al cargar (mascotas, contadores de
+colaboración, datos externos), cada una con su viaje de ida y vuelta. GET
+/home las reúne en una sola respuesta: los componentes se piden a la vez
+con asyncio.gather y cada uno tiene su propia caché con TTL en el worker.
+
+- Una sola recarga por componente a la vez. Solo la primera carga se
+  espera; después, un componente vencido se recarga en segundo plano y
+  mientras tanto se sirve el valor anterior, así una API externa lenta no
+  frena la portada.
+- Si una carga falla se sigue sirviendo el valor anterior y no se reintenta
+  hasta HOME_REINTENTO_S; si nunca hubo valor, el componente va en null y
+  su nombre en "errores".
+- El cuerpo JSON y su ETag se calculan una vez por combinación de versiones
+  de los componentes. Con If-None-Match se responde 304, y como la
+  respuesta lleva ETag, CompressionMiddleware comprime cada versión una
+  sola vez.
+"""
+
+import asyncio
+import hashlib
+import os
+import time
+
+import orjson
+from fastapi import Response
+
+from responses import _default, etag_coincide
+
+HOME_TTL_MASCOTAS = float(os.getenv("HOME_TTL_MASCOTAS", "30"))
+HOME_TTL_ESTADISTICAS = float(os.getenv("HOME_TTL_ESTADISTICAS", "60"))
+HOME_TTL_EXTERNOS = float(os.getenv("HOME_TTL_EXTERNOS", "3600"))
+# Tras un fallo, segundos hasta volver a intentar (como máximo el TTL)
+HOME_REINTENTO_S = float(os.getenv("HOME_REINTENTO_S", "30"))
+
+
+class Componente:
+    """Valor de un componente de la portada, recargado al vencer su TTL"""
+
+    def __init__(self, nombre, cargar, ttl):
+        self.nombre = nombre
+        # Corrutina sin argumentos que devuelve el valor actual
+        self.cargar = cargar
+        self.ttl = ttl
+        self.valor = None
+        self.version = 0
+        self.error = None
+        self.vence = 0.0
+        self._recarga = None
+        # Cuántas veces se invalidó; una recarga que empezó antes de la última
+        # traería los datos previos al cambio
+        self._invalidaciones = 0
+
+    async def obtener(self):
+        if time.monotonic() >= self.vence and self._recarga is None:
+            self._recarga = asyncio.ensure_future(self._recargar())
+        if self._recarga is not None and not self.version:
+            # Primera carga: no hay nada que servir mientras tanto
+            # (shield: si esta petición se cancela, la carga sigue para las demás)
+            await asyncio.shield(self._recarga)
+        if self.version:
+            # Vencido con una recarga en curso: se sirve el valor anterior sin esperarla
+            return self.valor
+        raise self.error
+
+    async def _recargar(self):
+        try:
+            # Invalidado mientras cargaba: se vuelve a cargar antes de publicar
+            generacion = None
+            while generacion != self._invalidaciones:
+                generacion = self._invalidaciones
+                valor = await self.cargar()
+            self.valor = valor
+            self.version += 1
+            self.error = None
+            self.vence = time.monotonic() + self.ttl
+        except Exception as e:
+            # Sin reintentar en cada petición mientras la fuente siga caída
+            self.error = e
+            self.vence = time.monotonic() + min(self.ttl, HOME_REINTENTO_S)
+            anterior = "se sirve la versión anterior" if self.version else "sin datos"
+            print(f"⚠️ No se pudo cargar '{self.nombre}' de la portada ({anterior}): {e}")
+        finally:
+            self._recarga = None
+
+    def invalidar(self):
+        self._invalidaciones += 1
+        self.vence = 0.0
+
+
+class Portada:
+    def __init__(self, componentes):
+        self.componentes = {componente.nombre: componente for componente in componentes}
+        self._cuerpo = None
+
+    def componente(self, nombre):
+        return self.componentes[nombre]
+
+    async def armar(self):
+        """(cuerpo JSON, ETag) con todos los componentes pedidos en paralelo"""
+        resultados = await asyncio.gather(
+            *(componente.obtener() for componente in self.componentes.values()),
+            return_exceptions=True,
+        )
+        datos, errores = {}, []
+        for nombre, resultado in zip(self.componentes, resultados):
+            if isinstance(resultado, BaseException):
+                datos[nombre] = None
+                errores.append(nombre)
+            else:
+                datos[nombre] = resultado
+
+        # Mismas versiones y mismos errores: mismo cuerpo, no se vuelve a serializar
+        clave = (tuple(c.version for c in self.componentes.values()), tuple(errores))
+        if self._cuerpo is None or self._cuerpo[0] != clave:
+            if errores:
+                datos["errores"] = errores
+            cuerpo = orjson.dumps(datos, default=_default, option=orjson.OPT_NON_STR_KEYS)
+            etag = f'W/"home-{hashlib.blake2b(cuerpo, digest_size=8).hexdigest()}"'
+            self._cuerpo = (clave, cuerpo, etag)
+        return self._cuerpo[1], self._cuerpo[2]
+
+    async def responder(self, request):
+        cuerpo, etag = await self.armar()
+        cabeceras = {"ETag": etag, "Cache-Control": "no-cache"}
+        if etag_coincide(request.headers.get("if-none-match"), etag):
+            return Response(status_code=304, headers=cabeceras)
+        return Response(content=cuerpo, media_type="application/json", headers=cabeceras)
@@ -0,0 +1,90 @@
+"""
+Varios refugios en un mismo despliegue
+
+Cada refugio tiene su propia base de datos, que puede estar en otra
+instancia de MySQL (REFUGIOS_CONFIG, ver refugios.example.json y
+cargar_refugios en config_refugios.py). Así, sumar refugios reparte la
+carga entre servidores en vez de amontonarla en uno solo.
+
+- RefugioMiddleware resuelve el refugio de cada petición: cabecera
+  X-Refugio, parámetro ?refugio= (EventSource no envía cabeceras propias),
+  dominio del Host, o el predeterminado. db.get_connection() usa entonces
+  el pool de ese refugio.
+- Las cachés por worker que dependen de los datos (portada, índice de
+  imágenes) se crean por refugio con PorRefugio.
+
+Sin REFUGIOS_CONFIG hay un único refugio con la configuración DB_* y todo
+funciona como antes.
+"""
+
+from starlette.datastructures import Headers
+from starlette.responses import JSONResponse
+
+from database import db, _refugio_actual
+
+HEADER = "X-Refugio"
+PARAMETRO = "refugio"
+
+
+def resolver_refugio(scope):
+    """Slug del refugio pedido (sin validar), o el predeterminado"""
+    headers = Headers(scope=scope)
+    slug = headers.get(HEADER)
+    if not slug:
+        from urllib.parse import parse_qs
+        valores = parse_qs(scope.get("query_string", b"").decode("latin-1")).get(PARAMETRO)
+        slug = valores[0] if valores else None
+    if not slug and db.dominios:
+        host = headers.get("host", "").split(":")[0].lower()
+        slug = db.dominios.get(host)
+    return (slug or db.predeterminado).strip().lower()
+
+
+class RefugioMiddleware:
+    """Fija el refugio de la petición; 404 si no está configurado"""
+
+    def __init__(self, app):
+        self.app = app
+
+    async def __call__(self, scope, receive, send):
+        if scope["type"] != "http":
+            await self.app(scope, receive, send)
+            return
+
+        slug = resolver_refugio(scope)
+        if slug not in db.refugios:
+            respuesta = JSONResponse({"detail": f"Refugio desconocido: {slug}"}, status_code=404)
+            await respuesta(scope, receive, send)
+            return
+
+        async def send_con_refugio(message):
+            if message["type"] == "http.response.start":
+                extra = [(b"x-refugio", slug.encode())]
+                if db.multiples:
+                    # La misma URL responde distinto según el refugio
+                    extra.append((b"vary", HEADER.encode()))
+                message = {**message, "headers": list(message.get("headers", [])) + extra}
+            await send(message)
+
+        token = _refugio_actual.set(slug)
+        try:
+            await self.app(scope, receive, send_con_refugio)
+        finally:
+            _refugio_actual.reset(token)
+
+
+class PorRefugio:
+    """Un objeto por refugio (cachés del worker), creado en su primer uso"""
+
+    def __init__(self, fabrica):
+        self.fabrica = fabrica
+        self._objetos = {}
+
+    def actual(self):
+        return self.de(db.actual())
+
+    def de(self, slug):
+        objeto = self._objetos.get(slug)
+        if objeto is None:
+            objeto = self._objetos[slug] = self.fabrica()
+        return objeto
@@ -0,0 +1,105 @@
+"""
+Respuestas JSON rápidas para los listados
+
+FastJSONResponse serializa con orjson y acepta los tipos que devuelve
+mysql-connector (Decimal, date, datetime). Los endpoints de listado la
+devuelven directamente, así FastAPI no revalida cada fila contra el
+response_model: las filas vienen de nuestra propia base de datos.
+
+conditional_listing agrega ETag / Last-Modified a los listados y resuelve
+los GET condicionales (304) antes de consultar las filas.
+"""
+
+from decimal import Decimal
+from email.utils import formatdate
+
+import orjson
+from fastapi import Response
+from fastapi.responses import ORJSONResponse
+
+from database import db
+
+# Suma de control de un listado: cambia con cada fila insertada, modificada o borrada
+SUMA_FILAS = "BIT_XOR(CRC32(CONCAT(id, '-', updated_at)))"
+
+# orjson >= 3.9 permite incrustar JSON ya serializado sin decodificarlo
+_Fragment = getattr(orjson, "Fragment", None)
+
+
+def _default(value):
+    if isinstance(value, Decimal):
+        return float(value)
+    if isinstance(value, (bytes, bytearray)):
+        return value.decode("utf-8")
+    raise TypeError
+
+
+class FastJSONResponse(ORJSONResponse):
+    def render(self, content) -> bytes:
+        return orjson.dumps(
+            content,
+            default=_default,
+            option=orjson.OPT_NON_STR_KEYS | orjson.OPT_SERIALIZE_NUMPY,
+        )
+
+
+def raw_json_column(rows, column):
+    """Pasar una columna JSON de MySQL a la respuesta sin json.loads por fila"""
+    for row in rows:
+        value = row.get(column)
+        if isinstance(value, (str, bytes, bytearray)):
+            row[column] = _Fragment(value) if _Fragment else orjson.loads(value)
+    return rows
+
+
+def etag_coincide(if_none_match, etag):
+    """True si la cabecera If-None-Match del cliente ya incluye el ETag actual"""
+    if if_none_match is None:
+        return False
+    etags = [valor.strip() for valor in if_none_match.split(",")]
+    return etag in etags or "*" in etags
+
+
+def conditional_listing(request, cursor, table, variant="", incluir_archivo=False):
+    """
+    Validadores HTTP de un listado a partir de MAX(updated_at), COUNT(*) y
+    una suma de control de las filas
+
+    Devuelve (respuesta_304 o None, cabeceras). Si el cliente ya tiene la
+    versión actual, el endpoint responde 304 sin ejecutar la consulta del
+    listado. updated_at tiene microsegundos (migración 009), así dos
+    escrituras en el mismo segundo dan ETags distintos; la suma de control
+    (BIT_XOR de CRC32 de id y updated_at) cambia con cada fila escrita o
+    borrada aunque no cambien el total ni el máximo. Con incluir_archivo se
+    suma <table>_archivo. El ETag lleva el refugio: dos bases pueden
+    coincidir en todo lo demás.
+
+    Last-Modified es informativo: no refleja los borrados, por eso
+    If-Modified-Since no produce 304 (los clientes usan If-None-Match).
+    """
+    if incluir_archivo:
+        cursor.execute(
+            "SELECT UNIX_TIMESTAMP(MAX(ultima)) AS ultima, SUM(total) AS total, BIT_XOR(suma) AS suma FROM ("
+            f"SELECT MAX(updated_at) AS ultima, COUNT(*) AS total, {SUMA_FILAS} AS suma FROM {table} UNION ALL "
+            f"SELECT MAX(updated_at), COUNT(*), {SUMA_FILAS} FROM {table}_archivo) t"
+        )
+        variant += "+archivo"
+    else:
+        cursor.execute(
+            f"SELECT UNIX_TIMESTAMP(MAX(updated_at)) AS ultima, COUNT(*) AS total, {SUMA_FILAS} AS suma FROM {table}"
+        )
+    fila = cursor.fetchone()
+    ultima = fila["ultima"] or 0
+    etag = (
+        f'W/"{db.actual()}:{table}{variant}-{int(fila["total"] or 0)}-'
+        f'{int(ultima * 1_000_000):x}-{int(fila["suma"] or 0):x}"'
+    )
+    headers = {
+        "ETag": etag,
+        "Last-Modified": formatdate(int(ultima), usegmt=True),
+        "Cache-Control": "no-cache",
+    }
+
+    if etag_coincide(request.headers.get("if-none-match"), etag):
+        return Response(status_code=304, headers=headers), headers
+    return None, headers
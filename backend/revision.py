@@ -0,0 +1,155 @@
+"""
+Revisión por lotes de solicitudes, donaciones y apadrinamientos
+
+Cambia el estado de muchos registros en una sola transacción con UPDATEs
+por conjunto (WHERE id IN (...)). Aprobar una solicitud de adopción además
+marca la mascota como adoptada y rechaza las demás solicitudes abiertas de
+esa mascota, todo en la misma transacción.
+
+Orden de bloqueo (igual para todos los revisores, para no caer en
+deadlocks): primero las mascotas, luego las filas de la tabla revisada,
+siempre por id ascendente y en una sola sentencia FOR UPDATE. Si MySQL
+igual detecta un deadlock, la transacción se reintenta.
+"""
+
+from mysql.connector import Error
+
+TABLAS_REVISION = ("solicitudes_adopcion", "solicitudes_voluntariado", "donaciones", "apadrinamientos")
+
+# Solicitudes de adopción que todavía compiten por la mascota
+ESTADOS_ABIERTOS_ADOPCION = ("pendiente", "revisando")
+NOTA_RECHAZO_AUTOMATICO = "Rechazada automáticamente: la mascota fue adoptada con otra solicitud"
+
+ER_LOCK_DEADLOCK = 1213
+
+
+class ConflictoRevision(Exception):
+    """El cambio pedido contradice el estado actual (se responde 409)"""
+
+
+def _marcadores(valores):
+    return ", ".join(["%s"] * len(valores))
+
+
+def _bloquear(cursor, tabla, ids, columnas="id"):
+    """SELECT ... FOR UPDATE por clave primaria, en orden ascendente"""
+    if not ids:
+        return []
+    cursor.execute(
+        f"SELECT {columnas} FROM {tabla} WHERE id IN ({_marcadores(ids)}) ORDER BY id FOR UPDATE",
+        ids
+    )
+    return cursor.fetchall()
+
+
+def _actualizar(cursor, tabla, ids, estado, notas_admin):
+    if ids:
+        cursor.execute(
+            f"UPDATE {tabla} SET estado = %s, notas_admin = COALESCE(%s, notas_admin) "
+            f"WHERE id IN ({_marcadores(ids)})",
+            [estado, notas_admin, *ids]
+        )
+
+
+def _cambiar_estado(cursor, tabla, ids, estado, notas_admin):
+    encontrados = [fila[0] for fila in _bloquear(cursor, tabla, ids)]
+    _actualizar(cursor, tabla, encontrados, estado, notas_admin)
+    return {"actualizados": encontrados}
+
+
+def _aprobar_adopciones(cursor, ids, notas_admin):
+    # 1. Mascota de cada solicitud (mascota_id no cambia, no hace falta bloquear aún)
+    cursor.execute(
+        f"SELECT id, mascota_id, estado FROM solicitudes_adopcion WHERE id IN ({_marcadores(ids)})",
+        ids
+    )
+    solicitudes = {id_: (mascota_id, estado) for id_, mascota_id, estado in cursor.fetchall()}
+    if not solicitudes:
+        return {"actualizados": []}
+
+    por_mascota = {}
+    for id_, (mascota_id, _) in solicitudes.items():
+        por_mascota.setdefault(mascota_id, []).append(id_)
+    repetidas = {m: s for m, s in por_mascota.items() if len(s) > 1}
+    if repetidas:
+        detalle = "; ".join(f"mascota {m}: solicitudes {', '.join(map(str, sorted(s)))}"
+                            for m, s in sorted(repetidas.items()))
+        raise ConflictoRevision(f"Solo se puede aprobar una solicitud por mascota ({detalle})")
+
+    # 2. Bloquear las mascotas: serializa a los revisores que aprueban la misma
+    #    mascota e impide nuevas solicitudes para ella hasta el commit (FK)
+    mascotas = sorted(por_mascota)
+    estados_mascota = dict(_bloquear(cursor, "mascotas", mascotas, "id, estado"))
+    for mascota_id in mascotas:
+        id_solicitud = por_mascota[mascota_id][0]
+        if estados_mascota.get(mascota_id) == "adoptado" and solicitudes[id_solicitud][1] != "aprobada":
+            raise ConflictoRevision(f"La mascota {mascota_id} ya fue adoptada (solicitud {id_solicitud})")
+
+    # 3. Solicitudes abiertas que compiten por esas mascotas
+    cursor.execute(
+        f"SELECT id FROM solicitudes_adopcion WHERE mascota_id IN ({_marcadores(mascotas)}) "
+        f"AND estado IN ({_marcadores(ESTADOS_ABIERTOS_ADOPCION)})",
+        [*mascotas, *ESTADOS_ABIERTOS_ADOPCION]
+    )
+    competidoras = {fila[0] for fila in cursor.fetchall()} - set(solicitudes)
+
+    # 4. Bloquear aprobadas y competidoras juntas, en orden de id
+    bloqueadas = _bloquear(cursor, "solicitudes_adopcion", sorted(set(solicitudes) | competidoras), "id, estado")
+    abiertas = {id_ for id_, estado in bloqueadas if estado in ESTADOS_ABIERTOS_ADOPCION}
+    aprobadas = sorted(id_ for id_, _ in bloqueadas if id_ in solicitudes)
+    rechazadas = sorted(competidoras & abiertas)
+
+    # 5. UPDATEs por conjunto
+    _actualizar(cursor, "solicitudes_adopcion", aprobadas, "aprobada", notas_admin)
+    if rechazadas:
+        cursor.execute(
+            f"UPDATE solicitudes_adopcion SET estado = 'rechazada', notas_admin = COALESCE(notas_admin, %s) "
+            f"WHERE id IN ({_marcadores(rechazadas)})",
+            [NOTA_RECHAZO_AUTOMATICO, *rechazadas]
+        )
+    cursor.execute(
+        f"UPDATE mascotas SET estado = 'adoptado' WHERE id IN ({_marcadores(mascotas)})",
+        mascotas
+    )
+    return {"actualizados": aprobadas, "rechazadas_automaticamente": rechazadas, "mascotas_adoptadas": mascotas}
+
+
+def cambiar_estado(connection, tabla, ids, estado, notas_admin=None, intentos=3):
+    """
+    Cambiar el estado de los ids indicados en una transacción
+
+    Devuelve actualizados, no_encontrados y, al aprobar adopciones,
+    rechazadas_automaticamente y mascotas_adoptadas.
+    """
+    if tabla not in TABLAS_REVISION:
+        raise ValueError(f"Tabla no revisable: {tabla}")
+    ids = sorted(set(ids))
+    for intento in range(1, intentos + 1):
+        cursor = connection.cursor()
+        try:
+            # READ COMMITTED: cada lectura ve lo confirmado hasta ese momento
+            # (las solicitudes creadas antes de bloquear la mascota incluidas)
+            # y se evitan los bloqueos de huecos de REPEATABLE READ.
+            connection.start_transaction(isolation_level="READ COMMITTED")
+            if tabla == "solicitudes_adopcion" and estado == "aprobada":
+                resultado = _aprobar_adopciones(cursor, ids, notas_admin)
+            else:
+                resultado = _cambiar_estado(cursor, tabla, ids, estado, notas_admin)
+            connection.commit()
+            break
+        except Error as e:
+            connection.rollback()
+            if e.errno == ER_LOCK_DEADLOCK and intento < intentos:
+                continue
+            raise
+        except Exception:
+            connection.rollback()
+            raise
+        finally:
+            cursor.close()
+
+    resultado.setdefault("rechazadas_automaticamente", [])
+    resultado.setdefault("mascotas_adoptadas", [])
+    resultado["estado"] = estado
+    resultado["no_encontrados"] = sorted(set(ids) - set(resultado["actualizados"]))
+    return resultado
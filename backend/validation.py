@@ -0,0 +1,101 @@
+"""
+Validación y sanitización compartidas por la API y los modelos
+
+Los patrones se compilan una sola vez al importar el módulo, y
+sanitize_input evita el parseo HTML completo de bleach cuando el texto no
+contiene caracteres de marcado.
+"""
+
+import re
+
+# Teléfonos de Costa Rica: +506 8888 1122, 8888-1122, 88881122...
+PHONE_RE = re.compile(r'^(\+506\s?)?[0-9]{4}[-\s]?[0-9]{4}$')
+EMAIL_RE = re.compile(r'^[^@]+@[^@]+\.[^@]+$')
+FILENAME_UNSAFE_RE = re.compile(r'[^a-zA-Z0-9._-]')
+
+PHONE_ERROR = "Formato de teléfono inválido (use formato costarricense: +506 8888 1122 o 8888-1122)"
+EMAIL_ERROR = "Formato de email inválido"
+
+
+def has_markup(text: str) -> bool:
+    """True si el texto tiene caracteres que bleach escaparía o eliminaría"""
+    return '<' in text or '>' in text or '&' in text
+
+
+def sanitize_input(text: str) -> str:
+    """Sanitizar texto para prevenir XSS"""
+    if not text:
+        return text
+    # Texto plano sin marcado: bleach lo devolvería igual
+    if not has_markup(text):
+        return text
+    import bleach
+    # Remover HTML malicioso pero mantener texto plano
+    return bleach.clean(text, tags=[], attributes={}, strip=True)
+
+
+def validate_phone(phone: str) -> bool:
+    """Validar formato de teléfono costarricense"""
+    if not phone:
+        return False
+    return PHONE_RE.match(phone.strip()) is not None
+
+
+def validate_email(email: str) -> bool:
+    """Validar formato de email"""
+    if not email:
+        return False
+    return EMAIL_RE.match(email.strip()) is not None
+
+
+# ===============================
+# NORMALIZACIÓN DE CONTACTOS
+# ===============================
+
+# Misma regla que el backfill de sql/migrations/006_contactos_normalizados.sql
+NO_DIGITOS_RE = re.compile(r'[^0-9]')
+
+
+def normalize_phone(phone):
+    """Teléfono canónico para comparar: '8888-1122' y '+506 8888 1122' -> '+50688881122'"""
+    if not phone:
+        return None
+    digitos = NO_DIGITOS_RE.sub('', phone)
+    if len(digitos) == 8:
+        digitos = '506' + digitos
+    return '+' + digitos
+
+
+def normalize_email(email):
+    """Email canónico para comparar: sin espacios y en minúsculas"""
+    if not email or not email.strip():
+        return None
+    return email.strip().lower()
+
+
+# ===============================
+# VALIDADORES PARA PYDANTIC
+# ===============================
+
+def check_phone(value: str) -> str:
+    if not validate_phone(value):
+        raise ValueError(PHONE_ERROR)
+    return value.strip()
+
+
+def check_optional_phone(value):
+    if not value:
+        return None
+    return check_phone(value)
+
+
+def check_email(value: str) -> str:
+    if not validate_email(value):
+        raise ValueError(EMAIL_ERROR)
+    return value.strip()
+
+
+def check_optional_email(value):
+    if not value:
+        return None
+    return check_email(value)
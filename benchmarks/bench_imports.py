@@ -0,0 +1,63 @@
+"""
+Perfil de tiempo de importación del backend y del pipeline
+
+Ejecuta `python -X importtime` sobre los módulos de entrada y resume los
+módulos con mayor tiempo acumulado. Sirve para detectar dependencias pesadas
+que deberían importarse en su primer uso en lugar de al arrancar.
+
+Uso:
+    python benchmarks/bench_imports.py [--top 15]
+"""
+
+import argparse
+import subprocess
+import sys
+from pathlib import Path
+
+RAIZ = Path(__file__).resolve().parent.parent
+
+ENTRADAS = {
+    "backend (main)": (RAIZ / "backend", "import main"),
+    "pipeline (flows)": (RAIZ / "pipeline", "import flows"),
+}
+
+
+def perfil_importacion(cwd, codigo):
+    """Lista de (acumulado_us, modulo) de -X importtime, orden descendente"""
+    resultado = subprocess.run(
+        [sys.executable, "-X", "importtime", "-c", codigo],
+        cwd=cwd, capture_output=True, text=True
+    )
+    if resultado.returncode != 0:
+        raise RuntimeError(resultado.stderr.strip().splitlines()[-1])
+
+    filas = []
+    for linea in resultado.stderr.splitlines():
+        if not linea.startswith("import time:") or "cumulative" in linea:
+            continue
+        _, _, resto = linea.partition(":")
+        _propio, acumulado, modulo = (parte.strip() for parte in resto.split("|"))
+        filas.append((int(acumulado), modulo))
+    return sorted(filas, reverse=True)
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[1])
+    parser.add_argument("--top", type=int, default=15)
+    args = parser.parse_args()
+
+    for nombre, (cwd, codigo) in ENTRADAS.items():
+        try:
+            filas = perfil_importacion(cwd, codigo)
+        except RuntimeError as e:
+            print(f"{nombre}: no se pudo importar ({e})")
+            continue
+        # El módulo de nivel superior con más acumulado es el total
+        total = filas[0][0] if filas else 0
+        print(f"\n{nombre}: {total / 1000:.1f} ms de importación")
+        for acumulado, modulo in filas[:args.top]:
+            print(f"  {acumulado / 1000:8.1f} ms  {modulo}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,173 @@
+"""
+Benchmark de índices: planes de EXPLAIN y latencia con 1M de filas
+
+Crea una base de pruebas desechable (BENCH_DB, por defecto refugio_bench),
+aplica las migraciones hasta la 003, genera N donaciones y N solicitudes de
+voluntariado repartidas en un año y mide las consultas del catálogo
+(sql/CONSULTAS.md) antes y después de la migración 004 de índices
+compuestos. También compara la suma mensual con MONTH()/YEAR() contra el
+rango sargable que usa la API.
+
+Requiere MySQL accesible con las variables DB_* habituales y un usuario con
+permiso para crear y borrar BENCH_DB. La base se borra al empezar.
+
+Uso:
+    python benchmarks/bench_indices.py [--filas 1000000] [--repeticiones 5]
+"""
+
+import argparse
+import os
+import statistics
+import sys
+import time
+from datetime import date, timedelta
+from pathlib import Path
+
+sys.path.insert(0, str(Path(__file__).resolve().parent.parent / "backend"))
+
+import mysql.connector  # noqa: E402
+
+from migrations import Migrador  # noqa: E402
+
+BENCH_DB = os.getenv("BENCH_DB", "refugio_bench")
+
+
+def config_bench():
+    return {
+        "host": os.getenv("DB_HOST", "localhost"),
+        "port": int(os.getenv("DB_PORT", "3306")),
+        "user": os.getenv("DB_USER", "root"),
+        "password": os.getenv("DB_PASSWORD", "root"),
+        "database": BENCH_DB,
+    }
+
+
+def preparar_base(filas):
+    config = config_bench()
+    servidor = {k: v for k, v in config.items() if k != "database"}
+    conn = mysql.connector.connect(**servidor)
+    cursor = conn.cursor()
+    cursor.execute(f"DROP DATABASE IF EXISTS {BENCH_DB}")
+    cursor.execute(f"CREATE DATABASE {BENCH_DB}")
+    conn.close()
+
+    migrador = Migrador(lambda: mysql.connector.connect(**config), log=lambda *_: None)
+    migrador.aplicar(hasta="003")
+
+    conn = mysql.connector.connect(**config)
+    cursor = conn.cursor()
+    cursor.execute(f"SET SESSION cte_max_recursion_depth = {filas + 1}")
+    # Una fila cada ~31 s hacia atrás desde ahora: cubre un año completo
+    inicio = time.perf_counter()
+    cursor.execute(f"""
+        INSERT INTO donaciones (tipo_donacion, monto, nombre_donante, telefono_donante, estado, created_at, updated_at)
+        WITH RECURSIVE seq (n) AS (SELECT 0 UNION ALL SELECT n + 1 FROM seq WHERE n < {filas - 1})
+        SELECT IF(n % 4 = 0, 'especie', 'monetaria'),
+               IF(n % 4 = 0, NULL, 1000 + (n % 50) * 500),
+               CONCAT('Donante ', n), '+506 8888 0000',
+               ELT(1 + n % 3, 'pendiente', 'confirmada', 'recibida'),
+               NOW() - INTERVAL (n * 31) SECOND,
+               NOW() - INTERVAL (n * 31) SECOND
+        FROM seq
+    """)
+    cursor.execute(f"""
+        INSERT INTO solicitudes_voluntariado (nombre, telefono, email, areas, disponibilidad, estado, created_at, updated_at)
+        WITH RECURSIVE seq (n) AS (SELECT 0 UNION ALL SELECT n + 1 FROM seq WHERE n < {filas - 1})
+        SELECT CONCAT('Voluntario ', n), '+506 8888 0000', CONCAT('v', n, '@correo.cr'),
+               '["eventos"]', 'flexible',
+               ELT(1 + n % 4, 'pendiente', 'revisando', 'aprobado', 'rechazado'),
+               NOW() - INTERVAL (n * 31) SECOND,
+               NOW() - INTERVAL (n * 31) SECOND
+        FROM seq
+    """)
+    conn.commit()
+    cursor.execute("ANALYZE TABLE donaciones, solicitudes_voluntariado")
+    cursor.fetchall()
+    print(f"Datos generados: {filas:,} filas por tabla en {time.perf_counter() - inicio:.1f} s")
+    return conn, migrador
+
+
+def consultas():
+    # Mismos límites que main.limites_mes (sin importar la app)
+    inicio_mes = date.today().replace(day=1)
+    fin_mes = (inicio_mes + timedelta(days=32)).replace(day=1)
+    return [
+        ("A2 ETag donaciones", "SELECT UNIX_TIMESTAMP(MAX(updated_at)), COUNT(*) FROM donaciones", ()),
+        ("A3 voluntarios aprobados", "SELECT COUNT(*) FROM solicitudes_voluntariado WHERE estado = 'aprobado'", ()),
+        ("A4 mes con MONTH()/YEAR()",
+         "SELECT SUM(monto) FROM donaciones WHERE tipo_donacion = 'monetaria' "
+         "AND MONTH(created_at) = MONTH(CURRENT_DATE()) AND YEAR(created_at) = YEAR(CURRENT_DATE())", ()),
+        ("A4 mes con rango",
+         "SELECT SUM(monto) FROM donaciones WHERE tipo_donacion = 'monetaria' "
+         "AND created_at >= %s AND created_at < %s", (inicio_mes, fin_mes)),
+        ("P3 días modificados",
+         "SELECT DISTINCT DATE(created_at) FROM donaciones WHERE updated_at >= NOW() - INTERVAL 7 DAY", ()),
+        ("P4 rollup de un mes",
+         "SELECT tipo_donacion, estado, COUNT(*), COALESCE(SUM(monto), 0) FROM donaciones "
+         "WHERE created_at >= %s AND created_at < %s GROUP BY tipo_donacion, estado", (inicio_mes, fin_mes)),
+    ]
+
+
+def explicar(cursor, sql, params):
+    cursor.execute(f"EXPLAIN {sql}", params)
+    columnas = [c[0] for c in cursor.description]
+    planes = []
+    for fila in cursor.fetchall():
+        plan = dict(zip(columnas, fila))
+        planes.append(f"type={plan['type']} key={plan['key']} rows={plan['rows']} extra={plan['Extra']}")
+    return "; ".join(planes)
+
+
+def medir(cursor, sql, params, repeticiones):
+    tiempos = []
+    for _ in range(repeticiones):
+        inicio = time.perf_counter()
+        cursor.execute(sql, params)
+        cursor.fetchall()
+        tiempos.append((time.perf_counter() - inicio) * 1000)
+    return statistics.median(tiempos)
+
+
+def correr(conn, repeticiones):
+    cursor = conn.cursor()
+    resultados = {}
+    for nombre, sql, params in consultas():
+        plan = explicar(cursor, sql, params)
+        resultados[nombre] = (medir(cursor, sql, params, repeticiones), plan)
+    cursor.close()
+    return resultados
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[1])
+    parser.add_argument("--filas", type=int, default=1_000_000)
+    parser.add_argument("--repeticiones", type=int, default=5)
+    args = parser.parse_args()
+
+    conn, migrador = preparar_base(args.filas)
+    antes = correr(conn, args.repeticiones)
+
+    inicio = time.perf_counter()
+    migrador.aplicar(hasta="004")
+    print(f"Migración 004 (en línea) aplicada en {time.perf_counter() - inicio:.1f} s")
+    cursor = conn.cursor()
+    cursor.execute("ANALYZE TABLE donaciones, solicitudes_voluntariado")
+    cursor.fetchall()
+    cursor.close()
+    despues = correr(conn, args.repeticiones)
+    conn.close()
+
+    print(f"\n{'Consulta':<28} {'antes (ms)':>11} {'después (ms)':>13} {'mejora':>8}")
+    for nombre in antes:
+        t_antes, t_despues = antes[nombre][0], despues[nombre][0]
+        print(f"{nombre:<28} {t_antes:>11.2f} {t_despues:>13.2f} {t_antes / max(t_despues, 1e-6):>7.1f}x")
+
+    print("\nPlanes (EXPLAIN)")
+    for nombre in antes:
+        print(f"- {nombre}")
+        print(f"    antes:   {antes[nombre][1]}")
+        print(f"    después: {despues[nombre][1]}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,104 @@
+"""
+Benchmark de serialización de listados (10k filas)
+
+Compara el camino anterior de FastAPI (validar cada fila contra el
+response_model, jsonable_encoder y json estándar) con FastJSONResponse
+(orjson directo sobre las filas de la BD), y json.loads por fila contra
+la incrustación de columnas JSON con raw_json_column.
+
+Uso:
+    python benchmarks/bench_serialization.py [--filas 10000]
+"""
+
+import argparse
+import json
+import sys
+import time
+from datetime import datetime, timedelta
+from decimal import Decimal
+from pathlib import Path
+from typing import List
+
+sys.path.insert(0, str(Path(__file__).resolve().parent.parent / "backend"))
+
+from fastapi.encoders import jsonable_encoder  # noqa: E402
+from pydantic import TypeAdapter  # noqa: E402
+
+from models import MascotaResponse, DonacionResponse  # noqa: E402
+from responses import FastJSONResponse, raw_json_column  # noqa: E402
+
+
+def filas_mascotas(n):
+    base = datetime(2025, 1, 1)
+    return [{
+        "id": i, "nombre": f"Mascota {i}", "especie": "perro" if i % 2 else "gato",
+        "edad": i % 15, "descripcion": "Perro muy amigable y juguetón. " * 4,
+        "imagen_url": f"/uploads/{i}.jpg", "tamano": "mediano", "genero": "macho",
+        "contacto_nombre": "Equipo del Refugio", "contacto_telefono": "+506 2244 5566",
+        "estado": "disponible", "created_at": base + timedelta(minutes=i),
+        "updated_at": base + timedelta(minutes=i),
+    } for i in range(n)]
+
+
+def filas_donaciones(n):
+    base = datetime(2025, 1, 1)
+    return [{
+        "id": i, "tipo_donacion": "monetaria", "monto": Decimal("20000.00"),
+        "descripcion_especie": None, "nombre_donante": f"Donante {i}",
+        "telefono_donante": "+506 9000 1234", "email_donante": "donante@correo.cr",
+        "estado": "confirmada", "fecha_recepcion": None, "notas_admin": None,
+        "created_at": base + timedelta(minutes=i), "updated_at": base + timedelta(minutes=i),
+    } for i in range(n)]
+
+
+def filas_voluntariado(n):
+    return [{"id": i, "nombre": f"Voluntario {i}", "areas": '["cuidado_directo", "limpieza", "eventos"]'}
+            for i in range(n)]
+
+
+def cronometrar(funcion, repeticiones=5):
+    mejores = []
+    for _ in range(repeticiones):
+        inicio = time.perf_counter()
+        funcion()
+        mejores.append(time.perf_counter() - inicio)
+    return min(mejores) * 1000
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[1])
+    parser.add_argument("--filas", type=int, default=10000)
+    args = parser.parse_args()
+
+    for nombre, modelo, generar in [("mascotas", MascotaResponse, filas_mascotas),
+                                    ("donaciones", DonacionResponse, filas_donaciones)]:
+        filas = generar(args.filas)
+        adaptador = TypeAdapter(List[modelo])
+
+        def anterior():
+            validadas = adaptador.validate_python(filas)
+            json.dumps(jsonable_encoder(validadas)).encode("utf-8")
+
+        def rapido():
+            FastJSONResponse(filas)
+
+        print(f"{nombre} ({args.filas} filas):")
+        print(f"  response_model + json   {cronometrar(anterior):8.1f} ms")
+        print(f"  FastJSONResponse        {cronometrar(rapido):8.1f} ms")
+
+    def voluntariado_anterior():
+        filas = filas_voluntariado(args.filas)
+        for fila in filas:
+            fila["areas"] = json.loads(fila["areas"])
+        json.dumps(filas)
+
+    def voluntariado_rapido():
+        FastJSONResponse(raw_json_column(filas_voluntariado(args.filas), "areas"))
+
+    print(f"solicitudes_voluntariado ({args.filas} filas, incluye generar filas):")
+    print(f"  json.loads por fila     {cronometrar(voluntariado_anterior):8.1f} ms")
+    print(f"  raw_json_column         {cronometrar(voluntariado_rapido):8.1f} ms")
+
+
+if __name__ == "__main__":
+    main()
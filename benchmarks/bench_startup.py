@@ -0,0 +1,74 @@
+"""
+Benchmark de arranque: tiempo hasta la primera respuesta del backend
+
+Lanza el servidor como subproceso y mide cuánto tarda /health en responder
+200. Compara el modo desarrollo (uvicorn, un proceso) con el de producción
+(gunicorn + workers de uvicorn). Requiere MySQL accesible con las variables
+DB_* habituales, porque cada worker precalienta su pool al arrancar.
+
+Uso:
+    python benchmarks/bench_startup.py [--repeticiones 5] [--modo uvicorn|gunicorn|ambos]
+"""
+
+import argparse
+import os
+import signal
+import socket
+import statistics
+import subprocess
+import sys
+import time
+import urllib.request
+from pathlib import Path
+
+BACKEND_DIR = Path(__file__).resolve().parent.parent / "backend"
+
+COMANDOS = {
+    "uvicorn": [sys.executable, "-m", "uvicorn", "main:app", "--host", "127.0.0.1", "--port", "{port}"],
+    "gunicorn": [sys.executable, "-m", "gunicorn", "-c", "gunicorn.conf.py", "main:app"],
+}
+
+
+def puerto_libre():
+    with socket.socket() as s:
+        s.bind(("127.0.0.1", 0))
+        return s.getsockname()[1]
+
+
+def medir(modo, timeout=60.0):
+    """Segundos desde el lanzamiento hasta el primer 200 de /health"""
+    port = puerto_libre()
+    cmd = [parte.format(port=port) for parte in COMANDOS[modo]]
+    env = dict(os.environ, HOST="127.0.0.1", PORT=str(port), ACCESS_LOG="")
+    inicio = time.perf_counter()
+    proceso = subprocess.Popen(cmd, cwd=BACKEND_DIR, env=env,
+                               stdout=subprocess.DEVNULL, stderr=subprocess.DEVNULL)
+    try:
+        while time.perf_counter() - inicio < timeout:
+            try:
+                with urllib.request.urlopen(f"http://127.0.0.1:{port}/health", timeout=1) as resp:
+                    if resp.status == 200:
+                        return time.perf_counter() - inicio
+            except OSError:
+                time.sleep(0.02)
+        raise TimeoutError(f"{modo} no respondió en {timeout}s")
+    finally:
+        proceso.send_signal(signal.SIGTERM)
+        proceso.wait(timeout=30)
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[1])
+    parser.add_argument("--repeticiones", type=int, default=5)
+    parser.add_argument("--modo", choices=["uvicorn", "gunicorn", "ambos"], default="ambos")
+    args = parser.parse_args()
+
+    modos = ["uvicorn", "gunicorn"] if args.modo == "ambos" else [args.modo]
+    for modo in modos:
+        tiempos = [medir(modo) for _ in range(args.repeticiones)]
+        print(f"{modo:<9} primera respuesta: mediana {statistics.median(tiempos) * 1000:7.1f} ms  "
+              f"min {min(tiempos) * 1000:7.1f} ms  max {max(tiempos) * 1000:7.1f} ms")
+
+
+if __name__ == "__main__":
+    main()
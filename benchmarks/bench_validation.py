@@ -0,0 +1,73 @@
+"""
+Microbenchmarks de la capa de validación (backend/validation.py)
+
+Compara, por llamada:
+  - sanitize_input con atajo para texto plano vs bleach.clean siempre
+  - patrones precompilados vs re.match con el patrón como string
+
+Uso:
+    python benchmarks/bench_validation.py [--numero 20000]
+"""
+
+import argparse
+import re
+import sys
+import timeit
+from pathlib import Path
+
+sys.path.insert(0, str(Path(__file__).resolve().parent.parent / "backend"))
+
+import validation  # noqa: E402
+
+TEXTO_PLANO = "Perro muy amigable y juguetón. Le encanta correr en el parque y jugar con ninos."
+TEXTO_HTML = "Perro <b>muy</b> amigable <script>alert(1)</script> & juguetón"
+TELEFONO = "+506 8888 1122"
+EMAIL = "laura.campos@correo.cr"
+
+
+def bleach_siempre(text):
+    import bleach
+    return bleach.clean(text, tags=[], attributes={}, strip=True)
+
+
+def telefono_sin_compilar(phone):
+    return bool(re.match(r'^(\+506\s?)?[0-9]{4}[-\s]?[0-9]{4}$', phone.strip()))
+
+
+def email_sin_compilar(email):
+    return bool(re.match(r'^[^@]+@[^@]+\.[^@]+$', email.strip()))
+
+
+def medir(nombre, funcion, argumento, numero):
+    segundos = min(timeit.repeat(lambda: funcion(argumento), number=numero, repeat=5))
+    print(f"  {nombre:<38} {segundos / numero * 1e6:8.2f} µs/llamada")
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[1])
+    parser.add_argument("--numero", type=int, default=20000)
+    args = parser.parse_args()
+    n = args.numero
+
+    print("Sanitización (texto plano):")
+    medir("validation.sanitize_input", validation.sanitize_input, TEXTO_PLANO, n)
+    try:
+        medir("bleach.clean", bleach_siempre, TEXTO_PLANO, n // 10)
+        print("Sanitización (texto con HTML):")
+        medir("validation.sanitize_input", validation.sanitize_input, TEXTO_HTML, n // 10)
+        medir("bleach.clean", bleach_siempre, TEXTO_HTML, n // 10)
+        assert validation.sanitize_input(TEXTO_PLANO) == bleach_siempre(TEXTO_PLANO)
+    except ImportError:
+        print("  (bleach no instalado: se omite la comparación)")
+
+    print("Teléfono:")
+    medir("validation.validate_phone", validation.validate_phone, TELEFONO, n)
+    medir("re.match con string", telefono_sin_compilar, TELEFONO, n)
+
+    print("Email:")
+    medir("validation.validate_email", validation.validate_email, EMAIL, n)
+    medir("re.match con string", email_sin_compilar, EMAIL, n)
+
+
+if __name__ == "__main__":
+    main()
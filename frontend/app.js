@@ -2,6 +2,21 @@ const API_BASE = 'http://localhost:8001';
 let editingMascotaId = null;
 let selectedImage = null;
 
+// Lectura de lo propio: tras una escritura la API devuelve X-Refugio-RW y,
+// mientras no venza, las lecturas lo reenvían para ir a la base primaria
+// (las réplicas pueden no tener aún el cambio)
+let refugioRW = null;
+function recordarEscritura(response) {
+    const valor = response.headers.get('X-Refugio-RW');
+    if (valor) refugioRW = valor;
+}
+function cabecerasLectura() {
+    if (refugioRW && Number(refugioRW) * 1000 > Date.now()) {
+        return { 'X-Refugio-RW': refugioRW };
+    }
+    return {};
+}
+
 // Elementos del DOM
 const mascotaForm = document.getElementById('mascotaForm');
 const submitBtn = document.getElementById('submitBtn');
@@ -157,6 +172,7 @@ mascotaForm.addEventListener('submit', async (e) => {
             headers: { 'Content-Type': 'application/json' },
             body: JSON.stringify(mascotaData)
         });
+        recordarEscritura(response);
 
         console.log('🔥 DEBUG: Respuesta de mascota:', response.status);
 
@@ -178,6 +194,12 @@ mascotaForm.addEventListener('submit', async (e) => {
             '¡Información de la mascota actualizada!' :
             '¡Mascota registrada exitosamente! Pronto aparecerá disponible para adopción.'
         );
+        // La API advierte si la foto se parece mucho a la de otra mascota ya registrada
+        const parecidas = result.posibles_duplicados || [];
+        if (parecidas.length > 0) {
+            const nombres = parecidas.map(m => `${m.nombre} (#${m.id})`).join(', ');
+            setTimeout(() => showToast(`La foto se parece a la de: ${nombres}. Revisa que no sea la misma mascota.`, 'info'), 3200);
+        }
         resetForm();
         if (typeof cargarMascotasRecientes === 'function') {
             cargarMascotasRecientes();
@@ -203,33 +225,63 @@ function resetForm() {
     cancelBtn.classList.add('hidden');
 }
 // Cargar mascotas recientes
+let mascotasRecientes = [];
 async function cargarMascotasRecientes() {
     try {
-        const response = await fetch(`${API_BASE}/mascotas`);
+        const response = await fetch(`${API_BASE}/mascotas`, { headers: cabecerasLectura() });
         if (!response.ok) throw new Error('Error al cargar mascotas');
         const mascotas = await response.json();
-        const recientes = mascotas.slice(0, 3);
-        const container = document.getElementById('mascotasRecientes');
-        if (recientes.length === 0) {
-            container.innerHTML = '<p class="text-gray-500 text-center">No hay mascotas registradas aún</p>';
-            return;
-        }
-        container.innerHTML = recientes.map(mascota => `
-            <div class="flex items-center space-x-3 p-3 bg-gray-50 rounded-lg">
-                <span class="text-2xl">${mascota.especie === 'perro' ? '🐕' : mascota.especie === 'gato' ? '🐱' : '🐾'}</span>
-                <div>
-                    <p class="font-medium text-gray-800">${mascota.nombre}</p>
-                    <p class="text-sm text-gray-600">${mascota.especie}</p>
-                </div>
-            </div>
-        `).join('');
+        mascotasRecientes = mascotas.slice(0, 3);
+        mostrarMascotasRecientes();
     } catch (error) {
         console.error('Error:', error);
         document.getElementById('mascotasRecientes').innerHTML =
             '<p class="text-red-500 text-center text-sm">Error al cargar datos</p>';
     }
 }
+function mostrarMascotasRecientes() {
+    const container = document.getElementById('mascotasRecientes');
+    if (mascotasRecientes.length === 0) {
+        container.innerHTML = '<p class="text-gray-500 text-center">No hay mascotas registradas aún</p>';
+        return;
+    }
+    container.innerHTML = mascotasRecientes.map(mascota => `
+        <div class="flex items-center space-x-3 p-3 bg-gray-50 rounded-lg">
+            <span class="text-2xl">${mascota.especie === 'perro' ? '🐕' : mascota.especie === 'gato' ? '🐱' : '🐾'}</span>
+            <div>
+                <p class="font-medium text-gray-800">${mascota.nombre}</p>
+                <p class="text-sm text-gray-600">${mascota.especie}</p>
+            </div>
+        </div>
+    `).join('');
+}
+// Cambios en vivo (GET /eventos): se aplican sobre las recientes sin recargar
+function escucharCambios() {
+    if (!window.EventSource) return;
+    const fuente = new EventSource(`${API_BASE}/eventos?tipos=mascota`);
+    fuente.onmessage = (mensaje) => {
+        const evento = JSON.parse(mensaje.data);
+        if (evento.tipo === 'resync') {
+            cargarMascotasRecientes();
+            return;
+        }
+        const datos = evento.datos;
+        const indice = mascotasRecientes.findIndex(m => m.id === datos.id);
+        if (evento.tipo === 'mascota.creada') {
+            if (indice < 0) mascotasRecientes = [datos, ...mascotasRecientes].slice(0, 3);
+        } else if (evento.tipo === 'mascota.actualizada') {
+            if (indice < 0) return;
+            mascotasRecientes[indice] = { ...mascotasRecientes[indice], ...datos };
+        } else if (evento.tipo === 'mascota.eliminada') {
+            // La lista queda corta: se pide de nuevo para completar las 3
+            if (indice >= 0) cargarMascotasRecientes();
+            return;
+        }
+        mostrarMascotasRecientes();
+    };
+}
 cancelBtn.addEventListener('click', resetForm);
 document.addEventListener('DOMContentLoaded', () => {
     cargarMascotasRecientes();
+    escucharCambios();
 });
@@ -0,0 +1,130 @@
+"""
+Archivo de registros cerrados
+
+Mueve a las tablas <tabla>_archivo (particionadas por año, ver
+sql/migrations/005_archivo.sql) las filas en un estado final cuya última
+modificación tiene más de ARCHIVO_DIAS días. Así las tablas calientes que
+recorren los listados y la extracción del pipeline quedan acotadas a lo
+vigente, y el historial sigue disponible con ?incluir_archivo=true.
+
+Cada lote se mueve en una transacción: las filas se bloquean en orden de id
+(FOR UPDATE), se copian al archivo y se borran de la tabla caliente. Las
+mascotas adoptadas no se archivan: solicitudes y apadrinamientos las
+referencian con claves foráneas.
+"""
+
+import os
+from datetime import datetime, timedelta
+
+# Estados finales por tabla: una fila en ellos ya no cambia
+ESTADOS_CERRADOS = {
+    "solicitudes_adopcion": ("aprobada", "rechazada"),
+    "solicitudes_voluntariado": ("rechazado",),
+    "donaciones": ("recibida",),
+    "apadrinamientos": ("cancelado",),
+}
+
+ARCHIVO_DIAS = int(os.getenv("ARCHIVO_DIAS", "365"))
+ARCHIVO_LOTE = int(os.getenv("ARCHIVO_LOTE", "1000"))
+# Mismo valor que backend/idempotencia.py
+IDEMPOTENCIA_HORAS = int(os.getenv("IDEMPOTENCIA_HORAS", "24"))
+
+
+def tabla_archivo(tabla):
+    return f"{tabla}_archivo"
+
+
+def asegurar_particion(cursor, tabla, anio):
+    """Separar de p_futuro las particiones anuales hasta el año siguiente a 'anio'"""
+    archivo = tabla_archivo(tabla)
+    cursor.execute(
+        "SELECT PARTITION_NAME FROM information_schema.PARTITIONS "
+        "WHERE TABLE_SCHEMA = DATABASE() AND TABLE_NAME = %s",
+        (archivo,)
+    )
+    anios = [int(fila[0][1:]) for fila in cursor.fetchall() if fila[0] and fila[0][1:].isdigit()]
+    ultimo = max(anios, default=anio - 1)
+    faltantes = list(range(ultimo + 1, anio + 2))
+    if not faltantes:
+        return []
+    particiones = ", ".join(
+        f"PARTITION p{a} VALUES LESS THAN (UNIX_TIMESTAMP('{a + 1}-01-01 00:00:00'))" for a in faltantes
+    )
+    # p_futuro no tiene filas mientras se creen los años con anticipación,
+    # así que reorganizarla no copia datos.
+    cursor.execute(
+        f"ALTER TABLE {archivo} REORGANIZE PARTITION p_futuro INTO "
+        f"({particiones}, PARTITION p_futuro VALUES LESS THAN MAXVALUE)"
+    )
+    return faltantes
+
+
+def archivar_tabla(conn, tabla, antes_de, lote=ARCHIVO_LOTE):
+    """Mover las filas cerradas anteriores a 'antes_de'; devuelve cuántas se movieron"""
+    estados = ESTADOS_CERRADOS[tabla]
+    archivo = tabla_archivo(tabla)
+    marcadores = ", ".join(["%s"] * len(estados))
+    movidas = 0
+    cursor = conn.cursor()
+    try:
+        while True:
+            cursor.execute(
+                f"SELECT id FROM {tabla} WHERE estado IN ({marcadores}) AND updated_at < %s "
+                f"ORDER BY id LIMIT %s FOR UPDATE",
+                (*estados, antes_de, lote)
+            )
+            ids = [fila[0] for fila in cursor.fetchall()]
+            if not ids:
+                conn.commit()
+                break
+            lista = ", ".join(["%s"] * len(ids))
+            cursor.execute(f"INSERT INTO {archivo} SELECT * FROM {tabla} WHERE id IN ({lista})", ids)
+            cursor.execute(f"DELETE FROM {tabla} WHERE id IN ({lista})", ids)
+            conn.commit()
+            movidas += len(ids)
+            if len(ids) < lote:
+                break
+        return movidas
+    except Exception:
+        conn.rollback()
+        raise
+    finally:
+        cursor.close()
+
+
+def purgar_claves_idempotencia(conn, horas=IDEMPOTENCIA_HORAS, lote=ARCHIVO_LOTE):
+    """Borrar las Idempotency-Key vencidas, por lotes; devuelve cuántas se borraron"""
+    borradas = 0
+    cursor = conn.cursor()
+    try:
+        while True:
+            cursor.execute(
+                "DELETE FROM claves_idempotencia WHERE created_at < NOW() - INTERVAL %s HOUR LIMIT %s",
+                (horas, lote)
+            )
+            conn.commit()
+            borradas += cursor.rowcount
+            if cursor.rowcount < lote:
+                return borradas
+    finally:
+        cursor.close()
+
+
+def archivar(conn, dias=ARCHIVO_DIAS, log=print):
+    """Archivar todas las tablas y purgar claves vencidas; devuelve {tabla: filas movidas o borradas}"""
+    antes_de = datetime.now() - timedelta(days=dias)
+    anio_actual = datetime.now().year
+    resultado = {}
+    for tabla in ESTADOS_CERRADOS:
+        cursor = conn.cursor()
+        try:
+            nuevas = asegurar_particion(cursor, tabla, anio_actual)
+        finally:
+            cursor.close()
+        if nuevas:
+            log(f"Particiones nuevas en {tabla_archivo(tabla)}: {', '.join(f'p{a}' for a in nuevas)}")
+        resultado[tabla] = archivar_tabla(conn, tabla, antes_de)
+        log(f"{tabla}: {resultado[tabla]} filas archivadas (cerradas antes de {antes_de:%Y-%m-%d})")
+    resultado["claves_idempotencia"] = purgar_claves_idempotencia(conn)
+    log(f"claves_idempotencia: {resultado['claves_idempotencia']} claves vencidas borradas")
+    return resultado
@@ -0,0 +1,280 @@
+"""
+Motor de reglas de calidad de datos del pipeline
+
+Las reglas se declaran por tabla en reglas_calidad.yaml (o en un .json con
+la misma estructura, ruta en CALIDAD_REGLAS) y se compilan una vez en
+funciones que reciben un DataFrame y devuelven la máscara NumPy de las filas
+que fallan. Así cada regla es una operación vectorizada sobre la columna
+completa, sin recorrer fila por fila, y todas las tablas extraídas se
+revisan en una sola pasada.
+
+Por cada tabla se obtiene:
+- los datos limpios (valores anulados y filas descartadas según la acción
+  de cada regla),
+- el puntaje de cada fila: 1 menos el peso de cada regla que falla, con
+  piso en puntaje_minimo (solo en tablas con reglas de peso),
+- estadísticas por tabla y por regla (fallos y porcentaje).
+
+PyYAML se importa solo si las reglas están en YAML, y pandas en el primer
+uso, como en flows.py:
+
+    python calidad.py validar
+    python calidad.py validar otras_reglas.json
+"""
+
+import json
+import os
+import re
+from pathlib import Path
+
+REGLAS_PATH = Path(os.getenv("CALIDAD_REGLAS", str(Path(__file__).parent / "reglas_calidad.yaml")))
+PUNTAJE_MINIMO = 0.1
+
+TIPOS = ("requerido", "rango", "patron", "valores", "referencia")
+ACCIONES = ("marcar", "anular", "descartar")
+
+
+def cargar_reglas(ruta=None):
+    """Configuración de reglas desde YAML o JSON"""
+    ruta = Path(ruta or REGLAS_PATH)
+    texto = ruta.read_text(encoding="utf-8")
+    if ruta.suffix in (".yaml", ".yml"):
+        import yaml
+        return yaml.safe_load(texto)
+    return json.loads(texto)
+
+
+# ===============================
+# COMPILACIÓN DE REGLAS
+# ===============================
+
+def _vacios(serie):
+    """Nulos, o texto vacío tras recortar espacios"""
+    import pandas as pd
+    if pd.api.types.is_numeric_dtype(serie.dtype):
+        return serie.isna().to_numpy()
+    return serie.isna().to_numpy() | serie.astype(str).str.strip().eq("").to_numpy(dtype=bool, na_value=False)
+
+
+class Regla:
+    def __init__(self, tabla, nombre, columna, tipo, accion="marcar", peso=0, cuando=None, **parametros):
+        if tipo not in TIPOS:
+            raise ValueError(f"{tabla}.{nombre}: tipo desconocido '{tipo}' (use {', '.join(TIPOS)})")
+        if accion not in ACCIONES:
+            raise ValueError(f"{tabla}.{nombre}: acción desconocida '{accion}' (use {', '.join(ACCIONES)})")
+        self.tabla = tabla
+        self.nombre = nombre
+        self.columna = columna
+        self.tipo = tipo
+        self.accion = accion
+        self.peso = float(peso)
+        self.cuando = cuando
+        self.verificar = getattr(self, f"_compilar_{tipo}")(**parametros)
+
+    def _compilar_requerido(self):
+        return _vacios
+
+    def _compilar_rango(self, min=None, max=None):
+        if min is None and max is None:
+            raise ValueError(f"{self.tabla}.{self.nombre}: un rango necesita min, max o ambos")
+
+        def verificar(serie):
+            import pandas as pd
+            numeros = pd.to_numeric(serie, errors="coerce").to_numpy(dtype=float, na_value=float("nan"))
+            # Lo que no es número cuenta como fuera de rango (NaN falla ambas comparaciones)
+            dentro = ~(numeros != numeros)
+            if min is not None:
+                dentro &= numeros >= min
+            if max is not None:
+                dentro &= numeros <= max
+            return ~dentro
+        return verificar
+
+    def _compilar_patron(self, patron):
+        try:
+            re.compile(patron)
+        except re.error as e:
+            raise ValueError(f"{self.tabla}.{self.nombre}: patrón inválido: {e}")
+
+        def verificar(serie):
+            return ~serie.astype(str).str.match(patron, na=False).to_numpy(dtype=bool)
+        return verificar
+
+    def _compilar_valores(self, valores):
+        permitidos = list(valores)
+
+        def verificar(serie):
+            return ~serie.isin(permitidos).to_numpy()
+        return verificar
+
+    def _compilar_referencia(self, tabla_ref, columna_ref="id"):
+        self.referencia = (tabla_ref, columna_ref)
+
+        def verificar(serie, data):
+            return ~serie.isin(data[tabla_ref][columna_ref]).to_numpy()
+        return verificar
+
+    def fallos(self, df, data):
+        """
+        Máscara de las filas que fallan, o None si la regla no aplica
+
+        Solo requerido revisa los vacíos; las demás reglas miran los valores
+        presentes.
+        """
+        if self.columna not in df.columns:
+            return None
+        serie = df[self.columna]
+        if self.tipo == "referencia":
+            tabla, columna_ref = self.referencia
+            otra = data.get(tabla)
+            # Sin la tabla referida (extracción fallida) todo fallaría: se omite
+            if otra is None or otra.empty or columna_ref not in otra.columns:
+                return None
+            fallo = self.verificar(serie, data)
+        else:
+            fallo = self.verificar(serie)
+        if self.tipo != "requerido":
+            fallo &= ~_vacios(serie)
+        if self.cuando:
+            columna = self.cuando["columna"]
+            if columna not in df.columns:
+                return None
+            fallo &= df[columna].isin(self.cuando["valores"]).to_numpy()
+        return fallo
+
+
+class ReglasCalidad:
+    """Reglas compiladas de todas las tablas"""
+
+    def __init__(self, config):
+        self.puntaje_minimo = float(config.get("puntaje_minimo", PUNTAJE_MINIMO))
+        self.tablas = {}
+        self.recortar = {}
+        for tabla, definicion in (config.get("tablas") or {}).items():
+            reglas = [Regla(tabla, **regla) for regla in definicion.get("reglas", [])]
+            nombres = [regla.nombre for regla in reglas]
+            repetidos = {nombre for nombre in nombres if nombres.count(nombre) > 1}
+            if repetidos:
+                raise ValueError(f"{tabla}: reglas con nombre repetido {sorted(repetidos)}")
+            self.tablas[tabla] = reglas
+            self.recortar[tabla] = list(definicion.get("recortar", []))
+
+    @classmethod
+    def desde_archivo(cls, ruta=None):
+        return cls(cargar_reglas(ruta))
+
+    # ===============================
+    # EVALUACIÓN
+    # ===============================
+
+    def evaluar_tabla(self, tabla, df, data):
+        """(df limpio, puntajes o None, estadísticas) de una tabla"""
+        import numpy as np
+        import pandas as pd
+
+        reglas = self.tablas.get(tabla, [])
+        df = df.copy()
+        for columna in self.recortar.get(tabla, []):
+            if columna in df.columns and not pd.api.types.is_numeric_dtype(df[columna].dtype):
+                df[columna] = df[columna].str.strip()
+
+        filas = len(df)
+        con_fallos = np.zeros(filas, dtype=bool)
+        descartar = np.zeros(filas, dtype=bool)
+        puntaje = np.ones(filas)
+        anulados = 0
+        stats_reglas = {}
+
+        for regla in reglas:
+            fallo = regla.fallos(df, data) if filas else np.zeros(0, dtype=bool)
+            if fallo is None:
+                stats_reglas[regla.nombre] = {"columna": regla.columna, "tipo": regla.tipo, "omitida": True}
+                continue
+            n_fallos = int(fallo.sum())
+            con_fallos |= fallo
+            if regla.peso:
+                puntaje -= regla.peso * fallo
+            if regla.accion == "anular" and n_fallos:
+                df[regla.columna] = df[regla.columna].mask(fallo)
+                anulados += n_fallos
+            elif regla.accion == "descartar":
+                descartar |= fallo
+            stats_reglas[regla.nombre] = {
+                "columna": regla.columna,
+                "tipo": regla.tipo,
+                "accion": regla.accion,
+                "fallos": n_fallos,
+                "porcentaje": round(n_fallos / filas * 100, 2) if filas else 0,
+            }
+
+        conservar = ~descartar
+        limpio = df[conservar]
+        puntajes = None
+        if any(regla.peso for regla in reglas) and "id" in df.columns:
+            puntajes = pd.DataFrame({
+                "id": limpio["id"].to_numpy(),
+                "puntaje": np.maximum(puntaje[conservar], self.puntaje_minimo).round(2),
+            })
+
+        validas = int(filas - con_fallos.sum())
+        stats = {
+            "original": filas,
+            "cleaned": len(limpio),
+            "descartadas": int(descartar.sum()),
+            "issues_fixed": anulados,
+            "filas_con_fallos": int(con_fallos.sum()),
+            "quality_score": round(validas / filas * 100, 2) if filas else 100,
+            "reglas": stats_reglas,
+        }
+        if puntajes is not None:
+            stats["puntaje_medio"] = round(float(puntajes["puntaje"].mean()), 3) if len(puntajes) else None
+        return limpio, puntajes, stats
+
+    def evaluar(self, data):
+        """
+        Revisar todas las tablas extraídas en una pasada
+
+        Devuelve (limpios, puntajes, stats): DataFrames limpios por tabla,
+        DataFrames (id, puntaje) de las tablas con pesos, y estadísticas
+        globales con el detalle por tabla en stats["tablas"].
+        """
+        limpios, puntajes, por_tabla = {}, {}, {}
+        for tabla, df in data.items():
+            limpio, puntaje, stats = self.evaluar_tabla(tabla, df, data)
+            limpios[tabla] = limpio
+            por_tabla[tabla] = stats
+            if puntaje is not None:
+                puntajes[tabla] = puntaje
+
+        original = sum(s["original"] for s in por_tabla.values())
+        validas = sum(s["original"] - s["filas_con_fallos"] for s in por_tabla.values())
+        stats = {
+            "original": original,
+            "cleaned": sum(s["cleaned"] for s in por_tabla.values()),
+            "issues_fixed": sum(s["issues_fixed"] for s in por_tabla.values()),
+            "quality_score": round(validas / original * 100, 2) if original else 100,
+            "tablas": por_tabla,
+        }
+        return limpios, puntajes, stats
+
+
+def main(argv=None):
+    import argparse
+
+    parser = argparse.ArgumentParser(description="Reglas de calidad de datos del pipeline")
+    sub = parser.add_subparsers(dest="comando", required=True)
+    validar = sub.add_parser("validar", help="Compilar las reglas y listarlas")
+    validar.add_argument("ruta", nargs="?", default=None, help=f"Archivo YAML o JSON (por defecto {REGLAS_PATH.name})")
+    args = parser.parse_args(argv)
+
+    reglas = ReglasCalidad.desde_archivo(args.ruta)
+    for tabla, lista in reglas.tablas.items():
+        print(f"📋 {tabla}: {len(lista)} reglas")
+        for regla in lista:
+            peso = f"  peso {regla.peso:g}" if regla.peso else ""
+            print(f"   - {regla.nombre:<24} {regla.tipo:<10} {regla.columna:<20} {regla.accion}{peso}")
+    print(f"✅ Reglas válidas (puntaje mínimo {reglas.puntaje_minimo:g})")
+
+
+if __name__ == "__main__":
+    main()
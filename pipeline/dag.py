@@ -0,0 +1,160 @@
+"""
+Ejecución del pipeline como un DAG de etapas
+
+Cada etapa declara sus entradas (otras etapas, o una clave de la salida de
+otra etapa: "extraer.mascotas"). Las etapas cuyas dependencias ya
+terminaron se ejecutan en paralelo en un pool de hilos.
+
+Caché por contenido (en pipeline/cache/):
+- cache="resultado": la salida se guarda con la huella de sus entradas; si
+  las entradas no cambiaron, se reutiliza sin recalcular.
+- cache="efecto": etapas con efectos (backups, escrituras en BD); si ya se
+  completaron con esas mismas entradas, se omiten.
+- cache=None: siempre se ejecutan (extracción, reportes con fecha).
+
+Si una etapa falla, sus dependientes se omiten; las que sí terminaron
+quedan en caché y no se repiten en la siguiente ejecución.
+"""
+
+import hashlib
+import pickle
+import sys
+import time
+from concurrent.futures import ThreadPoolExecutor, FIRST_COMPLETED, wait
+from pathlib import Path
+
+
+def huella(valor):
+    """Hash estable del contenido de una entrada (DataFrames incluidos)"""
+    # Si pandas no está cargado, el valor no puede ser un DataFrame
+    pd = sys.modules.get("pandas")
+    h = hashlib.sha256()
+    if pd is not None and isinstance(valor, pd.DataFrame):
+        h.update(repr(list(valor.columns)).encode())
+        h.update(repr(list(valor.dtypes.astype(str))).encode())
+        h.update(pd.util.hash_pandas_object(valor, index=True).values.tobytes())
+    elif isinstance(valor, dict):
+        for clave in sorted(valor, key=str):
+            h.update(str(clave).encode())
+            h.update(huella(valor[clave]).encode())
+    elif isinstance(valor, (list, tuple)):
+        for item in valor:
+            h.update(huella(item).encode())
+    else:
+        h.update(pickle.dumps(valor, protocol=4))
+    return h.hexdigest()
+
+
+class Etapa:
+    def __init__(self, nombre, funcion, entradas=(), cache=None, version=1):
+        self.nombre = nombre
+        self.funcion = funcion
+        self.entradas = tuple(entradas)
+        self.cache = cache
+        self.version = version
+
+    @property
+    def dependencias(self):
+        return {entrada.split(".", 1)[0] for entrada in self.entradas}
+
+
+class PipelineDAG:
+    def __init__(self, etapas, cache_dir, max_hilos=4, log=print, conservar=5):
+        self.etapas = {etapa.nombre: etapa for etapa in etapas}
+        self.cache_dir = Path(cache_dir)
+        self.cache_dir.mkdir(parents=True, exist_ok=True)
+        self.max_hilos = max_hilos
+        self.log = log
+        self.conservar = conservar
+        for etapa in etapas:
+            faltantes = etapa.dependencias - self.etapas.keys()
+            if faltantes:
+                raise ValueError(f"Etapa {etapa.nombre}: dependencias desconocidas {faltantes}")
+
+    def _valor(self, resultados, entrada):
+        etapa, _, clave = entrada.partition(".")
+        valor = resultados[etapa]
+        return valor[clave] if clave else valor
+
+    def _huella_entradas(self, etapa, huellas):
+        h = hashlib.sha256(f"{etapa.nombre}:v{etapa.version}".encode())
+        for entrada in etapa.entradas:
+            h.update(huellas[entrada].encode())
+        return h.hexdigest()[:32]
+
+    def _registrar_huellas(self, nombre, salida, huellas, necesarias):
+        """Huellas de la salida, calculadas en cuanto termina la etapa"""
+        for entrada in necesarias:
+            etapa, _, clave = entrada.partition(".")
+            if etapa == nombre and entrada not in huellas:
+                huellas[entrada] = huella(salida[clave] if clave else salida)
+
+    def _limpiar_cache(self, nombre):
+        archivos = sorted(self.cache_dir.glob(f"{nombre}-*"), key=lambda p: p.stat().st_mtime, reverse=True)
+        for viejo in archivos[self.conservar:]:
+            viejo.unlink(missing_ok=True)
+
+    def _ejecutar_etapa(self, etapa, resultados, huellas):
+        """Devuelve (salida, estado) con estado 'ok' o 'cache'"""
+        clave = self._huella_entradas(etapa, huellas) if etapa.cache else None
+        if etapa.cache == "resultado":
+            archivo = self.cache_dir / f"{etapa.nombre}-{clave}.pkl"
+            if archivo.exists():
+                with open(archivo, "rb") as f:
+                    return pickle.load(f), "cache"
+        elif etapa.cache == "efecto":
+            archivo = self.cache_dir / f"{etapa.nombre}-{clave}.ok"
+            if archivo.exists():
+                return None, "cache"
+
+        argumentos = [self._valor(resultados, entrada) for entrada in etapa.entradas]
+        salida = etapa.funcion(*argumentos)
+
+        if etapa.cache == "resultado":
+            with open(archivo, "wb") as f:
+                pickle.dump(salida, f, protocol=pickle.HIGHEST_PROTOCOL)
+            self._limpiar_cache(etapa.nombre)
+        elif etapa.cache == "efecto":
+            archivo.touch()
+            self._limpiar_cache(etapa.nombre)
+        return salida, "ok"
+
+    def run(self):
+        """Ejecutar el DAG; devuelve (resultados, métricas por etapa)"""
+        # Entradas cuya huella hace falta: las de etapas con caché
+        necesarias = {entrada for etapa in self.etapas.values() if etapa.cache for entrada in etapa.entradas}
+        resultados, huellas, metricas = {}, {}, {}
+        pendientes = dict(self.etapas)
+        en_curso = {}
+
+        with ThreadPoolExecutor(max_workers=self.max_hilos) as pool:
+            while pendientes or en_curso:
+                for nombre, etapa in list(pendientes.items()):
+                    estados = [metricas.get(dep, {}).get("estado") for dep in etapa.dependencias]
+                    if any(estado in ("error", "omitida") for estado in estados):
+                        metricas[nombre] = {"estado": "omitida", "segundos": 0.0}
+                        del pendientes[nombre]
+                        self.log(f"Etapa {nombre}: omitida (falló una dependencia)")
+                    elif all(dep in resultados for dep in etapa.dependencias):
+                        inicio = time.perf_counter()
+                        en_curso[pool.submit(self._ejecutar_etapa, etapa, resultados, huellas)] = (nombre, inicio)
+                        del pendientes[nombre]
+
+                if not en_curso:
+                    if pendientes:
+                        raise ValueError(f"Dependencias circulares entre {sorted(pendientes)}")
+                    continue
+                terminadas, _ = wait(en_curso, return_when=FIRST_COMPLETED)
+                for future in terminadas:
+                    nombre, inicio = en_curso.pop(future)
+                    segundos = round(time.perf_counter() - inicio, 3)
+                    try:
+                        salida, estado = future.result()
+                        self._registrar_huellas(nombre, salida, huellas, necesarias)
+                        resultados[nombre] = salida
+                        metricas[nombre] = {"estado": estado, "segundos": segundos}
+                        self.log(f"Etapa {nombre}: {estado} en {segundos}s")
+                    except Exception as e:
+                        metricas[nombre] = {"estado": "error", "segundos": segundos, "error": str(e)}
+                        self.log(f"Etapa {nombre}: error en {segundos}s - {e}")
+        return resultados, metricas
@@ -1,35 +1,80 @@
 """
 Pipeline completo para Refugio de Mascotas
 - Limpieza de datos de mascotas y solicitudes
-- Generación de reportes estadísticos
+- Generación de reportes estadísticos, indexados en reports/indice.db
+  (indice_reportes.py) para consultar su historial
 - Backups automáticos
 - Análisis de tendencias de adopción
+- Con varios refugios (REFUGIOS_CONFIG), un proceso por refugio y un
+  reporte consolidado entre refugios
 """
 
-import pandas as pd
-import mysql.connector
 import json
 from datetime import datetime, timedelta
 import os
+import sys
 import warnings
 from pathlib import Path
-import schedule
-import time
+
+# La configuración de refugios se lee con el mismo módulo que la API
+# (en la imagen Docker el backend está en /app: BACKEND_DIR=/app)
+BACKEND_DIR = os.getenv("BACKEND_DIR", str(Path(__file__).resolve().parent.parent / "backend"))
+if BACKEND_DIR not in sys.path:
+    sys.path.append(BACKEND_DIR)
+from config_refugios import cargar_refugios, parse_replica_hosts
+
+# pandas y mysql.connector se importan dentro de las funciones que los usan:
+# el programador (programador.py) pasa casi todo el tiempo dormido y solo los
+# procesos que ejecutan trabajos deben cargar pandas.
 
 # Silenciar warning de pandas
 warnings.filterwarnings('ignore', message='pandas only supports SQLAlchemy')
 
+def get_refugios():
+    """
+    (predeterminado, {slug: {"config", "replicas", ...}}) de los refugios
+
+    Mismo cargador y mismas validaciones que la API (cargar_refugios en
+    backend/config_refugios.py); sin REFUGIOS_CONFIG hay un único refugio con DB_*.
+    """
+    return cargar_refugios()
+
+def get_db_config(refugio=None):
+    """Configuración de MySQL de un refugio (por defecto, el predeterminado)"""
+    predeterminado, refugios = get_refugios()
+    return refugios[refugio or predeterminado]["config"]
+
+def get_replica_configs(refugio=None):
+    """Réplicas de lectura del refugio (host1,host2:3307), en orden aleatorio"""
+    import random
+    predeterminado, refugios = get_refugios()
+    opciones = refugios[refugio or predeterminado]
+    configs = []
+    for host, puerto in parse_replica_hosts(opciones["replicas"]):
+        config = {**opciones["config"], 'host': host}
+        if puerto:
+            config['port'] = puerto
+        configs.append(config)
+    random.shuffle(configs)
+    return configs
+
 class RefugioDataPipeline:
-    def __init__(self):
-        self.db_config = {
-            'host': os.getenv('DB_HOST', 'localhost'),
-            'user': os.getenv('DB_USER', 'root'),
-            'password': os.getenv('DB_PASSWORD', 'root'),
-            'database': os.getenv('DB_NAME', 'refugio_mascotas')
-        }
+    def __init__(self, refugio=None):
+        predeterminado, refugios = get_refugios()
+        self.refugio = refugio or predeterminado
+        if self.refugio not in refugios:
+            raise ValueError(f"Refugio desconocido: {self.refugio}")
+        self.db_config = refugios[self.refugio]["config"]
+        self.last_run_stats = {}
+        self.last_report = {}
         
         # ✅ CORREGIDO: Crear directorios dentro de pipeline/
         self.base_dir = Path(__file__).parent  # Directorio donde está flows.py
+        self._etiqueta = ""
+        if len(refugios) > 1:
+            # Reportes, backups, snapshots y caché del DAG separados por refugio
+            self.base_dir = self.base_dir / "refugios" / self.refugio
+            self._etiqueta = f" [{self.refugio}]"
         
         # Crear subdirectorios dentro de pipeline/
         (self.base_dir / "backups").mkdir(parents=True, exist_ok=True)
@@ -38,8 +83,21 @@ class RefugioDataPipeline:
         
         self.log_info(f"Pipeline iniciado - Directorios en: {self.base_dir}")
 
-    def get_connection(self):
-        """Obtener conexión a la base de datos"""
+    def get_connection(self, lectura=False):
+        """
+        Obtener conexión a la base de datos
+
+        Con lectura=True se usa una réplica, para que las extracciones no
+        compitan con el tráfico de la API; sin réplicas disponibles, el primario.
+        Las escrituras (rollups, calidad, archivo) siempre van al primario.
+        """
+        import mysql.connector
+        if lectura:
+            for config in get_replica_configs(self.refugio):
+                try:
+                    return mysql.connector.connect(**config)
+                except Exception as e:
+                    self.log_error(f"Réplica {config['host']} no disponible: {e}")
         try:
             return mysql.connector.connect(**self.db_config)
         except Exception as e:
@@ -49,16 +107,17 @@ class RefugioDataPipeline:
     def log_info(self, message):
         """Log de información"""
         timestamp = datetime.now().strftime("%Y-%m-%d %H:%M:%S")
-        print(f"[{timestamp}] INFO: {message}")
+        print(f"[{timestamp}] INFO{self._etiqueta}: {message}")
 
     def log_error(self, message):
         """Log de errores"""
         timestamp = datetime.now().strftime("%Y-%m-%d %H:%M:%S")
-        print(f"[{timestamp}] ERROR: {message}")
+        print(f"[{timestamp}] ERROR{self._etiqueta}: {message}")
 
     def extract_data(self):
         """Extracción de datos de todas las tablas principales"""
-        conn = self.get_connection()
+        import pandas as pd
+        conn = self.get_connection(lectura=True)
         
         data = {}
         tables = [
@@ -77,52 +136,25 @@ class RefugioDataPipeline:
         conn.close()
         return data
 
-    def clean_mascotas_data(self, df):
-        """Limpieza específica para datos de mascotas"""
-        if df.empty:
-            return df, {
-                "original": 0,
-                "cleaned": 0,
-                "issues_fixed": 0,
-                "quality_score": 100
-            }
-        
-        initial_count = len(df)
-        issues_found = 0
-        
-        # Hacer una copia para evitar warnings
-        df = df.copy()
-        
-        # Limpiar nombres
-        df['nombre'] = df['nombre'].astype(str).str.strip()
-        df = df[df['nombre'].str.len() > 0]
-        
-        # Validar edades (convertir a numeric primero)
-        df['edad'] = pd.to_numeric(df['edad'], errors='coerce')
-        invalid_ages = (df['edad'] < 0) | (df['edad'] > 25)
-        issues_found += invalid_ages.sum()
-        df.loc[invalid_ages, 'edad'] = None
-        
-        # Validar URLs de imágenes
-        df['imagen_url'] = df['imagen_url'].fillna('')
-        
-        # Validar teléfonos si existe la columna
-        if 'contacto_telefono' in df.columns:
-            phone_pattern = r'^\+?\d{4}-?\d{4}$|^\+?506\s?\d{4}\s?\d{4}$'
-            invalid_phones = ~df['contacto_telefono'].fillna('').astype(str).str.match(phone_pattern)
-            issues_found += invalid_phones.sum()
-        
-        cleaned_count = len(df)
-        
-        return df, {
-            "original": initial_count,
-            "cleaned": cleaned_count,
-            "issues_fixed": int(issues_found),
-            "quality_score": round((cleaned_count / initial_count * 100), 2) if initial_count > 0 else 100
-        }
+    def load_quality_rules(self):
+        """Reglas de calidad declaradas en reglas_calidad.yaml (ver calidad.py)"""
+        from calidad import cargar_reglas
+        return cargar_reglas()
+
+    def clean_data(self, data, reglas=None):
+        """
+        Limpieza y control de calidad de todas las tablas extraídas
+
+        Devuelve (limpios, puntajes, stats): las reglas se compilan en
+        máscaras vectorizadas y se evalúan sobre cada tabla en una pasada.
+        """
+        from calidad import ReglasCalidad
+        motor = ReglasCalidad(reglas) if reglas is not None else ReglasCalidad.desde_archivo()
+        return motor.evaluar(data)
 
     def analyze_adoption_trends(self, mascotas_df, solicitudes_df):
         """Análisis de tendencias de adopción"""
+        import pandas as pd
         if mascotas_df.empty or solicitudes_df.empty:
             return {
                 "popular_pets": {},
@@ -139,9 +171,9 @@ class RefugioDataPipeline:
             # Especies más populares
             species_requests = mascotas_df[mascotas_df['id'].isin(solicitudes_df['mascota_id'])].groupby('especie').size()
             
-            # Solicitudes por mes
-            solicitudes_df['created_at'] = pd.to_datetime(solicitudes_df['created_at'])
-            monthly_requests = solicitudes_df.groupby(solicitudes_df['created_at'].dt.to_period('M')).size()
+            # Solicitudes por mes (sin modificar el DataFrame compartido con otras etapas)
+            created_at = pd.to_datetime(solicitudes_df['created_at'])
+            monthly_requests = solicitudes_df.groupby(created_at.dt.to_period('M')).size()
             
             # Convertir Period a string para JSON
             monthly_trends = {str(period): int(count) for period, count in monthly_requests.items()}
@@ -166,8 +198,9 @@ class RefugioDataPipeline:
                 "approval_rate": 0
             }
 
-    def generate_daily_report(self, data, analytics):
+    def generate_daily_report(self, data, analytics, calidad=None):
         """Generar reporte diario"""
+        import pandas as pd
         timestamp = datetime.now().strftime("%Y%m%d_%H%M%S")
         report_path = self.base_dir / "reports" / f"daily_report_{timestamp}.json"  # ✅ CORREGIDO
         
@@ -187,8 +220,11 @@ class RefugioDataPipeline:
             
             donaciones_mes = 0
             if not data['donaciones'].empty and 'created_at' in data['donaciones'].columns and 'monto' in data['donaciones'].columns:
+                # Mismo criterio que /estadisticas-colaboracion: mes y año actuales
+                created_at = pd.to_datetime(data['donaciones']['created_at'])
+                ahora = datetime.now()
                 current_month_donations = data['donaciones'][
-                    pd.to_datetime(data['donaciones']['created_at']).dt.month == datetime.now().month
+                    (created_at.dt.month == ahora.month) & (created_at.dt.year == ahora.year)
                 ]
                 donaciones_mes = float(current_month_donations['monto'].fillna(0).sum())
             
@@ -202,6 +238,7 @@ class RefugioDataPipeline:
                     "donaciones_mes": donaciones_mes
                 },
                 "analytics": analytics,
+                "calidad": calidad or {},
                 "alertas": self.check_alerts(data)
             }
             
@@ -209,14 +246,33 @@ class RefugioDataPipeline:
                 json.dump(report, f, indent=2, ensure_ascii=False, default=str)
             
             self.log_info(f"Reporte diario generado: {report_path}")
+            self.index_report(report, report_path)
             return report
             
         except Exception as e:
             self.log_error(f"Error generando reporte: {e}")
             return {"fecha": datetime.now().isoformat(), "error": str(e)}
 
+    def report_index(self):
+        from indice_reportes import IndiceReportes
+        return IndiceReportes(self.base_dir / "reports" / "indice.db").crear()
+
+    def index_report(self, report, report_path):
+        """Agregar el reporte al índice; si falla, el reporte igual quedó en disco"""
+        try:
+            self.report_index().agregar_reporte(report, report_path)
+        except Exception as e:
+            self.log_error(f"Error indexando reporte: {e}")
+
+    def compact_reports(self):
+        """Retención de reportes y logs (ver indice_reportes.py)"""
+        return self.report_index().compactar(
+            self.base_dir / "reports", self.base_dir / "logs", log=self.log_info
+        )
+
     def check_alerts(self, data):
         """Verificar alertas importantes"""
+        import pandas as pd
         alerts = []
         
         try:
@@ -263,9 +319,40 @@ class RefugioDataPipeline:
                 df.to_csv(backup_file, index=False, encoding='utf-8')
                 self.log_info(f"Backup creado: {backup_file}")
 
-    def update_quality_scores(self, cleaned_mascotas):
-        """Actualizar tabla de calidad"""
-        if cleaned_mascotas.empty:
+    def save_snapshot(self, data):
+        """Guardar la extracción como snapshot columnar (ver snapshots.py)"""
+        try:
+            import pyarrow  # noqa: F401
+        except ImportError:
+            self.log_info("pyarrow no instalado: se omite el snapshot")
+            return None
+        from snapshots import SnapshotStore
+        snapshot_id = SnapshotStore(self.base_dir).guardar(data)
+        self.log_info(f"Snapshot guardado: {snapshot_id}")
+        return snapshot_id
+
+    def update_rollups(self):
+        """Actualizar incrementalmente los rollups de donaciones y adopciones"""
+        from rollups import actualizar_rollups
+        conn = self.get_connection()
+        try:
+            return actualizar_rollups(conn, log=self.log_info)
+        finally:
+            conn.close()
+
+    def archive_closed_records(self):
+        """Mover los registros cerrados antiguos a las tablas de archivo"""
+        from archivo import archivar
+        conn = self.get_connection()
+        try:
+            return archivar(conn, log=self.log_info)
+        finally:
+            conn.close()
+
+    def update_quality_scores(self, puntajes):
+        """Actualizar tabla de calidad con los puntajes calculados por las reglas"""
+        puntajes = puntajes.get('mascotas')
+        if puntajes is None or puntajes.empty:
             return
         
         conn = self.get_connection()
@@ -276,65 +363,101 @@ class RefugioDataPipeline:
             cursor.execute("DELETE FROM mascotas_cleaned")
             
             # Insertar datos limpios con scores
-            for _, row in cleaned_mascotas.iterrows():
-                score = 1.0
-                if pd.isna(row.get('edad')): score -= 0.2
-                if pd.isna(row.get('descripcion')) or str(row.get('descripcion', '')) == '': score -= 0.1
-                if pd.isna(row.get('imagen_url')) or str(row.get('imagen_url', '')) == '': score -= 0.2
-                if pd.isna(row.get('contacto_telefono')) or str(row.get('contacto_telefono', '')) == '': score -= 0.1
-                
-                cursor.execute(
-                    "INSERT INTO mascotas_cleaned (mascota_id, data_quality_score) VALUES (%s, %s)",
-                    (int(row['id']), round(max(score, 0.1), 2))
-                )
+            cursor.executemany(
+                "INSERT INTO mascotas_cleaned (mascota_id, data_quality_score) VALUES (%s, %s)",
+                list(zip(puntajes['id'].astype(int).tolist(), puntajes['puntaje'].astype(float).tolist()))
+            )
             
             conn.commit()
-            self.log_info(f"Actualizados {len(cleaned_mascotas)} registros en mascotas_cleaned")
+            self.log_info(f"Actualizados {len(puntajes)} registros en mascotas_cleaned")
             
         except Exception as e:
+            conn.rollback()
             self.log_error(f"Error actualizando calidad: {e}")
+            raise
         finally:
             cursor.close()
             conn.close()
 
+    def build_dag(self):
+        r"""
+        Etapas del pipeline y sus dependencias:
+        
+            extraer -> limpiar -> tendencias -> reporte
+                   \-> backups    limpiar -> calidad
+                   \-> snapshot   reglas -> limpiar
+            rollups (independiente, directo en SQL)
+        
+        reporte, backups, snapshot y calidad son independientes entre sí y corren en paralelo.
+        """
+        from dag import Etapa, PipelineDAG
+        
+        def limpiar(data, reglas):
+            limpios, puntajes, stats = self.clean_data(data, reglas)
+            return {**limpios, "puntajes": puntajes, "stats": stats}
+        
+        etapas = [
+            Etapa("extraer", self.extract_data),
+            # Las reglas son entrada de limpiar: editarlas invalida su caché
+            Etapa("reglas", self.load_quality_rules),
+            Etapa("limpiar", limpiar, ["extraer", "reglas"], cache="resultado", version=2),
+            Etapa("tendencias", self.analyze_adoption_trends,
+                  ["limpiar.mascotas", "extraer.solicitudes_adopcion"], cache="resultado"),
+            # El reporte depende de la fecha (alertas por antigüedad): siempre se genera
+            Etapa("reporte", self.generate_daily_report, ["extraer", "tendencias", "limpiar.stats"]),
+            Etapa("backups", self.create_backups, ["extraer"], cache="efecto"),
+            Etapa("calidad", self.update_quality_scores, ["limpiar.puntajes"], cache="efecto", version=2),
+            Etapa("snapshot", self.save_snapshot, ["extraer"], cache="efecto"),
+            # Los rollups se calculan en SQL, en paralelo con la extracción
+            Etapa("rollups", self.update_rollups),
+        ]
+        return PipelineDAG(
+            etapas, self.base_dir / "cache",
+            max_hilos=int(os.getenv("PIPELINE_HILOS", "4")),
+            log=self.log_info
+        )
+
     def run_full_pipeline(self):
         """Ejecutar pipeline completo"""
         self.log_info("🐾 Iniciando pipeline completo del refugio...")
         
         try:
-            # 1. Extraer datos
-            data = self.extract_data()
-            
-            # 2. Limpiar datos principales
-            cleaned_mascotas, quality_stats = self.clean_mascotas_data(data['mascotas'])
-            
-            # 3. Análisis de tendencias
-            analytics = self.analyze_adoption_trends(cleaned_mascotas, data['solicitudes_adopcion'])
-            
-            # 4. Generar reporte
-            report = self.generate_daily_report(data, analytics)
+            resultados, etapas = self.build_dag().run()
             
-            # 5. Crear backups
-            self.create_backups(data)
+            fallidas = [nombre for nombre, metrica in etapas.items() if metrica['estado'] in ('error', 'omitida')]
+            data = resultados.get('extraer', {})
+            quality_stats = resultados.get('limpiar', {}).get('stats', {})
+            report = resultados.get('reporte') or {}
             
-            # 6. Actualizar tabla de calidad
-            self.update_quality_scores(cleaned_mascotas)
-            
-            # 7. Log final
+            # Log final
             log_entry = {
                 "timestamp": datetime.now().isoformat(),
-                "status": "SUCCESS",
+                "status": "FAILED" if fallidas else "SUCCESS",
                 "quality_stats": quality_stats,
                 "total_records_processed": sum(len(df) for df in data.values()),
-                "alerts_generated": len(report.get('alertas', []))
+                "alerts_generated": len(report.get('alertas', [])),
+                "etapas": etapas
             }
             
+            self.last_run_stats = log_entry
+            self.last_report = report
+            
             log_file = self.base_dir / "logs" / f"pipeline_log_{datetime.now().strftime('%Y%m%d')}.json"  # ✅ CORREGIDO
             with open(log_file, 'a', encoding='utf-8') as f:
                 f.write(json.dumps(log_entry, ensure_ascii=False, default=str) + '\n')
+            try:
+                self.report_index().agregar_ejecucion(json.loads(json.dumps(log_entry, default=str)))
+            except Exception as e:
+                self.log_error(f"Error indexando ejecución: {e}")
+            
+            if fallidas:
+                self.log_error(f"Pipeline incompleto, etapas sin terminar: {', '.join(fallidas)}")
+                return False
             
             self.log_info(f"✅ Pipeline completado exitosamente")
             self.log_info(f"📊 Calidad de datos: {quality_stats.get('quality_score', 100)}%")
+            for tabla, stats_tabla in quality_stats.get('tablas', {}).items():
+                self.log_info(f"   - {tabla}: {stats_tabla['quality_score']}% filas sin fallos")
             self.log_info(f"🔍 Alertas generadas: {len(report.get('alertas', []))}")
             
             if report.get('alertas'):
@@ -350,30 +473,150 @@ class RefugioDataPipeline:
 
 # Función para ejecutar manualmente
 def run_pipeline():
+    _, refugios = get_refugios()
+    if len(refugios) > 1:
+        return run_pipeline_refugios()["ok"]
     pipeline = RefugioDataPipeline()
     return pipeline.run_full_pipeline()
 
+def run_pipeline_job(refugio=None):
+    """Trabajo del programador: devuelve un resumen serializable"""
+    pipeline = RefugioDataPipeline(refugio)
+    ok = pipeline.run_full_pipeline()
+    report = pipeline.last_report
+    return {
+        "ok": ok,
+        "refugio": pipeline.refugio,
+        "processed_records": pipeline.last_run_stats.get("total_records_processed", 0),
+        # Lo necesario para el reporte consolidado entre refugios
+        "reporte": {clave: report[clave] for clave in ("resumen_datos", "analytics", "calidad", "alertas") if clave in report},
+    }
+
+def run_archive_job(refugio=None):
+    """Trabajo del programador: archivar registros cerrados y compactar reportes"""
+    pipeline = RefugioDataPipeline(refugio)
+    try:
+        pipeline.compact_reports()
+    except Exception as e:
+        # Independiente del archivo de registros: se sigue
+        pipeline.log_error(f"Error compactando reportes: {e}")
+    try:
+        movidas = pipeline.archive_closed_records()
+    except Exception as e:
+        pipeline.log_error(f"Error archivando registros: {e}")
+        return {"ok": False, "refugio": pipeline.refugio, "processed_records": 0}
+    return {"ok": True, "refugio": pipeline.refugio, "processed_records": sum(movidas.values())}
+
+def run_pipeline_refugios(funcion="run_pipeline_job", procesos=None):
+    """
+    Un trabajo en todos los refugios, cada uno en su propio proceso
+
+    Cada refugio lee de su propia base (y sus réplicas), así los refugios
+    en distintas instancias de MySQL se procesan de verdad en paralelo.
+    """
+    import multiprocessing
+    from concurrent.futures import ProcessPoolExecutor
+    from programador import ejecutar_trabajo
+    
+    _, refugios = get_refugios()
+    procesos = procesos or int(os.getenv("PIPELINE_PROCESOS", "2"))
+    with ProcessPoolExecutor(max_workers=min(procesos, len(refugios)),
+                             mp_context=multiprocessing.get_context("spawn")) as pool:
+        futuros = {slug: pool.submit(ejecutar_trabajo, funcion, slug) for slug in refugios}
+        resultados = []
+        for slug, futuro in futuros.items():
+            try:
+                resultados.append(futuro.result())
+            except Exception as e:
+                print(f"❌ Refugio {slug}: {e}")
+                resultados.append({"ok": False, "refugio": slug, "processed_records": 0})
+    return combinar_resultados(resultados)
+
+def combinar_resultados(resultados):
+    """
+    Resumen de un trabajo ejecutado en varios refugios
+
+    Si los resultados traen reporte (run_pipeline_job) se escribe además el
+    reporte consolidado en reports/consolidado_<fecha>.json: totales y
+    conteos sumados, tasa de aprobación ponderada por solicitudes, calidad
+    ponderada por filas y mascotas populares como "<refugio>:<id>" (los ids
+    se repiten entre bases).
+    """
+    from collections import Counter
+    
+    combinado = {
+        "ok": all(r.get("ok") for r in resultados),
+        "processed_records": sum(int(r.get("processed_records", 0)) for r in resultados),
+        "refugios": {r["refugio"]: {"ok": r.get("ok"), "processed_records": r.get("processed_records", 0)}
+                     for r in resultados},
+    }
+    reportes = {r["refugio"]: r["reporte"] for r in resultados if r.get("reporte")}
+    if not reportes:
+        return combinado
+    
+    resumen, especies, meses, populares = Counter(), Counter(), Counter(), []
+    solicitudes = aprobadas = filas = filas_validas = 0
+    for slug, reporte in reportes.items():
+        resumen.update(reporte.get("resumen_datos", {}))
+        analytics = reporte.get("analytics") or {}
+        especies.update(analytics.get("species_popularity", {}))
+        meses.update(analytics.get("monthly_trends", {}))
+        populares += [(f"{slug}:{mascota_id}", total) for mascota_id, total in analytics.get("popular_pets", {}).items()]
+        total = analytics.get("total_requests", 0)
+        solicitudes += total
+        aprobadas += total * analytics.get("approval_rate", 0) / 100
+        calidad = reporte.get("calidad") or {}
+        filas += calidad.get("original", 0)
+        filas_validas += calidad.get("original", 0) * calidad.get("quality_score", 100) / 100
+    
+    consolidado = {
+        "fecha": datetime.now().isoformat(),
+        "refugios": sorted(reportes),
+        "resumen_datos": dict(resumen),
+        "analytics": {
+            "popular_pets": dict(sorted(populares, key=lambda par: -par[1])[:5]),
+            "species_popularity": dict(especies.most_common()),
+            "monthly_trends": dict(sorted(meses.items())),
+            "total_requests": solicitudes,
+            "approval_rate": round(aprobadas / solicitudes * 100, 2) if solicitudes else 0,
+        },
+        "calidad": {
+            "original": filas,
+            "quality_score": round(filas_validas / filas * 100, 2) if filas else 100,
+        },
+        "por_refugio": {slug: reporte.get("resumen_datos", {}) for slug, reporte in reportes.items()},
+        "alertas": {slug: reporte.get("alertas", []) for slug, reporte in reportes.items() if reporte.get("alertas")},
+    }
+    reports_dir = Path(__file__).parent / "reports"
+    reports_dir.mkdir(parents=True, exist_ok=True)
+    ruta = reports_dir / f"consolidado_{datetime.now().strftime('%Y%m%d_%H%M%S')}.json"
+    with open(ruta, 'w', encoding='utf-8') as f:
+        json.dump(consolidado, f, indent=2, ensure_ascii=False, default=str)
+    print(f"📊 Reporte consolidado de {len(reportes)} refugios: {ruta}")
+    combinado["reporte"] = str(ruta)
+    return combinado
+
 # Programación automática (opcional)
 def schedule_pipeline():
-    """Programar ejecución automática"""
-    schedule.every().day.at("02:00").do(run_pipeline)  # 2 AM diario
-    schedule.every().sunday.at("01:00").do(run_pipeline)  # Domingo 1 AM
+    """Programar ejecución automática (sin la API)"""
+    from programador import Programador, TRABAJOS
     
     print("🕐 Pipeline programado - presiona Ctrl+C para detener")
     print("📅 Ejecuciones:")
-    print("   - Diario: 2:00 AM")
-    print("   - Semanal: Domingos 1:00 AM")
+    for nombre, trabajo in TRABAJOS.items():
+        print(f"   - {nombre}: {trabajo['cron']}")
     
+    # Registro de trabajos en la base del predeterminado; con varios
+    # refugios cada trabajo se reparte entre todos
+    _, refugios = get_refugios()
+    programador = Programador(get_db_config(), refugios=list(refugios) if len(refugios) > 1 else None)
     try:
-        while True:
-            schedule.run_pending()
-            time.sleep(60)
+        programador.run_forever()
     except KeyboardInterrupt:
+        programador.detener()
         print("\n🛑 Pipeline detenido")
 
 if __name__ == "__main__":
-    import sys
-    
     print("🐾 REFUGIO DE MASCOTAS - PIPELINE DE DATOS")
     print("=" * 50)
     
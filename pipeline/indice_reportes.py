@@ -0,0 +1,338 @@
+"""
+Índice de los reportes y logs del pipeline
+
+generate_daily_report escribe un JSON con sangría por corrida en reports/ y
+run_full_pipeline agrega una línea por corrida al log del día. Para ver el
+historial había que abrir todos los archivos. Este índice SQLite
+(reports/indice.db, modo WAL) guarda al generar cada reporte sus métricas
+y sus alertas, y cada corrida del log, así la API responde historial y
+tendencias de alertas por rango de fechas con consultas indexadas, sin
+recorrer el directorio.
+
+Las alertas son texto ("ALERTA: 3 solicitudes pendientes por más de 7
+días"): se guardan con su nivel, su tipo (el texto con la cantidad como N)
+y la cantidad, para agrupar la misma alerta entre días.
+
+Retención (compactar(), en el trabajo nocturno de archivo):
+- Reportes con más de REPORTES_COMPACTAR_DIAS días: se conserva el último
+  de cada día, su JSON pasa comprimido (zlib) al índice y el archivo se
+  borra. Los logs diarios de esa antigüedad se comprimen con gzip.
+- Con más de REPORTES_RETENCION_DIAS días se borran del índice y del disco.
+
+    python indice_reportes.py reindexar     # reportes y logs ya existentes
+    python indice_reportes.py compactar
+    python indice_reportes.py alertas --desde 2026-01-01
+"""
+
+import gzip
+import json
+import os
+import re
+import sqlite3
+import zlib
+from contextlib import contextmanager
+from datetime import date, timedelta
+from pathlib import Path
+
+REPORTES_COMPACTAR_DIAS = int(os.getenv("REPORTES_COMPACTAR_DIAS", "7"))
+REPORTES_RETENCION_DIAS = int(os.getenv("REPORTES_RETENCION_DIAS", "365"))
+
+SCHEMA = """
+CREATE TABLE IF NOT EXISTS reportes (
+    id INTEGER PRIMARY KEY,
+    fecha TEXT NOT NULL,
+    archivo TEXT NOT NULL UNIQUE,
+    mascotas_total INTEGER,
+    mascotas_disponibles INTEGER,
+    solicitudes_pendientes INTEGER,
+    voluntarios_activos INTEGER,
+    donaciones_mes REAL,
+    solicitudes_total INTEGER,
+    tasa_aprobacion REAL,
+    calidad REAL,
+    alertas INTEGER NOT NULL DEFAULT 0,
+    contenido BLOB
+);
+CREATE INDEX IF NOT EXISTS idx_reportes_fecha ON reportes(fecha);
+CREATE TABLE IF NOT EXISTS alertas (
+    reporte_id INTEGER NOT NULL REFERENCES reportes(id) ON DELETE CASCADE,
+    fecha TEXT NOT NULL,
+    nivel TEXT NOT NULL,
+    tipo TEXT NOT NULL,
+    valor INTEGER,
+    texto TEXT NOT NULL
+);
+CREATE INDEX IF NOT EXISTS idx_alertas_fecha ON alertas(fecha, tipo);
+CREATE INDEX IF NOT EXISTS idx_alertas_reporte ON alertas(reporte_id);
+CREATE TABLE IF NOT EXISTS ejecuciones (
+    fecha TEXT PRIMARY KEY,
+    estado TEXT NOT NULL,
+    registros INTEGER,
+    alertas INTEGER,
+    calidad REAL,
+    etapas_fallidas TEXT
+);
+"""
+
+METRICAS = ("mascotas_total", "mascotas_disponibles", "solicitudes_pendientes",
+            "voluntarios_activos", "donaciones_mes", "solicitudes_total", "tasa_aprobacion", "calidad")
+
+# Expresión SQL del periodo de una fecha ISO según la granularidad
+PERIODOS = {
+    "dia": "substr(fecha, 1, 10)",
+    "semana": "strftime('%Y-W%W', fecha)",
+    "mes": "substr(fecha, 1, 7)",
+}
+
+_ALERTA_RE = re.compile(r"^\s*([^:]+):\s*(.*)$")
+_NUMERO_RE = re.compile(r"\d+")
+
+
+def clasificar_alerta(texto):
+    """(nivel, tipo, valor): 'ALERTA: 3 donaciones por confirmar' -> ('ALERTA', 'N donaciones por confirmar', 3)"""
+    coincide = _ALERTA_RE.match(texto)
+    nivel, mensaje = (coincide.group(1).strip(), coincide.group(2)) if coincide else ("INFO", texto)
+    numero = _NUMERO_RE.search(mensaje)
+    valor = int(numero.group()) if numero else None
+    return nivel, _NUMERO_RE.sub("N", mensaje, count=1), valor
+
+
+def rango(desde=None, hasta=None, dias=30):
+    """(desde, hasta exclusivo) en ISO; por defecto los últimos 'dias' días"""
+    hasta = hasta or date.today()
+    desde = desde or hasta - timedelta(days=dias - 1)
+    return desde.isoformat(), (hasta + timedelta(days=1)).isoformat()
+
+
+class IndiceReportes:
+    def __init__(self, path):
+        self.path = Path(path)
+
+    @contextmanager
+    def _sqlite(self):
+        conn = sqlite3.connect(self.path, timeout=10, isolation_level=None)
+        try:
+            conn.row_factory = sqlite3.Row
+            conn.execute("PRAGMA journal_mode=WAL")
+            conn.execute("PRAGMA foreign_keys=ON")
+            yield conn
+        finally:
+            conn.close()
+
+    def crear(self):
+        self.path.parent.mkdir(parents=True, exist_ok=True)
+        with self._sqlite() as conn:
+            conn.executescript(SCHEMA)
+        return self
+
+    # ===============================
+    # ESCRITURA (PIPELINE)
+    # ===============================
+
+    def agregar_reporte(self, reporte, archivo, conn=None):
+        """Indexar un reporte de generate_daily_report; devuelve False si ya estaba"""
+        if "error" in reporte and "resumen_datos" not in reporte:
+            return False
+        resumen = reporte.get("resumen_datos") or {}
+        analytics = reporte.get("analytics") or {}
+        calidad = reporte.get("calidad") or {}
+        valores = {
+            **{clave: resumen.get(clave) for clave in METRICAS[:5]},
+            "solicitudes_total": analytics.get("total_requests"),
+            "tasa_aprobacion": analytics.get("approval_rate"),
+            "calidad": calidad.get("quality_score"),
+        }
+        alertas = reporte.get("alertas") or []
+        fecha = reporte["fecha"]
+
+        if conn is None:
+            with self._sqlite() as conn:
+                return self.agregar_reporte(reporte, archivo, conn)
+        conn.execute("BEGIN IMMEDIATE")
+        cursor = conn.execute(
+            f"INSERT OR IGNORE INTO reportes (fecha, archivo, {', '.join(METRICAS)}, alertas) "
+            f"VALUES (?, ?, {', '.join('?' * len(METRICAS))}, ?)",
+            (fecha, Path(archivo).name, *(valores[clave] for clave in METRICAS), len(alertas))
+        )
+        if not cursor.rowcount:
+            conn.execute("COMMIT")
+            return False
+        conn.executemany(
+            "INSERT INTO alertas (reporte_id, fecha, nivel, tipo, valor, texto) VALUES (?, ?, ?, ?, ?, ?)",
+            [(cursor.lastrowid, fecha, *clasificar_alerta(texto), texto) for texto in alertas]
+        )
+        conn.execute("COMMIT")
+        return True
+
+    def agregar_ejecucion(self, entrada, conn=None):
+        """Indexar una línea del log de run_full_pipeline"""
+        etapas = entrada.get("etapas") or {}
+        fallidas = [nombre for nombre, metrica in etapas.items() if metrica.get("estado") in ("error", "omitida")]
+        fila = (
+            entrada["timestamp"], entrada.get("status", "SUCCESS"), entrada.get("total_records_processed"),
+            entrada.get("alerts_generated"), (entrada.get("quality_stats") or {}).get("quality_score"),
+            ",".join(fallidas) or None,
+        )
+        if conn is None:
+            with self._sqlite() as conn:
+                return self.agregar_ejecucion(entrada, conn)
+        conn.execute("INSERT OR REPLACE INTO ejecuciones VALUES (?, ?, ?, ?, ?, ?)", fila)
+
+    def reindexar(self, reports_dir, logs_dir=None):
+        """Indexar los reportes y logs que ya estaban en disco; devuelve (reportes, ejecuciones)"""
+        self.crear()
+        reportes = ejecuciones = 0
+        with self._sqlite() as conn:
+            for ruta in sorted(Path(reports_dir).glob("daily_report_*.json")):
+                try:
+                    reporte = json.loads(ruta.read_text(encoding="utf-8"))
+                except (OSError, ValueError) as e:
+                    print(f"⚠️ {ruta.name}: {e}")
+                    continue
+                reportes += self.agregar_reporte(reporte, ruta, conn)
+            if logs_dir:
+                for ruta in sorted(Path(logs_dir).glob("pipeline_log_*.json*")):
+                    abrir = gzip.open if ruta.suffix == ".gz" else open
+                    with abrir(ruta, "rt", encoding="utf-8") as f:
+                        for linea in f:
+                            if linea.strip():
+                                self.agregar_ejecucion(json.loads(linea), conn)
+                                ejecuciones += 1
+        return reportes, ejecuciones
+
+    def compactar(self, reports_dir, logs_dir=None, compactar_dias=REPORTES_COMPACTAR_DIAS,
+                  retencion_dias=REPORTES_RETENCION_DIAS, hoy=None, log=print):
+        """Aplicar la retención; devuelve cuántos reportes se compactaron y borraron"""
+        self.crear()
+        hoy = hoy or date.today()
+        limite_compactar = (hoy - timedelta(days=compactar_dias)).isoformat()
+        limite_retencion = (hoy - timedelta(days=retencion_dias)).isoformat()
+        reports_dir = Path(reports_dir)
+        compactados = borrados = 0
+
+        with self._sqlite() as conn:
+            # Fuera de la retención: métricas, alertas y contenido
+            viejos = conn.execute("SELECT id, archivo FROM reportes WHERE fecha < ?", (limite_retencion,)).fetchall()
+            # Antes del límite de compactación, solo el último reporte de cada día
+            repetidos = conn.execute(
+                """
+                SELECT id, archivo FROM reportes r
+                WHERE fecha < ? AND fecha >= ? AND EXISTS (
+                    SELECT 1 FROM reportes o
+                    WHERE substr(o.fecha, 1, 10) = substr(r.fecha, 1, 10) AND o.fecha > r.fecha
+                )
+                """, (limite_compactar, limite_retencion)
+            ).fetchall()
+            conn.execute("BEGIN IMMEDIATE")
+            conn.executemany("DELETE FROM reportes WHERE id = ?", [(fila["id"],) for fila in viejos + repetidos])
+            conn.execute("DELETE FROM ejecuciones WHERE fecha < ?", (limite_retencion,))
+            conn.execute("COMMIT")
+            for fila in viejos + repetidos:
+                (reports_dir / fila["archivo"]).unlink(missing_ok=True)
+            borrados = len(viejos) + len(repetidos)
+
+            # El JSON de los que quedan pasa comprimido al índice
+            for fila in conn.execute(
+                "SELECT id, archivo FROM reportes WHERE fecha < ? AND contenido IS NULL", (limite_compactar,)
+            ).fetchall():
+                ruta = reports_dir / fila["archivo"]
+                if not ruta.exists():
+                    continue
+                contenido = json.dumps(json.loads(ruta.read_text(encoding="utf-8")), ensure_ascii=False,
+                                       separators=(",", ":"))
+                conn.execute("UPDATE reportes SET contenido = ? WHERE id = ?",
+                             (zlib.compress(contenido.encode("utf-8"), 9), fila["id"]))
+                ruta.unlink()
+                compactados += 1
+            if borrados:
+                conn.execute("VACUUM")
+
+        if logs_dir:
+            for ruta in Path(logs_dir).glob("pipeline_log_*.json*"):
+                dia = ruta.name.split(".")[0].rsplit("_", 1)[-1]
+                if dia < limite_retencion.replace("-", ""):
+                    ruta.unlink()
+                elif dia < limite_compactar.replace("-", "") and ruta.suffix == ".json":
+                    with open(ruta, "rb") as origen, gzip.open(f"{ruta}.gz", "wb") as destino:
+                        destino.write(origen.read())
+                    ruta.unlink()
+        log(f"🗜️ Reportes: {compactados} compactados, {borrados} borrados")
+        return {"compactados": compactados, "borrados": borrados}
+
+    # ===============================
+    # CONSULTAS (API)
+    # ===============================
+
+    def historial(self, desde, hasta, limite=100):
+        """Métricas de los reportes en [desde, hasta), del más reciente al más antiguo"""
+        with self._sqlite() as conn:
+            filas = conn.execute(
+                f"SELECT id, fecha, {', '.join(METRICAS)}, alertas FROM reportes "
+                "WHERE fecha >= ? AND fecha < ? ORDER BY fecha DESC LIMIT ?",
+                (desde, hasta, limite)
+            ).fetchall()
+        return [dict(fila) for fila in filas]
+
+    def reporte(self, reporte_id, reports_dir):
+        """Reporte completo: del archivo si sigue en disco, si no del índice"""
+        with self._sqlite() as conn:
+            fila = conn.execute("SELECT archivo, contenido FROM reportes WHERE id = ?", (reporte_id,)).fetchone()
+        if fila is None:
+            return None
+        if fila["contenido"] is not None:
+            return json.loads(zlib.decompress(fila["contenido"]))
+        ruta = Path(reports_dir) / fila["archivo"]
+        return json.loads(ruta.read_text(encoding="utf-8")) if ruta.exists() else None
+
+    def tendencia_alertas(self, desde, hasta, granularidad="dia"):
+        """Por periodo y tipo de alerta: en cuántos reportes apareció y su cantidad máxima y media"""
+        periodo = PERIODOS[granularidad]
+        with self._sqlite() as conn:
+            filas = conn.execute(
+                f"""
+                SELECT {periodo} AS periodo, nivel, tipo, COUNT(*) AS reportes,
+                       MAX(valor) AS valor_max, ROUND(AVG(valor), 2) AS valor_medio
+                FROM alertas WHERE fecha >= ? AND fecha < ?
+                GROUP BY periodo, nivel, tipo ORDER BY periodo, nivel, tipo
+                """, (desde, hasta)
+            ).fetchall()
+        return [dict(fila) for fila in filas]
+
+    def ejecuciones(self, desde, hasta):
+        with self._sqlite() as conn:
+            filas = conn.execute(
+                "SELECT * FROM ejecuciones WHERE fecha >= ? AND fecha < ? ORDER BY fecha DESC", (desde, hasta)
+            ).fetchall()
+        return [dict(fila) for fila in filas]
+
+
+def main(argv=None):
+    import argparse
+
+    parser = argparse.ArgumentParser(description="Índice de reportes y logs del pipeline")
+    parser.add_argument("--refugio", metavar="SLUG", help="Reportes de este refugio (por defecto, el predeterminado)")
+    sub = parser.add_subparsers(dest="comando", required=True)
+    sub.add_parser("reindexar", help="Indexar los reportes y logs que ya están en disco")
+    sub.add_parser("compactar", help="Aplicar la retención a reportes, logs e índice")
+    alertas = sub.add_parser("alertas", help="Tendencia de alertas por periodo")
+    alertas.add_argument("--desde", type=date.fromisoformat)
+    alertas.add_argument("--hasta", type=date.fromisoformat)
+    alertas.add_argument("--granularidad", choices=list(PERIODOS), default="dia")
+    args = parser.parse_args(argv)
+
+    from flows import RefugioDataPipeline
+    pipeline = RefugioDataPipeline(args.refugio)
+    indice = IndiceReportes(pipeline.base_dir / "reports" / "indice.db")
+    if args.comando == "reindexar":
+        reportes, ejecuciones = indice.reindexar(pipeline.base_dir / "reports", pipeline.base_dir / "logs")
+        print(f"✅ {reportes} reportes y {ejecuciones} ejecuciones indexados")
+    elif args.comando == "compactar":
+        indice.compactar(pipeline.base_dir / "reports", pipeline.base_dir / "logs")
+    else:
+        for fila in indice.crear().tendencia_alertas(*rango(args.desde, args.hasta), args.granularidad):
+            print(f"{fila['periodo']}  {fila['nivel']:<7} {fila['tipo']:<50} "
+                  f"{fila['reportes']:>3} reportes, máx {fila['valor_max']}")
+
+
+if __name__ == "__main__":
+    main()
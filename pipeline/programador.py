@@ -0,0 +1,292 @@
+"""
+Programador de trabajos del pipeline
+
+Reemplaza el bucle de `schedule`:
+- Horarios con expresiones cron (croniter).
+- Última y próxima ejecución persistidas en MySQL (tabla pipeline_jobs), de
+  modo que cualquier worker de la API puede reportar el estado.
+- Candado GET_LOCK por función de flows.py: dos ejecuciones de la misma
+  función nunca se solapan, aunque el programador corra en varios workers o
+  máquinas. pipeline_diario y pipeline_semanal comparten run_pipeline_job
+  (y sus directorios de caché y reportes): si coinciden, uno espera al otro.
+- Un trabajo que quedó 'ejecutando' porque su proceso o máquina murió se
+  marca como error al arrancar el programador, si nadie tiene su candado.
+- Los trabajos se ejecutan en un ProcessPoolExecutor (spawn), así pandas y
+  el trabajo pesado quedan fuera de los procesos de la API.
+- Con varios refugios, cada trabajo se lanza una vez por refugio en el
+  mismo pool y al terminar todos se combinan (flows.combinar_resultados);
+  pipeline_jobs guarda una fila por trabajo, con el total de los refugios.
+
+Se usa desde la API (PIPELINE_SCHEDULER=true) o de forma independiente con
+`python flows.py --schedule`.
+"""
+
+import os
+import threading
+import time
+import traceback
+from concurrent.futures import Future, ProcessPoolExecutor
+from datetime import datetime
+import multiprocessing
+
+# Trabajos programados: nombre -> expresión cron y función de flows.py
+TRABAJOS = {
+    "pipeline_diario": {"cron": os.getenv("PIPELINE_CRON_DIARIO", "0 2 * * *"), "funcion": "run_pipeline_job"},
+    "pipeline_semanal": {"cron": os.getenv("PIPELINE_CRON_SEMANAL", "0 1 * * 0"), "funcion": "run_pipeline_job"},
+    "archivo": {"cron": os.getenv("PIPELINE_CRON_ARCHIVO", "30 3 * * *"), "funcion": "run_archive_job"},
+}
+
+
+def ejecutar_trabajo(funcion, refugio=None):
+    """Punto de entrada en el proceso hijo: importa flows y corre el trabajo"""
+    import flows
+    return getattr(flows, funcion)(refugio)
+
+
+def nombre_candado(trabajo):
+    return f"refugio_job_{trabajo['funcion']}"
+
+
+def proxima_ejecucion(cron, desde):
+    from croniter import croniter
+    return croniter(cron, desde).get_next(datetime)
+
+
+class Programador:
+    def __init__(self, db_config, trabajos=None, max_procesos=None, refugios=None):
+        self.db_config = db_config
+        self.trabajos = trabajos or TRABAJOS
+        # Slugs de los refugios; None = uno solo (el de db_config)
+        self.refugios = refugios
+        self.max_procesos = max_procesos or int(os.getenv("PIPELINE_PROCESOS", "2"))
+        self._pool = None
+        self._detener = threading.Event()
+        self._hilo = None
+
+    def _conectar(self):
+        import mysql.connector
+        return mysql.connector.connect(**self.db_config)
+
+    def _log(self, mensaje):
+        timestamp = datetime.now().strftime("%Y-%m-%d %H:%M:%S")
+        print(f"[{timestamp}] PROGRAMADOR: {mensaje}")
+
+    # ===============================
+    # ESTADO PERSISTIDO
+    # ===============================
+
+    def registrar_trabajos(self):
+        """Dar de alta los trabajos (recalcula la próxima ejecución si cambió el cron) y liberar los interrumpidos"""
+        conn = self._conectar()
+        cursor = conn.cursor(dictionary=True)
+        try:
+            ahora = datetime.now()
+            for nombre, trabajo in self.trabajos.items():
+                cursor.execute("SELECT cron, proxima_ejecucion FROM pipeline_jobs WHERE nombre = %s", (nombre,))
+                fila = cursor.fetchone()
+                if fila and fila["cron"] == trabajo["cron"] and fila["proxima_ejecucion"]:
+                    continue
+                proxima = proxima_ejecucion(trabajo["cron"], ahora)
+                cursor.execute(
+                    """
+                    INSERT INTO pipeline_jobs (nombre, cron, proxima_ejecucion)
+                    VALUES (%s, %s, %s)
+                    ON DUPLICATE KEY UPDATE cron = VALUES(cron), proxima_ejecucion = VALUES(proxima_ejecucion)
+                    """, (nombre, trabajo["cron"], proxima)
+                )
+            conn.commit()
+            self._liberar_interrumpidos(cursor, conn)
+        finally:
+            cursor.close()
+            conn.close()
+
+    def _liberar_interrumpidos(self, cursor, conn):
+        """Marcar como error los 'ejecutando' cuyo candado está libre (su proceso murió)"""
+        cursor.execute("SELECT nombre FROM pipeline_jobs WHERE estado = 'ejecutando'")
+        for fila in cursor.fetchall():
+            trabajo = self.trabajos.get(fila["nombre"])
+            if trabajo is None:
+                continue
+            candado = nombre_candado(trabajo)
+            # Tomar el candado asegura que nadie lo está ejecutando ahora mismo
+            cursor.execute("SELECT GET_LOCK(%s, 0) AS obtenido", (candado,))
+            if cursor.fetchone()["obtenido"] != 1:
+                continue
+            try:
+                cursor.execute(
+                    """
+                    UPDATE pipeline_jobs
+                    SET estado = 'error', ultimo_error = 'Ejecución interrumpida (el proceso terminó sin registrar el resultado)'
+                    WHERE nombre = %s AND estado = 'ejecutando'
+                    """, (fila["nombre"],)
+                )
+                conn.commit()
+                if cursor.rowcount:
+                    self._log(f"{fila['nombre']} había quedado 'ejecutando'; marcado como interrumpido")
+            finally:
+                cursor.execute("SELECT RELEASE_LOCK(%s)", (candado,))
+                cursor.fetchall()
+
+    def trabajos_pendientes(self):
+        conn = self._conectar()
+        cursor = conn.cursor(dictionary=True)
+        try:
+            cursor.execute("SELECT nombre, proxima_ejecucion FROM pipeline_jobs")
+            return {fila["nombre"]: fila["proxima_ejecucion"] for fila in cursor.fetchall()
+                    if fila["nombre"] in self.trabajos}
+        finally:
+            cursor.close()
+            conn.close()
+
+    # ===============================
+    # EJECUCIÓN
+    # ===============================
+
+    def _get_pool(self):
+        if self._pool is None:
+            self._pool = ProcessPoolExecutor(
+                max_workers=self.max_procesos,
+                mp_context=multiprocessing.get_context("spawn"),
+            )
+        return self._pool
+
+    def lanzar(self, nombre):
+        """Ejecutar un trabajo si nadie más lo está ejecutando; devuelve el Future o None"""
+        trabajo = self.trabajos[nombre]
+        conn = self._conectar()
+        cursor = conn.cursor(dictionary=True)
+        # Por función: dos trabajos con la misma función tampoco se solapan
+        candado = nombre_candado(trabajo)
+        cursor.execute("SELECT GET_LOCK(%s, 0) AS obtenido", (candado,))
+        if cursor.fetchone()["obtenido"] != 1:
+            cursor.close()
+            conn.close()
+            return None
+
+        ahora = datetime.now()
+        cursor.execute("SELECT proxima_ejecucion FROM pipeline_jobs WHERE nombre = %s", (nombre,))
+        fila = cursor.fetchone()
+        if fila and fila["proxima_ejecucion"] and fila["proxima_ejecucion"] > ahora:
+            # Otro proceso ya lo ejecutó en esta ventana
+            cursor.execute("SELECT RELEASE_LOCK(%s)", (candado,))
+            cursor.fetchall()
+            cursor.close()
+            conn.close()
+            return None
+
+        cursor.execute(
+            """
+            UPDATE pipeline_jobs
+            SET estado = 'ejecutando', ultima_ejecucion = %s, proxima_ejecucion = %s, ultimo_error = NULL
+            WHERE nombre = %s
+            """, (ahora, proxima_ejecucion(trabajo["cron"], ahora), nombre)
+        )
+        conn.commit()
+        self._log(f"Iniciando {nombre}")
+        inicio = time.monotonic()
+        refugios = self.refugios or [None]
+        futures, error_envio = [], None
+        for refugio in refugios:
+            try:
+                futures.append(self._get_pool().submit(ejecutar_trabajo, trabajo["funcion"], refugio))
+            except Exception:
+                # Pool cerrado (detener()) o roto: no se lanzan los refugios que faltan
+                error_envio = traceback.format_exc(limit=5)
+                break
+        if not futures:
+            try:
+                cursor.execute(
+                    "UPDATE pipeline_jobs SET estado = 'error', ultimo_error = %s WHERE nombre = %s",
+                    (error_envio, nombre)
+                )
+                conn.commit()
+                cursor.execute("SELECT RELEASE_LOCK(%s)", (candado,))
+                cursor.fetchall()
+            finally:
+                cursor.close()
+                conn.close()
+            self._log(f"{nombre} no se pudo lanzar: {error_envio.strip().splitlines()[-1]}")
+            return None
+        # Se completa cuando terminaron todos los refugios
+        agregado = Future()
+        pendientes = [len(futures)]
+        candado_local = threading.Lock()
+
+        def terminar(_):
+            with candado_local:
+                pendientes[0] -= 1
+                if pendientes[0]:
+                    return
+            duracion = round(time.monotonic() - inicio, 2)
+            resultados, errores = [], [error_envio] if error_envio else []
+            for refugio, f in zip(refugios, futures):
+                try:
+                    resultado = f.result()
+                    if isinstance(resultado, dict):
+                        resultados.append(resultado)
+                except Exception:
+                    prefijo = f"[{refugio}] " if refugio else ""
+                    errores.append(prefijo + traceback.format_exc(limit=5))
+                    resultados.append({"ok": False, "refugio": refugio, "processed_records": 0})
+            resultado = resultados[0] if resultados else {}
+            if self.refugios:
+                try:
+                    import flows
+                    resultado = flows.combinar_resultados(resultados)
+                except Exception:
+                    errores.append(traceback.format_exc(limit=5))
+                    resultado = {"ok": False, "processed_records": sum(r.get("processed_records", 0) for r in resultados)}
+            registros = int(resultado.get("processed_records", 0))
+            estado = "ok" if resultado.get("ok", True) and not errores else "error"
+            error = "\n".join(errores) or None
+            try:
+                cursor.execute(
+                    """
+                    UPDATE pipeline_jobs
+                    SET estado = %s, ultima_duracion_s = %s, registros_procesados = %s, ultimo_error = %s
+                    WHERE nombre = %s
+                    """, (estado, duracion, registros, error, nombre)
+                )
+                conn.commit()
+                cursor.execute("SELECT RELEASE_LOCK(%s)", (candado,))
+                cursor.fetchall()
+            finally:
+                cursor.close()
+                conn.close()
+            self._log(f"{nombre} terminado: {estado} en {duracion}s")
+            agregado.set_result(resultado)
+
+        for future in futures:
+            future.add_done_callback(terminar)
+        return agregado
+
+    def tick(self):
+        """Lanzar los trabajos vencidos; devuelve segundos hasta el próximo"""
+        ahora = datetime.now()
+        espera = 60.0
+        for nombre, proxima in self.trabajos_pendientes().items():
+            if proxima is None or proxima <= ahora:
+                self.lanzar(nombre)
+            else:
+                espera = min(espera, (proxima - ahora).total_seconds())
+        return max(espera, 1.0)
+
+    def run_forever(self):
+        self.registrar_trabajos()
+        while not self._detener.is_set():
+            try:
+                espera = self.tick()
+            except Exception as e:
+                self._log(f"Error en el ciclo del programador: {e}")
+                espera = 60.0
+            self._detener.wait(espera)
+
+    def iniciar_en_segundo_plano(self):
+        self._hilo = threading.Thread(target=self.run_forever, name="programador-pipeline", daemon=True)
+        self._hilo.start()
+
+    def detener(self):
+        self._detener.set()
+        if self._pool is not None:
+            # Los trabajos en curso terminan; no se aceptan nuevos
+            self._pool.shutdown(wait=False, cancel_futures=True)
@@ -0,0 +1,182 @@
+"""
+Rollups de series de tiempo para donaciones y solicitudes de adopción
+
+Mantiene agregados por día, semana (lunes) y mes en rollup_donaciones
+(por tipo_donacion y estado) y rollup_adopciones (por estado y especie).
+
+La actualización es incremental: rollup_marcas guarda hasta qué updated_at
+se procesó cada tabla. Solo se recalculan los periodos de las filas creadas
+o modificadas desde entonces, cada uno completo (borrar y reinsertar), para
+que un cambio de estado mueva el conteo al grupo correcto. Sin marca previa
+se reconstruye todo.
+
+Un borrado no mueve updated_at (y los de ON DELETE CASCADE, como las
+solicitudes de una mascota eliminada, tampoco activan triggers): quien
+borra anota los días afectados en rollup_borrados (DELETE /mascotas) y la
+siguiente corrida los recalcula y borra esas anotaciones.
+"""
+
+from datetime import timedelta
+
+GRANULARIDADES = ("dia", "semana", "mes")
+
+# Expresión SQL que trunca created_at al inicio del periodo
+TRUNCAR = {
+    "dia": "DATE({col})",
+    "semana": "DATE_SUB(DATE({col}), INTERVAL WEEKDAY({col}) DAY)",
+    "mes": "CAST(DATE_FORMAT({col}, '%Y-%m-01') AS DATE)",
+}
+
+SERIES = {
+    "donaciones": {
+        "tabla_rollup": "rollup_donaciones",
+        "from": "donaciones d",
+        "archivo": "donaciones_archivo",
+        "campos": "created_at, tipo_donacion, estado, monto",
+        "join": "",
+        "col": "d.created_at",
+        "updated": "d.updated_at",
+        "grupos": ["d.tipo_donacion", "COALESCE(d.estado, 'pendiente')"],
+        "columnas": ["tipo_donacion", "estado"],
+        "metricas": "COUNT(*), COALESCE(SUM(d.monto), 0)",
+        "columnas_metricas": ["cantidad", "monto_total"],
+    },
+    "adopciones": {
+        "tabla_rollup": "rollup_adopciones",
+        "from": "solicitudes_adopcion s JOIN mascotas m ON m.id = s.mascota_id",
+        "archivo": "solicitudes_adopcion_archivo",
+        "campos": "created_at, estado, mascota_id",
+        "join": "JOIN mascotas m ON m.id = s.mascota_id",
+        "col": "s.created_at",
+        "updated": "s.updated_at",
+        "grupos": ["COALESCE(s.estado, 'pendiente')", "m.especie"],
+        "columnas": ["estado", "especie"],
+        "metricas": "COUNT(*)",
+        "columnas_metricas": ["cantidad"],
+    },
+}
+
+
+def inicio_periodo(dia, granularidad):
+    if granularidad == "dia":
+        return dia
+    if granularidad == "semana":
+        return dia - timedelta(days=dia.weekday())
+    return dia.replace(day=1)
+
+
+def fin_periodo(inicio, granularidad):
+    if granularidad == "dia":
+        return inicio + timedelta(days=1)
+    if granularidad == "semana":
+        return inicio + timedelta(days=7)
+    return (inicio.replace(day=28) + timedelta(days=4)).replace(day=1)
+
+
+def _recalcular(cursor, serie, granularidad, periodos):
+    """Borrar y reinsertar los periodos indicados (o todos si periodos es None)"""
+    config = SERIES[serie]
+    truncar = TRUNCAR[granularidad].format(col=config["col"])
+    columnas = ", ".join(["granularidad", "periodo"] + config["columnas"] + config["columnas_metricas"])
+    grupos = ", ".join(config["grupos"])
+
+    if periodos is None:
+        cursor.execute(f"DELETE FROM {config['tabla_rollup']} WHERE granularidad = %s", (granularidad,))
+        filtro, params_rama = "", []
+    else:
+        periodos = sorted(periodos)
+        marcadores = ", ".join(["%s"] * len(periodos))
+        cursor.execute(
+            f"DELETE FROM {config['tabla_rollup']} WHERE granularidad = %s AND periodo IN ({marcadores})",
+            [granularidad] + periodos
+        )
+        # Rangos sargables sobre created_at (usan el índice en cada rama)
+        rangos = " OR ".join(["(created_at >= %s AND created_at < %s)"] * len(periodos))
+        filtro = f"WHERE {rangos}"
+        params_rama = [valor for inicio in periodos for valor in (inicio, fin_periodo(inicio, granularidad))]
+
+    # Tabla caliente y archivo (pipeline/archivo.py) como una sola fuente: las
+    # filas archivadas siguen contando al recalcular su periodo.
+    alias = config["from"].split()[1]
+    ramas = " UNION ALL ".join(
+        f"SELECT {config['campos']} FROM {tabla} {filtro}"
+        for tabla in (config["from"].split()[0], config["archivo"])
+    )
+    cursor.execute(
+        f"""
+        INSERT INTO {config['tabla_rollup']} ({columnas})
+        SELECT %s, {truncar} AS periodo, {grupos}, {config['metricas']}
+        FROM ({ramas}) {alias} {config['join']}
+        GROUP BY periodo, {grupos}
+        """, [granularidad] + params_rama * 2
+    )
+
+
+def dias_borrados(cursor, tabla_base):
+    """(id de la última anotación, días) de los borrados anotados en rollup_borrados"""
+    cursor.execute("SELECT id, dia FROM rollup_borrados WHERE tabla = %s ORDER BY id", (tabla_base,))
+    filas = cursor.fetchall()
+    return (filas[-1][0] if filas else None), {dia for _, dia in filas}
+
+
+def actualizar_serie(conn, serie, lote_periodos=500):
+    """Actualizar incrementalmente una serie; devuelve cuántos días se recalcularon"""
+    config = SERIES[serie]
+    tabla_base = config["from"].split()[0]
+    cursor = conn.cursor()
+    try:
+        cursor.execute("SELECT marca FROM rollup_marcas WHERE tabla = %s", (tabla_base,))
+        fila = cursor.fetchone()
+        marca = fila[0] if fila else None
+
+        cursor.execute(f"SELECT MAX(updated_at) FROM {tabla_base}")
+        nueva_marca = cursor.fetchone()[0]
+        ultimo_borrado, borrados = dias_borrados(cursor, tabla_base)
+        if nueva_marca is None and not borrados:
+            return 0
+
+        if marca is None:
+            dias = None
+            for granularidad in GRANULARIDADES:
+                _recalcular(cursor, serie, granularidad, None)
+        else:
+            dias = set(borrados)
+            if nueva_marca is not None:
+                cursor.execute(
+                    # >= : la fila con la marca exacta se revisa de nuevo (recalcular es idempotente)
+                    f"SELECT DISTINCT DATE({config['col']}) FROM {config['from']} WHERE {config['updated']} >= %s",
+                    (marca,)
+                )
+                dias |= {fila[0] for fila in cursor.fetchall()}
+            for granularidad in GRANULARIDADES:
+                periodos = sorted({inicio_periodo(dia, granularidad) for dia in dias})
+                for i in range(0, len(periodos), lote_periodos):
+                    _recalcular(cursor, serie, granularidad, periodos[i:i + lote_periodos])
+
+        if ultimo_borrado is not None:
+            # Hasta la última leída: las que se anoten mientras tanto quedan para la próxima
+            cursor.execute(
+                "DELETE FROM rollup_borrados WHERE tabla = %s AND id <= %s", (tabla_base, ultimo_borrado)
+            )
+        if nueva_marca is not None:
+            cursor.execute(
+                "INSERT INTO rollup_marcas (tabla, marca) VALUES (%s, %s) "
+                "ON DUPLICATE KEY UPDATE marca = VALUES(marca)",
+                (tabla_base, nueva_marca)
+            )
+        conn.commit()
+        return len(dias) if dias is not None else -1
+    except Exception:
+        conn.rollback()
+        raise
+    finally:
+        cursor.close()
+
+
+def actualizar_rollups(conn, log=print):
+    resumen = {}
+    for serie in SERIES:
+        dias = actualizar_serie(conn, serie)
+        resumen[serie] = "reconstruida" if dias == -1 else f"{dias} días recalculados"
+        log(f"Rollup {serie}: {resumen[serie]}")
+    return resumen
@@ -0,0 +1,143 @@
+"""
+Almacén local de snapshots columnares del pipeline
+
+Cada extracción se guarda como archivos Arrow IPC (Feather v2, sin
+compresión) en pipeline/snapshots/<id>/<tabla>.arrow, con un manifest.json.
+Los archivos se abren con memory_map: las columnas numéricas se cargan sin
+copiar y solo se leen del disco las páginas que el análisis toca.
+
+Así los análisis se pueden repetir sobre cualquier extracción pasada sin
+consultar MySQL:
+
+    python snapshots.py listar
+    python snapshots.py analizar latest tendencias
+    python snapshots.py analizar 20250301_020000 alertas
+"""
+
+import json
+import os
+import shutil
+from datetime import datetime
+from pathlib import Path
+
+
+class SnapshotStore:
+    def __init__(self, base_dir, conservar=None):
+        self.dir = Path(base_dir) / "snapshots"
+        self.dir.mkdir(parents=True, exist_ok=True)
+        self.conservar = conservar or int(os.getenv("SNAPSHOTS_CONSERVAR", "30"))
+
+    def guardar(self, data):
+        """Guardar un dict {tabla: DataFrame}; devuelve el id del snapshot"""
+        import pyarrow as pa
+        import pyarrow.feather as feather
+
+        snapshot_id = datetime.now().strftime("%Y%m%d_%H%M%S")
+        temporal = self.dir / f".{snapshot_id}.tmp"
+        temporal.mkdir(parents=True, exist_ok=True)
+        manifest = {"id": snapshot_id, "creado": datetime.now().isoformat(), "tablas": {}}
+        for tabla, df in data.items():
+            # Sin compresión: es lo que permite mapear los buffers directamente
+            arrow_table = pa.Table.from_pandas(df, preserve_index=False)
+            feather.write_feather(arrow_table, temporal / f"{tabla}.arrow", compression="uncompressed")
+            manifest["tablas"][tabla] = {"filas": len(df), "columnas": list(map(str, df.columns))}
+        with open(temporal / "manifest.json", "w", encoding="utf-8") as f:
+            json.dump(manifest, f, ensure_ascii=False, indent=2)
+        # Publicación atómica: un snapshot a medio escribir nunca es visible
+        temporal.rename(self.dir / snapshot_id)
+        self.purgar()
+        return snapshot_id
+
+    def listar(self):
+        manifests = []
+        for carpeta in sorted(self.dir.iterdir()):
+            archivo = carpeta / "manifest.json"
+            if carpeta.name.startswith(".") or not archivo.exists():
+                continue
+            with open(archivo, encoding="utf-8") as f:
+                manifests.append(json.load(f))
+        return manifests
+
+    def resolver(self, snapshot_id="latest"):
+        if snapshot_id == "latest":
+            disponibles = self.listar()
+            if not disponibles:
+                raise FileNotFoundError("No hay snapshots guardados")
+            snapshot_id = disponibles[-1]["id"]
+        carpeta = self.dir / snapshot_id
+        if not (carpeta / "manifest.json").exists():
+            raise FileNotFoundError(f"Snapshot no encontrado: {snapshot_id}")
+        return carpeta
+
+    def cargar_arrow(self, snapshot_id="latest", tablas=None):
+        """Tablas Arrow respaldadas por memory_map (sin copia)"""
+        import pyarrow as pa
+        carpeta = self.resolver(snapshot_id)
+        resultado = {}
+        for archivo in sorted(carpeta.glob("*.arrow")):
+            if tablas and archivo.stem not in tablas:
+                continue
+            # Sin "with": los buffers de la tabla siguen apuntando al mapa
+            fuente = pa.memory_map(str(archivo), "r")
+            resultado[archivo.stem] = pa.ipc.open_file(fuente).read_all()
+        return resultado
+
+    def cargar(self, snapshot_id="latest", tablas=None):
+        """DataFrames de pandas; las columnas numéricas sin nulos no se copian"""
+        return {
+            tabla: arrow_table.to_pandas(split_blocks=True)
+            for tabla, arrow_table in self.cargar_arrow(snapshot_id, tablas).items()
+        }
+
+    def purgar(self):
+        carpetas = [self.dir / m["id"] for m in self.listar()]
+        for vieja in carpetas[:-self.conservar]:
+            shutil.rmtree(vieja, ignore_errors=True)
+
+
+# ===============================
+# CLI: ANÁLISIS SOBRE SNAPSHOTS
+# ===============================
+
+def _analizar(pipeline, data, analisis):
+    limpios, _, stats = pipeline.clean_data(data)
+    if analisis == "limpieza":
+        return stats
+    if analisis == "tendencias":
+        return pipeline.analyze_adoption_trends(limpios["mascotas"], data["solicitudes_adopcion"])
+    if analisis == "alertas":
+        return pipeline.check_alerts(data)
+    raise ValueError(f"Análisis desconocido: {analisis}")
+
+
+ANALISIS = ["limpieza", "tendencias", "alertas"]
+
+
+def main(argv=None):
+    import argparse
+    from flows import RefugioDataPipeline
+
+    parser = argparse.ArgumentParser(description="Análisis sobre snapshots del pipeline, sin tocar la BD")
+    sub = parser.add_subparsers(dest="comando", required=True)
+    sub.add_parser("listar", help="Listar snapshots disponibles")
+    analizar = sub.add_parser("analizar", help="Ejecutar un análisis sobre un snapshot")
+    analizar.add_argument("snapshot", help="id del snapshot o 'latest'")
+    analizar.add_argument("analisis", choices=ANALISIS)
+    parser.add_argument("--refugio", metavar="SLUG", help="Snapshots de este refugio (por defecto, el predeterminado)")
+    args = parser.parse_args(argv)
+
+    pipeline = RefugioDataPipeline(args.refugio)
+    store = SnapshotStore(pipeline.base_dir)
+    if args.comando == "listar":
+        for manifest in store.listar():
+            filas = sum(t["filas"] for t in manifest["tablas"].values())
+            print(f"{manifest['id']}  {filas:>8} filas  {', '.join(manifest['tablas'])}")
+        return
+
+    data = store.cargar(args.snapshot)
+    resultado = _analizar(pipeline, data, args.analisis)
+    print(json.dumps(resultado, indent=2, ensure_ascii=False, default=str))
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,8 @@
+-- Columnas de listas como JSON nativo de MySQL
+-- Las filas existentes ya guardan JSON válido (json.dumps), así que la
+-- conversión desde TEXT no pierde datos. MySQL valida el contenido en cada
+-- escritura y lo devuelve listo para incrustarse en las respuestas.
+-- Se aplica con backend/migrations.py (python migrations.py aplicar)
+
+ALTER TABLE solicitudes_voluntariado MODIFY areas JSON NOT NULL;
+ALTER TABLE colaboradores_difusion MODIFY tipos_difusion JSON NOT NULL;
@@ -0,0 +1,14 @@
+-- Estado persistido del programador del pipeline (pipeline/programador.py)
+-- Se aplica con backend/migrations.py (python migrations.py aplicar)
+
+CREATE TABLE IF NOT EXISTS pipeline_jobs (
+    nombre VARCHAR(50) PRIMARY KEY,
+    cron VARCHAR(100) NOT NULL,
+    estado ENUM('esperando', 'ejecutando', 'ok', 'error') DEFAULT 'esperando',
+    ultima_ejecucion DATETIME DEFAULT NULL,
+    ultima_duracion_s DECIMAL(10,2) DEFAULT NULL,
+    proxima_ejecucion DATETIME DEFAULT NULL,
+    registros_procesados INT DEFAULT 0,
+    ultimo_error TEXT DEFAULT NULL,
+    updated_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP ON UPDATE CURRENT_TIMESTAMP
+);
@@ -0,0 +1,30 @@
+-- Rollups de series de tiempo (mantenidos por pipeline/rollups.py)
+-- Se aplica con backend/migrations.py (python migrations.py aplicar)
+
+CREATE TABLE IF NOT EXISTS rollup_donaciones (
+    granularidad ENUM('dia', 'semana', 'mes') NOT NULL,
+    periodo DATE NOT NULL,
+    tipo_donacion ENUM('monetaria', 'especie') NOT NULL,
+    estado ENUM('pendiente', 'confirmada', 'recibida') NOT NULL,
+    cantidad INT NOT NULL DEFAULT 0,
+    monto_total DECIMAL(14,2) NOT NULL DEFAULT 0,
+    PRIMARY KEY (granularidad, periodo, tipo_donacion, estado)
+);
+
+CREATE TABLE IF NOT EXISTS rollup_adopciones (
+    granularidad ENUM('dia', 'semana', 'mes') NOT NULL,
+    periodo DATE NOT NULL,
+    estado ENUM('pendiente', 'revisando', 'aprobada', 'rechazada') NOT NULL,
+    especie ENUM('perro', 'gato', 'otro') NOT NULL,
+    cantidad INT NOT NULL DEFAULT 0,
+    PRIMARY KEY (granularidad, periodo, estado, especie)
+);
+
+-- Hasta qué updated_at se procesó cada tabla base
+CREATE TABLE IF NOT EXISTS rollup_marcas (
+    tabla VARCHAR(50) PRIMARY KEY,
+    marca TIMESTAMP NOT NULL
+);
+
+-- Los rollups se recalculan por rango de created_at
+CREATE INDEX idx_donaciones_created_at ON donaciones(created_at);
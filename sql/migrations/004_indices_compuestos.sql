@@ -0,0 +1,48 @@
+-- Índices compuestos y de cobertura según las consultas reales (ver sql/CONSULTAS.md)
+-- Se aplica con backend/migrations.py (python migrations.py aplicar)
+--
+-- Cada ALTER solo toca índices, así que el migrador lo ejecuta en línea
+-- (ALGORITHM=INPLACE, LOCK=NONE). Los índices de una sola columna sobre
+-- estado/tipo quedan cubiertos por el prefijo de los compuestos y se
+-- eliminan para no pagar su mantenimiento en cada INSERT.
+
+-- Conteos y filtros por estado ordenados por fecha; MAX(updated_at) del ETag
+ALTER TABLE mascotas
+    DROP INDEX idx_mascotas_estado,
+    ADD INDEX idx_mascotas_estado_created (estado, created_at),
+    ADD INDEX idx_mascotas_updated_at (updated_at);
+
+-- (created_at, estado, mascota_id): rollup de adopciones sin leer la fila
+-- (updated_at, created_at): marca del rollup y días modificados, solo índice
+ALTER TABLE solicitudes_adopcion
+    DROP INDEX idx_solicitudes_estado,
+    DROP INDEX idx_solicitudes_created_at,
+    ADD INDEX idx_solicitudes_estado_created (estado, created_at),
+    ADD INDEX idx_solicitudes_created_cubre (created_at, estado, mascota_id),
+    ADD INDEX idx_solicitudes_updated_created (updated_at, created_at);
+
+ALTER TABLE solicitudes_voluntariado
+    DROP INDEX idx_voluntariado_estado,
+    ADD INDEX idx_voluntariado_estado_created (estado, created_at),
+    ADD INDEX idx_voluntariado_updated_at (updated_at);
+
+-- (tipo_donacion, created_at, monto): suma mensual de donaciones monetarias
+-- (created_at, tipo_donacion, estado, monto): rollup de donaciones por rango
+ALTER TABLE donaciones
+    DROP INDEX idx_donaciones_tipo,
+    DROP INDEX idx_donaciones_estado,
+    DROP INDEX idx_donaciones_created_at,
+    ADD INDEX idx_donaciones_tipo_created_monto (tipo_donacion, created_at, monto),
+    ADD INDEX idx_donaciones_estado_created (estado, created_at),
+    ADD INDEX idx_donaciones_created_cubre (created_at, tipo_donacion, estado, monto),
+    ADD INDEX idx_donaciones_updated_created (updated_at, created_at);
+
+ALTER TABLE apadrinamientos
+    DROP INDEX idx_apadrinamientos_estado,
+    ADD INDEX idx_apadrinamientos_estado_created (estado, created_at),
+    ADD INDEX idx_apadrinamientos_updated_at (updated_at);
+
+ALTER TABLE colaboradores_difusion
+    DROP INDEX idx_difusion_estado,
+    ADD INDEX idx_difusion_estado_created (estado, created_at),
+    ADD INDEX idx_difusion_updated_at (updated_at);
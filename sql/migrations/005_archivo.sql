@@ -0,0 +1,70 @@
+-- Tablas de archivo para registros cerrados (movidos por pipeline/archivo.py)
+-- Se aplica con backend/migrations.py (python migrations.py aplicar)
+--
+-- Mismas columnas e índices que la tabla caliente (CREATE TABLE ... LIKE, que
+-- no copia claves foráneas), particionadas por año de created_at. MySQL exige
+-- que la columna de partición forme parte de la clave primaria, de ahí
+-- (id, created_at); el id se conserva tal cual y deja de ser AUTO_INCREMENT.
+-- p_futuro recibe lo posterior al último año y archivo.py la divide cuando
+-- hace falta un año nuevo. Las columnas que se agreguen a una tabla caliente
+-- deben agregarse también a su archivo: los listados usan UNION ALL.
+
+CREATE TABLE IF NOT EXISTS solicitudes_adopcion_archivo LIKE solicitudes_adopcion;
+ALTER TABLE solicitudes_adopcion_archivo
+    MODIFY id INT NOT NULL,
+    MODIFY created_at TIMESTAMP NOT NULL DEFAULT CURRENT_TIMESTAMP,
+    DROP PRIMARY KEY,
+    ADD PRIMARY KEY (id, created_at)
+    PARTITION BY RANGE (UNIX_TIMESTAMP(created_at)) (
+        PARTITION p2023 VALUES LESS THAN (UNIX_TIMESTAMP('2024-01-01 00:00:00')),
+        PARTITION p2024 VALUES LESS THAN (UNIX_TIMESTAMP('2025-01-01 00:00:00')),
+        PARTITION p2025 VALUES LESS THAN (UNIX_TIMESTAMP('2026-01-01 00:00:00')),
+        PARTITION p2026 VALUES LESS THAN (UNIX_TIMESTAMP('2027-01-01 00:00:00')),
+        PARTITION p2027 VALUES LESS THAN (UNIX_TIMESTAMP('2028-01-01 00:00:00')),
+        PARTITION p_futuro VALUES LESS THAN MAXVALUE
+    );
+
+CREATE TABLE IF NOT EXISTS solicitudes_voluntariado_archivo LIKE solicitudes_voluntariado;
+ALTER TABLE solicitudes_voluntariado_archivo
+    MODIFY id INT NOT NULL,
+    MODIFY created_at TIMESTAMP NOT NULL DEFAULT CURRENT_TIMESTAMP,
+    DROP PRIMARY KEY,
+    ADD PRIMARY KEY (id, created_at)
+    PARTITION BY RANGE (UNIX_TIMESTAMP(created_at)) (
+        PARTITION p2023 VALUES LESS THAN (UNIX_TIMESTAMP('2024-01-01 00:00:00')),
+        PARTITION p2024 VALUES LESS THAN (UNIX_TIMESTAMP('2025-01-01 00:00:00')),
+        PARTITION p2025 VALUES LESS THAN (UNIX_TIMESTAMP('2026-01-01 00:00:00')),
+        PARTITION p2026 VALUES LESS THAN (UNIX_TIMESTAMP('2027-01-01 00:00:00')),
+        PARTITION p2027 VALUES LESS THAN (UNIX_TIMESTAMP('2028-01-01 00:00:00')),
+        PARTITION p_futuro VALUES LESS THAN MAXVALUE
+    );
+
+CREATE TABLE IF NOT EXISTS donaciones_archivo LIKE donaciones;
+ALTER TABLE donaciones_archivo
+    MODIFY id INT NOT NULL,
+    MODIFY created_at TIMESTAMP NOT NULL DEFAULT CURRENT_TIMESTAMP,
+    DROP PRIMARY KEY,
+    ADD PRIMARY KEY (id, created_at)
+    PARTITION BY RANGE (UNIX_TIMESTAMP(created_at)) (
+        PARTITION p2023 VALUES LESS THAN (UNIX_TIMESTAMP('2024-01-01 00:00:00')),
+        PARTITION p2024 VALUES LESS THAN (UNIX_TIMESTAMP('2025-01-01 00:00:00')),
+        PARTITION p2025 VALUES LESS THAN (UNIX_TIMESTAMP('2026-01-01 00:00:00')),
+        PARTITION p2026 VALUES LESS THAN (UNIX_TIMESTAMP('2027-01-01 00:00:00')),
+        PARTITION p2027 VALUES LESS THAN (UNIX_TIMESTAMP('2028-01-01 00:00:00')),
+        PARTITION p_futuro VALUES LESS THAN MAXVALUE
+    );
+
+CREATE TABLE IF NOT EXISTS apadrinamientos_archivo LIKE apadrinamientos;
+ALTER TABLE apadrinamientos_archivo
+    MODIFY id INT NOT NULL,
+    MODIFY created_at TIMESTAMP NOT NULL DEFAULT CURRENT_TIMESTAMP,
+    DROP PRIMARY KEY,
+    ADD PRIMARY KEY (id, created_at)
+    PARTITION BY RANGE (UNIX_TIMESTAMP(created_at)) (
+        PARTITION p2023 VALUES LESS THAN (UNIX_TIMESTAMP('2024-01-01 00:00:00')),
+        PARTITION p2024 VALUES LESS THAN (UNIX_TIMESTAMP('2025-01-01 00:00:00')),
+        PARTITION p2025 VALUES LESS THAN (UNIX_TIMESTAMP('2026-01-01 00:00:00')),
+        PARTITION p2026 VALUES LESS THAN (UNIX_TIMESTAMP('2027-01-01 00:00:00')),
+        PARTITION p2027 VALUES LESS THAN (UNIX_TIMESTAMP('2028-01-01 00:00:00')),
+        PARTITION p_futuro VALUES LESS THAN MAXVALUE
+    );
@@ -0,0 +1,112 @@
+-- Teléfono y email normalizados para detectar envíos duplicados, y claves de idempotencia
+-- Se aplica con backend/migrations.py (python migrations.py aplicar)
+--
+-- telefono_norm / email_norm los calcula la API al escribir
+-- (validation.normalize_phone y normalize_email): "+506 8888-1122",
+-- "8888 1122" y "88881122" quedan todos como "+50688881122", y el email en
+-- minúsculas sin espacios. Las filas existentes se completan aquí con la
+-- misma regla en SQL. Las tablas de archivo reciben las mismas columnas, en
+-- el mismo orden, porque los listados y el archivo usan SELECT *.
+
+ALTER TABLE solicitudes_adopcion
+    ADD COLUMN telefono_norm VARCHAR(16) DEFAULT NULL,
+    ADD COLUMN email_norm VARCHAR(100) DEFAULT NULL;
+ALTER TABLE solicitudes_adopcion_archivo
+    ADD COLUMN telefono_norm VARCHAR(16) DEFAULT NULL,
+    ADD COLUMN email_norm VARCHAR(100) DEFAULT NULL;
+
+ALTER TABLE solicitudes_voluntariado
+    ADD COLUMN telefono_norm VARCHAR(16) DEFAULT NULL,
+    ADD COLUMN email_norm VARCHAR(100) DEFAULT NULL;
+ALTER TABLE solicitudes_voluntariado_archivo
+    ADD COLUMN telefono_norm VARCHAR(16) DEFAULT NULL,
+    ADD COLUMN email_norm VARCHAR(100) DEFAULT NULL;
+
+ALTER TABLE donaciones
+    ADD COLUMN telefono_norm VARCHAR(16) DEFAULT NULL,
+    ADD COLUMN email_norm VARCHAR(100) DEFAULT NULL;
+ALTER TABLE donaciones_archivo
+    ADD COLUMN telefono_norm VARCHAR(16) DEFAULT NULL,
+    ADD COLUMN email_norm VARCHAR(100) DEFAULT NULL;
+
+ALTER TABLE apadrinamientos
+    ADD COLUMN telefono_norm VARCHAR(16) DEFAULT NULL,
+    ADD COLUMN email_norm VARCHAR(100) DEFAULT NULL;
+ALTER TABLE apadrinamientos_archivo
+    ADD COLUMN telefono_norm VARCHAR(16) DEFAULT NULL,
+    ADD COLUMN email_norm VARCHAR(100) DEFAULT NULL;
+
+ALTER TABLE colaboradores_difusion
+    ADD COLUMN email_norm VARCHAR(100) DEFAULT NULL;
+
+-- Completar las filas existentes: solo dígitos, con 506 delante si tiene 8
+UPDATE solicitudes_adopcion SET
+    telefono_norm = CONCAT('+', IF(CHAR_LENGTH(REGEXP_REPLACE(telefono, '[^0-9]', '')) = 8, '506', ''),
+                           REGEXP_REPLACE(telefono, '[^0-9]', '')),
+    email_norm = LOWER(TRIM(email));
+UPDATE solicitudes_adopcion_archivo SET
+    telefono_norm = CONCAT('+', IF(CHAR_LENGTH(REGEXP_REPLACE(telefono, '[^0-9]', '')) = 8, '506', ''),
+                           REGEXP_REPLACE(telefono, '[^0-9]', '')),
+    email_norm = LOWER(TRIM(email));
+UPDATE solicitudes_voluntariado SET
+    telefono_norm = CONCAT('+', IF(CHAR_LENGTH(REGEXP_REPLACE(telefono, '[^0-9]', '')) = 8, '506', ''),
+                           REGEXP_REPLACE(telefono, '[^0-9]', '')),
+    email_norm = LOWER(TRIM(email));
+UPDATE solicitudes_voluntariado_archivo SET
+    telefono_norm = CONCAT('+', IF(CHAR_LENGTH(REGEXP_REPLACE(telefono, '[^0-9]', '')) = 8, '506', ''),
+                           REGEXP_REPLACE(telefono, '[^0-9]', '')),
+    email_norm = LOWER(TRIM(email));
+UPDATE donaciones SET
+    telefono_norm = CONCAT('+', IF(CHAR_LENGTH(REGEXP_REPLACE(telefono_donante, '[^0-9]', '')) = 8, '506', ''),
+                           REGEXP_REPLACE(telefono_donante, '[^0-9]', '')),
+    email_norm = NULLIF(LOWER(TRIM(email_donante)), '');
+UPDATE donaciones_archivo SET
+    telefono_norm = CONCAT('+', IF(CHAR_LENGTH(REGEXP_REPLACE(telefono_donante, '[^0-9]', '')) = 8, '506', ''),
+                           REGEXP_REPLACE(telefono_donante, '[^0-9]', '')),
+    email_norm = NULLIF(LOWER(TRIM(email_donante)), '');
+UPDATE apadrinamientos SET
+    telefono_norm = CONCAT('+', IF(CHAR_LENGTH(REGEXP_REPLACE(telefono_padrino, '[^0-9]', '')) = 8, '506', ''),
+                           REGEXP_REPLACE(telefono_padrino, '[^0-9]', '')),
+    email_norm = LOWER(TRIM(email_padrino));
+UPDATE apadrinamientos_archivo SET
+    telefono_norm = CONCAT('+', IF(CHAR_LENGTH(REGEXP_REPLACE(telefono_padrino, '[^0-9]', '')) = 8, '506', ''),
+                           REGEXP_REPLACE(telefono_padrino, '[^0-9]', '')),
+    email_norm = LOWER(TRIM(email_padrino));
+UPDATE colaboradores_difusion SET email_norm = LOWER(TRIM(email));
+
+-- Búsqueda de duplicados (backend/duplicados.py): igualdad sobre la clave
+-- normalizada más el filtro de cada regla, resuelta con un salto de índice.
+-- Los índices sobre el email sin normalizar ya no los usa ninguna consulta.
+ALTER TABLE solicitudes_adopcion
+    DROP INDEX idx_solicitudes_email,
+    ADD INDEX idx_solicitudes_telefono_mascota (telefono_norm, mascota_id, estado),
+    ADD INDEX idx_solicitudes_email_mascota (email_norm, mascota_id, estado);
+
+ALTER TABLE solicitudes_voluntariado
+    DROP INDEX idx_voluntariado_email,
+    ADD INDEX idx_voluntariado_telefono_estado (telefono_norm, estado),
+    ADD INDEX idx_voluntariado_email_estado (email_norm, estado);
+
+ALTER TABLE donaciones
+    ADD INDEX idx_donaciones_telefono_created (telefono_norm, created_at);
+
+ALTER TABLE apadrinamientos
+    ADD INDEX idx_apadrinamientos_telefono_estado (telefono_norm, estado),
+    ADD INDEX idx_apadrinamientos_email_estado (email_norm, estado);
+
+ALTER TABLE colaboradores_difusion
+    ADD INDEX idx_difusion_email_estado (email_norm, estado);
+
+-- Idempotency-Key de los POST: la primera respuesta se guarda en la misma
+-- transacción que el registro y los reintentos con la misma clave la reciben
+-- tal cual. pipeline/archivo.py borra las claves vencidas.
+CREATE TABLE IF NOT EXISTS claves_idempotencia (
+    tipo VARCHAR(60) NOT NULL,
+    clave VARCHAR(100) NOT NULL,
+    huella CHAR(64) NOT NULL,
+    status_code SMALLINT NOT NULL,
+    respuesta JSON NOT NULL,
+    created_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP,
+    PRIMARY KEY (tipo, clave),
+    INDEX idx_idempotencia_created_at (created_at)
+);
@@ -0,0 +1,12 @@
+-- Hash perceptual (dHash de 64 bits) de cada imagen subida (backend/imagenes.py)
+-- Se aplica con backend/migrations.py (python migrations.py aplicar)
+--
+-- Se llena al subir la imagen (POST /upload-image); las imágenes anteriores
+-- se indexan con python imagenes.py indexar. Se relaciona con
+-- mascotas.imagen_url: la foto se sube antes de registrar la mascota.
+
+CREATE TABLE IF NOT EXISTS imagenes_hash (
+    imagen_url VARCHAR(500) NOT NULL PRIMARY KEY,
+    dhash BIGINT UNSIGNED NOT NULL,
+    created_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP
+);
@@ -0,0 +1,24 @@
+-- Bandeja de salida de los avisos de envíos nuevos (backend/notificaciones.py)
+-- Se aplica con backend/migrations.py (python migrations.py aplicar)
+--
+-- Cada formulario guardado agrega aquí su aviso en la misma transacción que
+-- su INSERT; el worker de notificaciones los reclama por lotes (lote,
+-- reclamado_hasta) y envía un resumen por correo.
+
+CREATE TABLE IF NOT EXISTS notificaciones (
+    id BIGINT AUTO_INCREMENT PRIMARY KEY,
+    tipo VARCHAR(40) NOT NULL,
+    registro_id INT NOT NULL,
+    detalle VARCHAR(255) NOT NULL,
+    estado ENUM('pendiente', 'enviando', 'enviada', 'fallida') NOT NULL DEFAULT 'pendiente',
+    intentos INT NOT NULL DEFAULT 0,
+    proximo_intento DATETIME NOT NULL DEFAULT CURRENT_TIMESTAMP,
+    lote CHAR(32) DEFAULT NULL,
+    reclamado_hasta DATETIME DEFAULT NULL,
+    error VARCHAR(500) DEFAULT NULL,
+    created_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP,
+    enviada_at DATETIME DEFAULT NULL,
+    -- Reclamo de pendientes vencidos y limpieza de las enviadas
+    INDEX idx_notificaciones_estado (estado, proximo_intento),
+    INDEX idx_notificaciones_lote (lote)
+);
@@ -0,0 +1,38 @@
+-- updated_at con microsegundos en las tablas con listados condicionales
+-- Se aplica con backend/migrations.py (python migrations.py aplicar)
+--
+-- El ETag de los listados (backend/responses.py) usa MAX(updated_at): con
+-- resolución de segundos, dos escrituras en el mismo segundo daban el mismo
+-- validador y el cliente recibía un 304 con datos viejos. Las tablas de
+-- archivo cambian igual (los listados usan UNION ALL), y rollup_marcas
+-- también: guardar una marca con microsegundos en un TIMESTAMP(0) la
+-- redondea y podía saltarse filas. Cada ALTER reconstruye la tabla.
+
+ALTER TABLE mascotas
+    MODIFY updated_at TIMESTAMP(6) DEFAULT CURRENT_TIMESTAMP(6) ON UPDATE CURRENT_TIMESTAMP(6);
+
+ALTER TABLE solicitudes_adopcion
+    MODIFY updated_at TIMESTAMP(6) DEFAULT CURRENT_TIMESTAMP(6) ON UPDATE CURRENT_TIMESTAMP(6);
+ALTER TABLE solicitudes_adopcion_archivo
+    MODIFY updated_at TIMESTAMP(6) DEFAULT CURRENT_TIMESTAMP(6) ON UPDATE CURRENT_TIMESTAMP(6);
+
+ALTER TABLE solicitudes_voluntariado
+    MODIFY updated_at TIMESTAMP(6) DEFAULT CURRENT_TIMESTAMP(6) ON UPDATE CURRENT_TIMESTAMP(6);
+ALTER TABLE solicitudes_voluntariado_archivo
+    MODIFY updated_at TIMESTAMP(6) DEFAULT CURRENT_TIMESTAMP(6) ON UPDATE CURRENT_TIMESTAMP(6);
+
+ALTER TABLE donaciones
+    MODIFY updated_at TIMESTAMP(6) DEFAULT CURRENT_TIMESTAMP(6) ON UPDATE CURRENT_TIMESTAMP(6);
+ALTER TABLE donaciones_archivo
+    MODIFY updated_at TIMESTAMP(6) DEFAULT CURRENT_TIMESTAMP(6) ON UPDATE CURRENT_TIMESTAMP(6);
+
+ALTER TABLE apadrinamientos
+    MODIFY updated_at TIMESTAMP(6) DEFAULT CURRENT_TIMESTAMP(6) ON UPDATE CURRENT_TIMESTAMP(6);
+ALTER TABLE apadrinamientos_archivo
+    MODIFY updated_at TIMESTAMP(6) DEFAULT CURRENT_TIMESTAMP(6) ON UPDATE CURRENT_TIMESTAMP(6);
+
+ALTER TABLE colaboradores_difusion
+    MODIFY updated_at TIMESTAMP(6) DEFAULT CURRENT_TIMESTAMP(6) ON UPDATE CURRENT_TIMESTAMP(6);
+
+ALTER TABLE rollup_marcas
+    MODIFY marca TIMESTAMP(6) NOT NULL;
@@ -0,0 +1,16 @@
+-- Días de los rollups afectados por borrados (pipeline/rollups.py)
+-- Se aplica con backend/migrations.py (python migrations.py aplicar)
+--
+-- Un borrado no mueve updated_at, así que la marca de rollup_marcas no lo
+-- ve, y los borrados en cascada (solicitudes de una mascota eliminada) no
+-- activan triggers. DELETE /mascotas anota aquí, en su misma transacción,
+-- los días de las solicitudes que desaparecen; la siguiente actualización
+-- de rollups recalcula esos días y borra las anotaciones que procesó.
+
+CREATE TABLE IF NOT EXISTS rollup_borrados (
+    id BIGINT AUTO_INCREMENT PRIMARY KEY,
+    tabla VARCHAR(50) NOT NULL,
+    dia DATE NOT NULL,
+    created_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP,
+    INDEX idx_rollup_borrados_tabla (tabla, id)
+);
@@ -0,0 +1,22 @@
+-- Réplica de lectura local (docker compose --profile replica)
+-- Se ejecuta una vez, al inicializar el volumen de db_replica.
+--
+-- La base y el usuario de la API se crean aquí: la réplica solo replica
+-- refugio_mascotas (--replicate-do-db), no los usuarios del primario. El
+-- esquema y los datos llegan por replicación (GTID desde el principio).
+
+CREATE DATABASE IF NOT EXISTS refugio_mascotas;
+CREATE USER IF NOT EXISTS 'refugio_user'@'%' IDENTIFIED WITH mysql_native_password BY 'refugio_pass';
+GRANT SELECT ON refugio_mascotas.* TO 'refugio_user'@'%';
+
+CHANGE REPLICATION SOURCE TO
+    SOURCE_HOST = 'db',
+    SOURCE_USER = 'root',
+    SOURCE_PASSWORD = 'root',
+    SOURCE_AUTO_POSITION = 1,
+    GET_SOURCE_PUBLIC_KEY = 1;
+START REPLICA;
+
+-- Solo lectura para clientes (el hilo de replicación no se ve afectado).
+-- Persistido aquí y no en la línea de comandos para no bloquear este script.
+SET PERSIST super_read_only = ON;
@@ -0,0 +1,47 @@
+-- Datos de ejemplo (Costa Rica)
+-- Se cargan con `python migrations.py seed`, solo si la tabla mascotas está vacía.
+
+-- Mascotas disponibles
+INSERT INTO mascotas (nombre, especie, edad, descripcion, imagen_url, tamano, genero, contacto_nombre, contacto_telefono, estado) VALUES
+('Max', 'perro', 3, 'Perro muy amigable y juguetón. Le encanta correr en el parque y jugar con ninos.', '/uploads/max.jpg', 'mediano', 'macho', 'Ana González', '+506 8888 1122', 'disponible'),
+('Luna', 'gato', 2, 'Gata tranquila y carinosa. Perfecta para apartamentos, muy independiente.', '/uploads/luna.jpg', 'pequeno', 'hembra', 'Javier Ramírez', '+506 8765 4321', 'disponible'),
+('Rocky', 'perro', 5, 'Perro guardián muy leal. Necesita espacio para correr y una familia activa.', '/uploads/rocky.jpg', 'grande', 'macho', 'Equipo del Refugio', '+506 2244 5566', 'disponible'),
+('Mia', 'gato', 1, 'Gatita muy activa y curiosa. Le gusta jugar con pelotas y trepar.', '/uploads/mia.jpg', 'pequeno', 'hembra', 'Equipo del Refugio', '+506 2244 5566', 'adoptado'),
+('Buddy', 'perro', 7, 'Perro mayor, muy tranquilo y obediente. Ideal para personas mayores.', '/uploads/buddy.jpg', 'mediano', 'macho', 'Luis Fernández', '+506 8567 2345', 'disponible'),
+('Whiskers', 'gato', 4, 'Gato muy sociable, le encanta la companía humana. Perfecto para familias.', '/uploads/whiskers.jpg', 'mediano', 'macho', 'Equipo del Refugio', '+506 2244 5566', 'disponible'),
+('Bella', 'perro', 2, 'Perra muy energética y carinosa. Le encanta jugar y pasear.', '/uploads/bella.jpg', 'pequeno', 'hembra', 'Iván Urena', '+506 6001 2233', 'disponible');
+
+-- Solicitudes de adopción ejemplo
+INSERT INTO solicitudes_adopcion (mascota_id, nombre, telefono, email, direccion, tipo_vivienda, otras_mascotas, experiencia, motivacion, horas_disponibles, presupuesto, estado) VALUES
+(1, 'Laura Campos', '+506 8700 1122', 'laura.campos@correo.cr', 'Del ICE 100 metros norte, San José', 'casa_jardin', 'no', 'moderada', 'Toby sería perfecto para mi familia, tenemos espacio y tiempo para él.', '6-8', '1000-3000', 'pendiente'),
+(2, 'José Murillo', '+506 7000 2233', 'jose.murillo@correo.cr', 'Frente a la Plaza de Deportes, Cartago', 'apartamento', 'no', 'poca', 'Deseo companía felina tranquila y Nina es ideal.', '4-6', '1000-3000', 'revisando'),
+(5, 'Ana Solano', '+506 6001 3344', 'ana.solano@correo.cr', 'De la iglesia 200 este, Heredia', 'casa', 'gatos', 'mucha', 'Tengo experiencia cuidando perros mayores como Tina.', 'todo_dia', '3000-7000', 'aprobada');
+
+-- Solicitudes de voluntariado (Costa Rica)
+INSERT INTO solicitudes_voluntariado (nombre, telefono, email, areas, disponibilidad, experiencia) VALUES
+('Patricia Castro', '+506 8777 8888', 'patricia.castro@correo.cr', '["cuidado_directo", "limpieza"]', 'mananas', 'He colaborado en refugios en el GAM.'),
+('Miguel Mora', '+506 8999 0000', 'miguel.mora@correo.cr', '["eventos", "redes"]', 'fines_semana', 'Trabajo en comunicación y eventos de bienestar animal.');
+
+-- Donaciones (Costa Rica)
+INSERT INTO donaciones (tipo_donacion, monto, nombre_donante, telefono_donante, email_donante, estado) VALUES
+('monetaria', 20000.00, 'Gabriela Guevara', '+506 9000 1234', 'gabriela.guevara@correo.cr', 'confirmada'),
+('especie', NULL, 'Federico Ruiz', '+506 9100 2233', 'federico.ruiz@correo.cr', 'pendiente');
+
+UPDATE donaciones SET descripcion_especie = '30 kg de alimento para perro, mantas y collares' WHERE id = 2;
+
+-- Apadrinamientos (Costa Rica)
+INSERT INTO apadrinamientos (nombre_padrino, telefono_padrino, email_padrino, preferencia_especie, aportacion_mensual, estado) VALUES
+('Lucía Fernández', '+506 9222 2333', 'lucia.fernandez@correo.cr', 'gato', 8000.00, 'pendiente'),
+('Rafael Gómez', '+506 9333 2444', 'rafael.gomez@correo.cr', 'mayor', 12000.00, 'activo');
+
+-- Difusión (Costa Rica)
+INSERT INTO colaboradores_difusion (nombre, email, tipos_difusion, redes_sociales) VALUES
+('Sandra Ramírez', 'sandra.ramirez@correo.cr', '["redes_sociales","volantes"]', 'Instagram @sandra_rcr'),
+('Pedro Salazar', 'pedro.salazar@correo.cr', '["fotografia","charlas"]', 'Facebook @pedrosalazar, TikTok @salazarfotos');
+
+-- Teléfono y email normalizados (misma regla que validation.normalize_phone / normalize_email)
+UPDATE solicitudes_adopcion SET telefono_norm = CONCAT('+', IF(CHAR_LENGTH(REGEXP_REPLACE(telefono, '[^0-9]', '')) = 8, '506', ''), REGEXP_REPLACE(telefono, '[^0-9]', '')), email_norm = LOWER(TRIM(email));
+UPDATE solicitudes_voluntariado SET telefono_norm = CONCAT('+', IF(CHAR_LENGTH(REGEXP_REPLACE(telefono, '[^0-9]', '')) = 8, '506', ''), REGEXP_REPLACE(telefono, '[^0-9]', '')), email_norm = LOWER(TRIM(email));
+UPDATE donaciones SET telefono_norm = CONCAT('+', IF(CHAR_LENGTH(REGEXP_REPLACE(telefono_donante, '[^0-9]', '')) = 8, '506', ''), REGEXP_REPLACE(telefono_donante, '[^0-9]', '')), email_norm = LOWER(TRIM(email_donante));
+UPDATE apadrinamientos SET telefono_norm = CONCAT('+', IF(CHAR_LENGTH(REGEXP_REPLACE(telefono_padrino, '[^0-9]', '')) = 8, '506', ''), REGEXP_REPLACE(telefono_padrino, '[^0-9]', '')), email_norm = LOWER(TRIM(email_padrino));
+UPDATE colaboradores_difusion SET email_norm = LOWER(TRIM(email));